@@ -0,0 +1,89 @@
+"""
+Buffered activity timestamps for FoodVision AI
+Collects per-user timestamps such as last_login in memory and writes them
+in one batched transaction every few seconds, and once more at shutdown
+"""
+
+import atexit
+import logging
+import threading
+import time
+
+FLUSH_INTERVAL_SECONDS = 5
+
+# users columns that may be buffered; names are interpolated into SQL
+BUFFERED_COLUMNS = ('last_login',)
+
+class ActivityBuffer:
+    """Coalesces timestamp writes; only the newest value per user and column is kept"""
+
+    def __init__(self, connect, flush_interval=FLUSH_INTERVAL_SECONDS, on_flush=None):
+        self.connect = connect
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self._pending = {column: {} for column in BUFFERED_COLUMNS}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def record(self, user_id, column, value):
+        """Buffer a value to be written to users.<column>"""
+        if column not in self._pending:
+            raise ValueError(f'Column {column} is not buffered')
+        with self._lock:
+            self._pending[column][user_id] = value
+            if self._thread is None:
+                self._start()
+
+    def pending(self, user_id):
+        """Values recorded for a user but not yet written, by column"""
+        with self._lock:
+            return {column: values[user_id] for column, values in self._pending.items() if user_id in values}
+
+    def flush(self):
+        """Write everything buffered so far in a single transaction"""
+        with self._flush_lock:
+            with self._lock:
+                batches = {column: values for column, values in self._pending.items() if values}
+                self._pending = {column: {} for column in BUFFERED_COLUMNS}
+            if not batches:
+                return 0
+
+            try:
+                conn = self.connect()
+                try:
+                    for column, values in batches.items():
+                        conn.executemany(
+                            f'UPDATE users SET {column} = ? WHERE id = ?',
+                            [(value, user_id) for user_id, value in values.items()]
+                        )
+                    conn.commit()
+                finally:
+                    conn.close()
+            except Exception as e:
+                logging.error(f"Activity flush failed, will retry: {e}")
+                self._restore(batches)
+                return 0
+
+        user_ids = {user_id for values in batches.values() for user_id in values}
+        if self.on_flush:
+            for user_id in user_ids:
+                self.on_flush(user_id)
+        return len(user_ids)
+
+    def _restore(self, batches):
+        """Put back values that failed to write unless newer ones arrived"""
+        with self._lock:
+            for column, values in batches.items():
+                for user_id, value in values.items():
+                    self._pending[column].setdefault(user_id, value)
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
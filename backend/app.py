@@ -1,24 +1,24 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 import cv2
 import numpy as np
-from PIL import Image, ImageEnhance, ImageFilter
+from PIL import Image
 import io
 import base64
 import tensorflow as tf
 from tensorflow.keras.applications import MobileNetV2, ResNet50, InceptionV3
-from tensorflow.keras.applications.mobilenet_v2 import preprocess_input, decode_predictions
+from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
 import json
 import sqlite3
 from datetime import datetime, timedelta
 import os
 from werkzeug.utils import secure_filename
-import uuid
 import requests
 import openai
 from transformers import pipeline, BlipProcessor, BlipForConditionalGeneration
 import torch
 import threading
+import atexit
 import time
 from collections import defaultdict
 import logging
@@ -27,7 +27,16 @@ import hashlib
 import pickle
 
 # Import authentication blueprint
-from auth import auth_bp
+from auth import auth_bp, token_required, invalidate_user
+from food_search import FoodSearchIndex
+from food_labels import FoodLabelTable, load_food_label_table, group_classes_by_food
+from food_embeddings import create_embedding_model, load_food_embedding_index
+from plate_segmentation import segment_plate
+from image_enhancement import enhance_image
+from image_writer import ImageWriterPool
+from image_store import ImageStore, VARIANT_SIZES, THUMBNAIL_SIZE, content_hash_of, is_content_hash
+from user_data import UserDataRepository, create_router
+from json_stream import iter_json_objects
 
 app = Flask(__name__)
 CORS(app)
@@ -38,8 +47,19 @@ app.register_blueprint(auth_bp, url_prefix='/api/auth')
 # Configuration
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['CACHE_FOLDER'] = 'cache'
+app.config['UPLOAD_STORAGE_FORMAT'] = os.getenv('UPLOAD_STORAGE_FORMAT', 'original')  # or JPEG, WEBP, PNG
+app.config['UPLOAD_STORAGE_QUALITY'] = int(os.getenv('UPLOAD_STORAGE_QUALITY', '90'))
+app.config['UPLOAD_WRITER_THREADS'] = int(os.getenv('UPLOAD_WRITER_THREADS', '2'))
+app.config['UPLOAD_WRITER_QUEUE_SIZE'] = int(os.getenv('UPLOAD_WRITER_QUEUE_SIZE', '64'))
+app.config['FOOD_INDEX_FOLDER'] = 'models/food_index'
 app.config['MAX_CONTENT_LENGTH'] = 32 * 1024 * 1024  # 32MB max file size
 app.config['SECRET_KEY'] = 'foodvision_hackathon_2024'
+app.config['RATE_LIMIT_BACKEND'] = os.getenv('RATE_LIMIT_BACKEND', 'memory')  # 'sqlite' to share across workers
+app.config['INTERNAL_ADDRESSES'] = tuple(
+    addr.strip() for addr in os.getenv('INTERNAL_ADDRESSES', '127.0.0.1,::1').split(',') if addr.strip()
+)  # Clients allowed to read operational metrics
+app.config['USER_DATA_SHARDS'] = int(os.getenv('USER_DATA_SHARDS', '0'))  # 0 keeps meals in foodvision.db
+app.config['USER_DATA_SHARD_FOLDER'] = 'shards'
 
 # API Keys (In production, use environment variables)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "your-openai-api-key")
@@ -72,10 +92,14 @@ class AIModelManager:
     def load_models(self):
         """Load multiple AI models for enhanced accuracy"""
         try:
-            # Primary food recognition models
-            self.models['mobilenet'] = MobileNetV2(weights='imagenet')
-            self.models['resnet'] = ResNet50(weights='imagenet')
-            self.models['inception'] = InceptionV3(weights='imagenet')
+            # Primary food recognition models (raw logits, softmax is applied
+            # over food classes only in food_class_probabilities)
+            self.models['mobilenet'] = MobileNetV2(weights='imagenet', classifier_activation=None)
+            self.models['resnet'] = ResNet50(weights='imagenet', classifier_activation=None)
+            self.models['inception'] = InceptionV3(weights='imagenet', classifier_activation=None)
+            
+            # Penultimate-layer embeddings for nearest-neighbour recognition
+            self.models['mobilenet_embedding'] = create_embedding_model(self.models['mobilenet'])
             
             # Image captioning model for context
             self.models['blip_processor'] = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
@@ -89,11 +113,14 @@ class AIModelManager:
         except Exception as e:
             logging.error(f"Error loading models: {e}")
             # Fallback to basic model
-            self.models['mobilenet'] = MobileNetV2(weights='imagenet')
+            self.models['mobilenet'] = MobileNetV2(weights='imagenet', classifier_activation=None)
 
 # Initialize model manager
 ai_models = AIModelManager()
 
+# Reference-image embedding index, built offline with food_embeddings.py
+food_embedding_index = load_food_embedding_index(app.config['FOOD_INDEX_FOLDER'])
+
 # Enhanced nutrition database with AI-powered expansion
 def load_enhanced_nutrition_db():
     """Load and enhance nutrition database with AI predictions"""
@@ -117,6 +144,96 @@ def load_enhanced_nutrition_db():
         return {}
 
 nutrition_db = load_enhanced_nutrition_db()
+food_search_index = FoodSearchIndex(nutrition_db.keys())
+
+# Precomputed ImageNet class -> food name table
+try:
+    food_label_table = load_food_label_table()
+except Exception as e:
+    logging.error(f"Error loading ImageNet food map: {e}")
+    food_label_table = FoodLabelTable([])
+
+# Columns of the ImageNet output that are food; every other class is masked out
+# before softmax and top-k. Without a class table, fall back to all classes.
+food_class_indices = np.array(food_label_table.food_indices or range(1000), dtype=np.int64)
+
+# Classes that share a food name (bagel, pretzel and French loaf are all bread)
+# are summed into one food group after fusion
+food_group_names, food_group_of_class = group_classes_by_food(food_label_table, food_class_indices)
+food_group_matrix = np.zeros((len(food_class_indices), len(food_group_names)), dtype=np.float32)
+food_group_matrix[np.arange(len(food_class_indices)), food_group_of_class] = 1.0
+
+def load_ai_config():
+    """Load AI settings from config/ai_config.json"""
+    try:
+        with open('../config/ai_config.json', 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        logging.warning(f"Error loading AI config, using defaults: {e}")
+        return {}
+
+ai_config = load_ai_config()
+
+# Ensemble score fusion settings
+ENSEMBLE_MODELS = ['mobilenet', 'resnet', 'inception']
+ENSEMBLE_FUSION = ai_config.get('ensemble_fusion', {})
+ENSEMBLE_METHOD = ENSEMBLE_FUSION.get('method', 'arithmetic')
+ENSEMBLE_WEIGHTS = {'mobilenet': 1.0, 'resnet': 0.9, 'inception': 0.85}
+ENSEMBLE_WEIGHTS.update(ENSEMBLE_FUSION.get('weights', {}))
+ENSEMBLE_TEMPERATURES = {name: 1.0 for name in ENSEMBLE_MODELS}
+ENSEMBLE_TEMPERATURES.update(ENSEMBLE_FUSION.get('temperatures', {}))
+ENSEMBLE_TOP_K = ai_config.get('max_predictions', 5)
+
+# Uploads are decoded and enhanced at most this large (longest side, px);
+# only the archived original keeps full resolution
+WORKING_IMAGE_SIZE = 1024
+
+# Uploads are persisted by background writer threads into the sharded,
+# content-addressed store under UPLOAD_FOLDER
+image_store = ImageStore(app.config['UPLOAD_FOLDER'])
+image_writer = ImageWriterPool(
+    image_store,
+    storage_format=app.config['UPLOAD_STORAGE_FORMAT'],
+    quality=app.config['UPLOAD_STORAGE_QUALITY'],
+    workers=app.config['UPLOAD_WRITER_THREADS'],
+    max_queue=app.config['UPLOAD_WRITER_QUEUE_SIZE']
+)
+atexit.register(image_writer.flush)
+
+# Per-user meals and aggregates; the router decides which database holds a
+# user, spreading them over USER_DATA_SHARDS files when sharding is enabled
+user_data = UserDataRepository(create_router(
+    app.config['USER_DATA_SHARDS'], app.config['USER_DATA_SHARD_FOLDER']
+))
+
+# Meal history pages; a day spanning two pages appears under its date in both
+MEAL_HISTORY_PAGE_SIZE = 50
+MEAL_HISTORY_MAX_PAGE_SIZE = 200
+MEAL_HISTORY_FIELDS = [
+    'meal_type', 'time', 'total_calories', 'total_protein', 'total_carbs', 'total_fat',
+    'total_fiber', 'food_items', 'image_path', 'image_url', 'thumbnail_url'
+]
+
+# Longest time window, in days, a history or analytics request may ask for
+MAX_WINDOW_DAYS = 3650
+
+# Stored images are content-addressed, so clients may cache them for a year
+IMAGE_CACHE_MAX_AGE = 365 * 24 * 3600
+
+# Plate segmentation must finish within this many seconds on the request
+# path, or its regions are not classified
+SEGMENTATION_TIME_BUDGET = 0.25
+
+# Largest regions classified per plate; all of them go through one batch
+PLATE_REGION_LIMIT = 4
+
+# Negative cache and single-flight bookkeeping for AI nutrition lookups
+NUTRITION_NEGATIVE_CACHE_TTL = 6 * 60 * 60  # Retry failed foods after 6 hours
+NUTRITION_NEGATIVE_CACHE_MAX = 5000
+NUTRITION_LOOKUP_WAIT_SECONDS = 35  # Worst case for the three provider timeouts
+nutrition_negative_cache = {}
+nutrition_lookups_in_flight = {}
+nutrition_lookup_lock = threading.Lock()
 
 # Enhanced Database Schema
 def init_enhanced_db():
@@ -145,55 +262,6 @@ def init_enhanced_db():
         )
     ''')
     
-    # Enhanced meals table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS meals (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER DEFAULT 1,
-            meal_type TEXT NOT NULL,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            image_path TEXT,
-            image_hash TEXT,
-            total_calories REAL NOT NULL,
-            total_protein REAL DEFAULT 0,
-            total_carbs REAL DEFAULT 0,
-            total_fat REAL DEFAULT 0,
-            total_fiber REAL DEFAULT 0,
-            total_sugar REAL DEFAULT 0,
-            total_sodium REAL DEFAULT 0,
-            ai_confidence REAL DEFAULT 0,
-            processing_time REAL DEFAULT 0,
-            location TEXT,
-            mood_rating INTEGER DEFAULT 5,
-            notes TEXT,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Enhanced food items table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS food_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            meal_id INTEGER NOT NULL,
-            food_name TEXT NOT NULL,
-            original_prediction TEXT,
-            confidence REAL NOT NULL,
-            portion_size REAL NOT NULL,
-            calories REAL NOT NULL,
-            protein REAL DEFAULT 0,
-            carbs REAL DEFAULT 0,
-            fat REAL DEFAULT 0,
-            fiber REAL DEFAULT 0,
-            sugar REAL DEFAULT 0,
-            sodium REAL DEFAULT 0,
-            vitamins TEXT DEFAULT '{}',
-            minerals TEXT DEFAULT '{}',
-            ai_model_used TEXT DEFAULT 'mobilenet',
-            processing_method TEXT DEFAULT 'standard',
-            FOREIGN KEY (meal_id) REFERENCES meals (id)
-        )
-    ''')
-    
     # AI predictions cache table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS ai_cache (
@@ -206,31 +274,6 @@ def init_enhanced_db():
         )
     ''')
     
-    # User preferences table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_preferences (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            preference_key TEXT NOT NULL,
-            preference_value TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Nutrition insights table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS nutrition_insights (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            insight_type TEXT NOT NULL,
-            insight_data TEXT NOT NULL,
-            generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            relevance_score REAL DEFAULT 0,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
     # Create default user if not exists
     cursor.execute('SELECT COUNT(*) FROM users')
     if cursor.fetchone()[0] == 0:
@@ -241,6 +284,9 @@ def init_enhanced_db():
     
     conn.commit()
     conn.close()
+    
+    # Meals, food items and other per-user tables, in every shard
+    user_data.create_schema()
     logging.info("Enhanced database initialized successfully")
 
 # Initialize enhanced database
@@ -252,13 +298,10 @@ def analyze_food():
     start_time = time.time()
     
     try:
-        data = request.json
-        image_data = data['image'].split(',')[1]
-        use_advanced_ai = data.get('advanced_mode', True)
-        
-        # Decode and enhance image
-        image_bytes = base64.b64decode(image_data)
-        image = Image.open(io.BytesIO(image_bytes))
+        # Multipart, raw image/* or base64 JSON upload
+        image_bytes, options = read_image_upload()
+        use_advanced_ai = parse_bool_option(options.get('advanced_mode', True))
+        recognition_mode = options.get('recognition_mode', 'classifier')
         
         # Generate image hash for caching
         image_hash = hashlib.md5(image_bytes).hexdigest()
@@ -269,22 +312,37 @@ def analyze_food():
             logging.info(f"Using cached prediction for image {image_hash}")
             return jsonify(cached_result)
         
-        # Save and enhance image
-        image_filename = f"{uuid.uuid4()}.jpg"
-        image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_filename)
+        # Decode straight to working resolution; the models only need 224/299 px
+        image, image_format = load_working_image(image_bytes)
+        
+        # Queue the upload for storage; identical images are stored once
+        image_filename = image_writer.submit(image_bytes, image_format)
         
         # Apply image enhancements
         enhanced_image = enhance_image_quality(image)
-        enhanced_image.save(image_path, quality=95)
         
-        # Multi-model ensemble prediction
-        if use_advanced_ai:
+        # Nearest-neighbour, multi-model ensemble or basic prediction
+        if recognition_mode == 'embedding' and food_embedding_index is not None:
+            predictions = embedding_food_prediction(enhanced_image)
+        elif use_advanced_ai:
             predictions = ensemble_food_prediction(enhanced_image)
         else:
             predictions = basic_food_prediction(enhanced_image)
         
-        # Advanced portion estimation using computer vision
-        portion_analysis = advanced_portion_estimation(enhanced_image)
+        # In advanced mode, segment the plate, classify each region and
+        # portion it by area
+        if use_advanced_ai:
+            region_predictions, food_fraction = plate_region_predictions(enhanced_image)
+        else:
+            region_predictions, food_fraction = [], None
+        portion_analysis = advanced_portion_estimation(region_predictions, food_fraction)
+        
+        # Add items found only in individual regions of the plate
+        predicted_foods = {pred['food_name'] for pred in predictions}
+        for pred in region_predictions:
+            if pred['food_name'] not in predicted_foods:
+                predicted_foods.add(pred['food_name'])
+                predictions.append(pred)
         
         # Generate image caption for context
         image_context = generate_image_caption(enhanced_image)
@@ -299,7 +357,9 @@ def analyze_food():
             nutrition = get_enhanced_nutrition_info(food_name, image_context)
             
             # Apply portion analysis
-            estimated_portion = portion_analysis.get(food_name, pred.get('portion', 1.0))
+            estimated_portion = portion_analysis.get(
+                food_name, portion_analysis.get('default', pred.get('portion', 1.0))
+            )
             
             # Calculate nutritional values
             nutritional_values = calculate_nutritional_values(nutrition, estimated_portion)
@@ -343,6 +403,51 @@ def analyze_food():
             'processing_time': time.time() - start_time
         }), 500
 
+def read_image_upload():
+    """Image bytes and request options from any supported upload format
+    
+    multipart/form-data: the 'image' file part, options from the form.
+    image/*: the raw request body, options from the query string.
+    JSON: a base64 data URL (or bare base64) in 'image', options from the body.
+    """
+    if 'image' in request.files:
+        return request.files['image'].read(), request.form
+    
+    if request.mimetype.startswith('image/'):
+        return request.get_data(cache=False), request.args
+    
+    data = request.get_json()
+    if not data or not data.get('image'):
+        raise ValueError('No image provided')
+    
+    image_data = data['image']
+    return base64.b64decode(image_data[image_data.find(',') + 1:]), data
+
+def parse_bool_option(value):
+    """Booleans arrive as JSON values or as 'true'/'false' form strings"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+def load_working_image(image_bytes, max_size=None):
+    """Decode an upload at a bounded working resolution
+    
+    JPEGs use draft mode, so the decoder itself skips to a 1/2, 1/4 or 1/8
+    scale instead of producing full 12 MP pixels; other formats are decoded
+    and thumbnailed. Returns (image, original format).
+    """
+    max_size = max_size or WORKING_IMAGE_SIZE
+    image = Image.open(io.BytesIO(image_bytes))
+    image_format = image.format
+    
+    if image_format == 'JPEG':
+        image.draft('RGB', (max_size, max_size))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.thumbnail((max_size, max_size), Image.BICUBIC, reducing_gap=2.0)
+    
+    return image, image_format
+
 def enhance_image_quality(image):
     """Apply AI-powered image enhancements"""
     try:
@@ -350,105 +455,141 @@ def enhance_image_quality(image):
         if image.mode != 'RGB':
             image = image.convert('RGB')
         
-        # Apply enhancements
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(1.2)
-        
-        enhancer = ImageEnhance.Sharpness(image)
-        image = enhancer.enhance(1.1)
-        
-        enhancer = ImageEnhance.Color(image)
-        image = enhancer.enhance(1.1)
-        
-        # Apply noise reduction
-        image = image.filter(ImageFilter.MedianFilter(size=3))
+        # Contrast, sharpness, colour and noise reduction in fused OpenCV passes
+        image = enhance_image(image)
         
         return image
     except Exception as e:
         logging.warning(f"Image enhancement failed: {e}")
         return image
 
-def ensemble_food_prediction(image):
-    """Use multiple AI models for enhanced accuracy"""
+def food_class_probabilities(logits):
+    """Softmax over the food classes only, from raw ImageNet logits"""
+    food_logits = np.asarray(logits, dtype=np.float32)[..., food_class_indices]
+    food_logits -= food_logits.max(axis=-1, keepdims=True)
+    np.exp(food_logits, out=food_logits)
+    food_logits /= food_logits.sum(axis=-1, keepdims=True)
+    return food_logits
+
+def top_k_food_classes(probabilities, k):
+    """Top-k (ImageNet class index, probability) pairs, best first"""
+    k = min(k, probabilities.shape[-1])
+    top = np.argpartition(probabilities, -k)[-k:]
+    top = top[np.argsort(probabilities[top])[::-1]]
+    return [(int(food_class_indices[i]), float(probabilities[i])) for i in top]
+
+def food_predictions_from_logits(logits, k, model_name, portion, weight=1.0):
+    """Turn one model's logits into prediction dicts for its top-k food classes"""
     predictions = []
+    for class_index, probability in top_k_food_classes(food_class_probabilities(logits), k):
+        predictions.append({
+            'food_name': food_label_table.food_for_class(class_index),
+            'original_name': food_label_table.label_for_class(class_index),
+            'confidence': probability * weight,
+            'model': model_name,
+            'portion': portion
+        })
+    return predictions
+
+def fuse_food_probabilities(logits_by_model, method=None):
+    """Fuse per-model logits into food-group probabilities with array ops
     
-    try:
-        # Preprocess image for different models
-        processed_image = image.resize((224, 224))
-        image_array = np.array(processed_image)
-        image_array = np.expand_dims(image_array, axis=0)
-        
-        # MobileNetV2 predictions
-        mobilenet_input = preprocess_input(image_array.copy())
-        mobilenet_preds = ai_models.models['mobilenet'].predict(mobilenet_input)
-        mobilenet_decoded = decode_predictions(mobilenet_preds, top=3)[0]
-        
-        for pred in mobilenet_decoded:
-            predictions.append({
-                'food_name': map_food_name(pred[1]),
-                'original_name': pred[1],
-                'confidence': float(pred[2]),
-                'model': 'mobilenet',
-                'portion': estimate_portion_size(image, pred[1])
-            })
-        
-        # ResNet50 predictions
-        if 'resnet' in ai_models.models:
-            resnet_input = tf.keras.applications.resnet50.preprocess_input(image_array.copy())
-            resnet_preds = ai_models.models['resnet'].predict(resnet_input)
-            resnet_decoded = tf.keras.applications.resnet50.decode_predictions(resnet_preds, top=3)[0]
-            
-            for pred in resnet_decoded:
-                predictions.append({
-                    'food_name': map_food_name(pred[1]),
-                    'original_name': pred[1],
-                    'confidence': float(pred[2]) * 0.9,  # Slight weight adjustment
-                    'model': 'resnet50',
-                    'portion': estimate_portion_size(image, pred[1])
-                })
-        
-        # InceptionV3 predictions
-        if 'inception' in ai_models.models:
-            inception_input = tf.keras.applications.inception_v3.preprocess_input(
-                cv2.resize(image_array[0], (299, 299)).reshape(1, 299, 299, 3)
-            )
-            inception_preds = ai_models.models['inception'].predict(inception_input)
-            inception_decoded = tf.keras.applications.inception_v3.decode_predictions(inception_preds, top=3)[0]
-            
-            for pred in inception_decoded:
-                predictions.append({
-                    'food_name': map_food_name(pred[1]),
-                    'original_name': pred[1],
-                    'confidence': float(pred[2]) * 0.85,  # Slight weight adjustment
-                    'model': 'inception_v3',
-                    'portion': estimate_portion_size(image, pred[1])
-                })
-        
-        # Ensemble voting and confidence weighting
-        food_scores = defaultdict(list)
-        for pred in predictions:
-            food_scores[pred['food_name']].append(pred)
-        
-        # Calculate weighted ensemble scores
-        ensemble_results = []
-        for food_name, preds in food_scores.items():
-            avg_confidence = np.mean([p['confidence'] for p in preds])
-            max_confidence = max([p['confidence'] for p in preds])
-            ensemble_confidence = (avg_confidence * 0.7 + max_confidence * 0.3)
-            
-            ensemble_results.append({
-                'food_name': food_name,
-                'original_name': preds[0]['original_name'],
-                'confidence': ensemble_confidence,
+    logits_by_model maps model name -> (batch, 1000) logits. Each model is
+    temperature-scaled and softmaxed over the food classes, the resulting
+    (models, batch, classes) tensor is combined with the configured weights
+    using an arithmetic or geometric mean. Returns (fused, per_model) over
+    food classes, shaped (batch, classes) and (models, batch, classes).
+    """
+    method = method or ENSEMBLE_METHOD
+    names = list(logits_by_model)
+    weights = np.array([ENSEMBLE_WEIGHTS.get(name, 1.0) for name in names], dtype=np.float32)
+    weights /= weights.sum()
+    temperatures = np.array([ENSEMBLE_TEMPERATURES.get(name, 1.0) for name in names], dtype=np.float32)
+    
+    logits = np.stack([np.asarray(logits_by_model[name], dtype=np.float32) for name in names])
+    scaled = logits / temperatures[:, None, None]
+    probabilities = food_class_probabilities(scaled)  # (models, batch, classes)
+    
+    if method == 'geometric':
+        log_probabilities = np.log(np.maximum(probabilities, 1e-12))
+        fused = np.exp(np.tensordot(weights, log_probabilities, axes=1))
+        fused /= fused.sum(axis=-1, keepdims=True)
+    else:
+        fused = np.tensordot(weights, probabilities, axes=1)
+    
+    return fused, probabilities
+
+def top_k_food_groups(fused, per_model, k):
+    """Top-k food groups for each batch row, with per-model agreement counts"""
+    k = min(k, fused.shape[-1])
+    top = np.argpartition(fused, -k, axis=-1)[:, -k:]
+    order = np.argsort(np.take_along_axis(fused, top, axis=-1), axis=-1)[:, ::-1]
+    top = np.take_along_axis(top, order, axis=-1)
+    
+    # A model "agrees" on a food if it ranks among that model's own top 3
+    model_k = min(3, per_model.shape[-1])
+    model_top = np.argpartition(per_model, -model_k, axis=-1)[..., -model_k:]
+    agreement = (model_top[:, :, None, :] == top[None, :, :, None]).any(axis=-1).sum(axis=0)
+    
+    return top, np.take_along_axis(fused, top, axis=-1), agreement
+
+def ensemble_logits(image_arrays):
+    """Run every loaded ensemble model on a (batch, 224, 224, 3) array"""
+    logits = {}
+    
+    # MobileNetV2 predictions
+    mobilenet_input = preprocess_input(image_arrays.astype(np.float32))
+    logits['mobilenet'] = ai_models.models['mobilenet'].predict(mobilenet_input)
+    
+    # ResNet50 predictions
+    if 'resnet' in ai_models.models:
+        resnet_input = tf.keras.applications.resnet50.preprocess_input(image_arrays.astype(np.float32))
+        logits['resnet'] = ai_models.models['resnet'].predict(resnet_input)
+    
+    # InceptionV3 predictions
+    if 'inception' in ai_models.models:
+        inception_input = tf.keras.applications.inception_v3.preprocess_input(
+            np.stack([cv2.resize(array, (299, 299)) for array in image_arrays]).astype(np.float32)
+        )
+        logits['inception'] = ai_models.models['inception'].predict(inception_input)
+    
+    return logits
+
+def ensemble_food_prediction_batch(images, k=None):
+    """Ensemble predictions for several images with one fusion pass"""
+    k = k or ENSEMBLE_TOP_K
+    image_arrays = np.stack([np.array(image.resize((224, 224))) for image in images])
+    
+    fused, per_model = fuse_food_probabilities(ensemble_logits(image_arrays))
+    
+    # Sum classes that share a food name, then take the top-k groups once
+    top, scores, agreement = top_k_food_groups(
+        fused @ food_group_matrix, per_model @ food_group_matrix, k
+    )
+    
+    results = []
+    for row, image in enumerate(images):
+        portion = estimate_portion_size(image, None)
+        row_results = []
+        for group, score, votes in zip(top[row], scores[row], agreement[row]):
+            # Report the strongest ImageNet class inside the food group
+            members = np.flatnonzero(food_group_matrix[:, group])
+            strongest = members[np.argmax(fused[row, members])]
+            row_results.append({
+                'food_name': food_group_names[group],
+                'original_name': food_label_table.label_for_class(int(food_class_indices[strongest])),
+                'confidence': float(score),
                 'model': 'ensemble',
-                'portion': np.mean([p['portion'] for p in preds]),
-                'model_agreement': len(preds)
+                'portion': portion,
+                'model_agreement': int(votes)
             })
-        
-        # Sort by confidence and return top results
-        ensemble_results.sort(key=lambda x: x['confidence'], reverse=True)
-        return ensemble_results[:5]
-        
+        results.append(row_results)
+    return results
+
+def ensemble_food_prediction(image):
+    """Use multiple AI models for enhanced accuracy"""
+    try:
+        return ensemble_food_prediction_batch([image])[0]
     except Exception as e:
         logging.error(f"Ensemble prediction failed: {e}")
         return basic_food_prediction(image)
@@ -461,23 +602,34 @@ def basic_food_prediction(image):
         image_array = np.expand_dims(image_array, axis=0)
         image_array = preprocess_input(image_array)
         
-        predictions = ai_models.models['mobilenet'].predict(image_array)
-        decoded_predictions = decode_predictions(predictions, top=5)[0]
+        logits = ai_models.models['mobilenet'].predict(image_array)[0]
+        return food_predictions_from_logits(logits, 5, 'mobilenet', estimate_portion_size(image, None))
+    except Exception as e:
+        logging.error(f"Basic prediction failed: {e}")
+        return []
+
+def embedding_food_prediction(image):
+    """Recognize food by nearest labelled reference images in embedding space"""
+    try:
+        image_array = np.expand_dims(np.array(image.resize((224, 224)), dtype=np.float32), axis=0)
+        embedding = ai_models.models['mobilenet_embedding'].predict(preprocess_input(image_array))[0]
         
+        portion = estimate_portion_size(image, None)
         results = []
-        for pred in decoded_predictions:
+        for food_name, confidence, similarity in food_embedding_index.predict_foods(embedding):
             results.append({
-                'food_name': map_food_name(pred[1]),
-                'original_name': pred[1],
-                'confidence': float(pred[2]),
-                'model': 'mobilenet',
-                'portion': estimate_portion_size(image, pred[1])
+                'food_name': food_name,
+                'original_name': food_name,
+                'confidence': confidence,
+                'similarity': similarity,
+                'model': 'mobilenet_embedding',
+                'portion': portion
             })
         
-        return results
+        return results or ensemble_food_prediction(image)
     except Exception as e:
-        logging.error(f"Basic prediction failed: {e}")
-        return []
+        logging.error(f"Embedding prediction failed: {e}")
+        return ensemble_food_prediction(image)
 
 def generate_image_caption(image):
     """Generate contextual caption using BLIP model"""
@@ -492,40 +644,75 @@ def generate_image_caption(image):
         logging.warning(f"Caption generation failed: {e}")
         return "Food image"
 
-def advanced_portion_estimation(image):
-    """Advanced portion size estimation using computer vision"""
+def portion_from_area(relative_area):
+    """Map the share of the image covered by food to a portion multiplier"""
+    if relative_area > 0.6:
+        return 1.5  # Large portion
+    elif relative_area > 0.3:
+        return 1.0  # Standard portion
+    elif relative_area > 0.1:
+        return 0.7  # Small portion
+    else:
+        return 0.5  # Very small portion
+
+def plate_region_predictions(image):
+    """Segment the plate into food regions and classify them in one batch
+    
+    Returns (predictions, food_fraction): one prediction per region, best
+    food only, with its area share and portion, plus the share of the image
+    covered by food. At most PLATE_REGION_LIMIT regions are classified.
+    predictions is empty when there is nothing to split or segmentation runs
+    over SEGMENTATION_TIME_BUDGET, so callers fall back to the whole-image
+    predictions; food_fraction is None if segmentation failed.
+    """
     try:
-        # Convert to OpenCV format
-        opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        
-        # Object detection and size estimation
-        gray = cv2.cvtColor(opencv_image, cv2.COLOR_BGR2GRAY)
-        
-        # Find contours for portion estimation
-        contours, _ = cv2.findContours(gray, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        start = time.perf_counter()
+        regions, food_fraction = segment_plate(image, max_regions=PLATE_REGION_LIMIT)
+        elapsed = time.perf_counter() - start
+        
+        # Checked before classifying, so an over-budget plate costs no model time
+        if elapsed > SEGMENTATION_TIME_BUDGET:
+            logging.warning(f"Plate segmentation took {elapsed * 1000:.0f}ms, using whole-image portions")
+            return [], food_fraction
+        if not regions:
+            return [], food_fraction
+        
+        crops = [image.crop(region['box']) for region in regions]
+        region_results = ensemble_food_prediction_batch(crops, k=1)
+        
+        predictions = []
+        for region, results in zip(regions, region_results):
+            if not results:
+                continue
+            pred = dict(results[0])
+            pred['area_fraction'] = region['area_fraction']
+            pred['box'] = list(region['box'])
+            pred['portion'] = portion_from_area(region['area_fraction'])
+            predictions.append(pred)
+        return predictions, food_fraction
         
-        portion_estimates = {}
+    except Exception as e:
+        logging.warning(f"Plate segmentation failed: {e}")
+        return [], None
+
+def advanced_portion_estimation(region_predictions, food_fraction=None):
+    """Per-food portion sizes from the area each food covers on the plate
+    
+    'default' covers foods that were not matched to a region: the total food
+    area, or the full frame when the food fills it edge to edge and nothing
+    stands out from the border.
+    """
+    try:
+        if food_fraction is None:
+            return {'default': 1.0}
+        portion_estimates = {'default': portion_from_area(food_fraction or 1.0)}
         
-        if contours:
-            # Find largest contour (likely the main food item)
-            largest_contour = max(contours, key=cv2.contourArea)
-            area = cv2.contourArea(largest_contour)
-            
-            # Estimate portion based on area and image dimensions
-            image_area = opencv_image.shape[0] * opencv_image.shape[1]
-            relative_area = area / image_area
-            
-            # Portion estimation logic
-            if relative_area > 0.6:
-                portion = 1.5  # Large portion
-            elif relative_area > 0.3:
-                portion = 1.0  # Standard portion
-            elif relative_area > 0.1:
-                portion = 0.7  # Small portion
-            else:
-                portion = 0.5  # Very small portion
-            
-            portion_estimates['default'] = portion
+        # Regions classified as the same food add up
+        areas = defaultdict(float)
+        for pred in region_predictions:
+            areas[pred['food_name']] += pred['area_fraction']
+        for food_name, area in areas.items():
+            portion_estimates[food_name] = portion_from_area(area)
         
         return portion_estimates
         
@@ -595,73 +782,12 @@ def calculate_nutritional_values(nutrition, portion):
 
 def map_food_name(prediction_name):
     """Map model predictions to our nutrition database"""
-    food_mapping = {
-        'pizza': 'pizza',
-        'cheeseburger': 'hamburger',
-        'hamburger': 'hamburger',
-        'french_fries': 'french_fries',
-        'hot_dog': 'hot_dog',
-        'banana': 'banana',
-        'apple': 'apple',
-        'orange': 'orange',
-        'broccoli': 'broccoli',
-        'carrot': 'carrot',
-        'mushroom': 'mushroom',
-        'bell_pepper': 'bell_pepper',
-        'cucumber': 'cucumber',
-        'tomato': 'tomato',
-        'strawberry': 'strawberry',
-        'grapes': 'grapes',
-        'pineapple': 'pineapple',
-        'watermelon': 'watermelon',
-        'corn': 'corn',
-        'bagel': 'bread',
-        'pretzel': 'bread',
-        'croissant': 'bread',
-        'muffin': 'muffin',
-        'doughnut': 'donut',
-        'cake': 'cake',
-        'ice_cream': 'ice_cream',
-        'chocolate': 'chocolate',
-        'cookie': 'cookie',
-        'candy': 'candy',
-        'popcorn': 'popcorn',
-        'burrito': 'burrito',
-        'taco': 'taco',
-        'sandwich': 'sandwich',
-        'soup': 'soup',
-        'salad': 'salad',
-        'pasta': 'pasta',
-        'rice': 'rice',
-        'noodles': 'noodles',
-        'sushi': 'sushi',
-        'fish': 'fish',
-        'chicken': 'chicken',
-        'beef': 'beef',
-        'pork': 'pork',
-        'egg': 'egg',
-        'cheese': 'cheese',
-        'milk': 'milk',
-        'yogurt': 'yogurt',
-        'cereal': 'cereal',
-        'oatmeal': 'oatmeal'
-    }
-    
-    # Try exact match first
-    for key in food_mapping:
-        if key in prediction_name.lower():
-            return food_mapping[key]
-    
-    # Return original if no mapping found
-    return prediction_name.lower().replace('_', ' ')
+    return food_label_table.food_for_label(prediction_name)
 
 def estimate_portion_size(image, food_name):
     """Estimate portion size based on image analysis"""
-    # Convert PIL image to OpenCV format
-    opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-    
     # Simple size estimation based on image dimensions and food type
-    height, width = opencv_image.shape[:2]
+    width, height = image.size
     image_area = height * width
     
     # Normalize to standard portion sizes
@@ -685,47 +811,18 @@ def get_nutrition_info(food_name):
     return nutrition_db.get(food_name.lower(), default_nutrition)
 
 @app.route('/api/save-meal', methods=['POST'])
+@token_required
 def save_meal():
     try:
         data = request.json
-        user_id = data.get('user_id', 1)
+        user_id = request.current_user['id']
         meal_type = data.get('meal_type', 'snack')
         food_items = data.get('items', [])
         image_path = data.get('image_path', '')
         
-        # Calculate totals
-        total_calories = sum(item.get('calories', 0) for item in food_items)
-        total_protein = sum(item.get('protein', 0) for item in food_items)
-        total_carbs = sum(item.get('carbs', 0) for item in food_items)
-        total_fat = sum(item.get('fat', 0) for item in food_items)
-        total_fiber = sum(item.get('fiber', 0) for item in food_items)
-        
-        conn = sqlite3.connect('foodvision.db')
-        cursor = conn.cursor()
-        
-        # Insert meal
-        cursor.execute('''
-            INSERT INTO meals (user_id, meal_type, image_path, total_calories, 
-                             total_protein, total_carbs, total_fat, total_fiber)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, meal_type, image_path, total_calories, total_protein, 
-              total_carbs, total_fat, total_fiber))
-        
-        meal_id = cursor.lastrowid
-        
-        # Insert food items
-        for item in food_items:
-            cursor.execute('''
-                INSERT INTO food_items (meal_id, food_name, confidence, portion_size,
-                                      calories, protein, carbs, fat, fiber)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (meal_id, item.get('food_name', ''), item.get('confidence', 0),
-                  item.get('portion', 1), item.get('calories', 0),
-                  item.get('protein', 0), item.get('carbs', 0),
-                  item.get('fat', 0), item.get('fiber', 0)))
-        
-        conn.commit()
-        conn.close()
+        meal_id = user_data.save_meal(
+            user_id, meal_type, image_path, content_hash_of(image_path), food_items
+        )
         
         return jsonify({
             'success': True,
@@ -739,52 +836,143 @@ def save_meal():
             'error': str(e)
         }), 500
 
+@app.route('/api/images/<image_hash>', methods=['GET'])
+def get_image(image_hash):
+    """Serve a stored image or a resized variant with long-lived HTTP caching
+    
+    Content never changes for a hash, so the hash is a strong ETag and
+    responses are immutable. send_file handles If-None-Match and Range
+    requests and streams the file through the server's file wrapper.
+    """
+    try:
+        image_hash = image_hash.split('.')[0].lower()
+        name = image_store.find(image_hash) if is_content_hash(image_hash) else None
+        if not name:
+            return jsonify({'success': False, 'error': 'Image not found'}), 404
+        
+        size = request.args.get('size', type=int)
+        if size:
+            if size not in VARIANT_SIZES:
+                return jsonify({
+                    'success': False,
+                    'error': f"size must be one of {', '.join(map(str, VARIANT_SIZES))}"
+                }), 400
+            path = image_store.make_variant(name, size)
+            etag = f"{image_hash}-{size}"
+        else:
+            path = image_store.original_path(name)
+            etag = image_hash
+        
+        response = send_file(
+            os.path.abspath(path),
+            conditional=True,
+            etag=etag,
+            max_age=IMAGE_CACHE_MAX_AGE
+        )
+        response.headers['Cache-Control'] = f'public, max-age={IMAGE_CACHE_MAX_AGE}, immutable'
+        return response
+        
+    except Exception as e:
+        logging.error(f"Error serving image {image_hash}: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def image_url(image_path, size=None):
+    """API URL of a stored image, or None for images outside the store"""
+    image_hash = content_hash_of(image_path)
+    if not image_hash:
+        return None
+    return f"/api/images/{image_hash}" + (f"?size={size}" if size else '')
+
+def encode_history_cursor(meal):
+    """Opaque cursor pointing after a meal in the history order"""
+    key = json.dumps([meal['timestamp'], meal['id']]).encode()
+    return base64.urlsafe_b64encode(key).decode().rstrip('=')
+
+def decode_history_cursor(cursor):
+    """(timestamp, id) from a cursor; ValueError when it was not made by encode_history_cursor"""
+    try:
+        timestamp, meal_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(timestamp, str) or not isinstance(meal_id, int):
+        raise ValueError('Invalid cursor')
+    return timestamp, meal_id
+
+def check_window_days(days):
+    """ValueError unless days is a window between 1 and MAX_WINDOW_DAYS"""
+    if not 1 <= days <= MAX_WINDOW_DAYS:
+        raise ValueError(f'days must be between 1 and {MAX_WINDOW_DAYS}')
+
+def meal_history_entry(meal, fields):
+    """JSON for one history row, limited to the requested fields"""
+    entry = {
+        'meal_type': meal['meal_type'],
+        'time': meal['timestamp'].split(' ')[1][:5],  # Extract time
+        'total_calories': meal['total_calories'],
+        'total_protein': meal['total_protein'],
+        'total_carbs': meal['total_carbs'],
+        'total_fat': meal['total_fat'],
+        'total_fiber': meal['total_fiber'],
+        'food_items': meal['food_names'].split(',') if meal['food_names'] else [],
+        'image_path': meal['image_path'],
+        'image_url': image_url(meal['image_path']),
+        'thumbnail_url': image_url(meal['image_path'], THUMBNAIL_SIZE)
+    }
+    return dict({'id': meal['id']}, **{field: entry[field] for field in fields})
+
 @app.route('/api/meal-history', methods=['GET'])
+@token_required
 def get_meal_history():
+    """One page of meal history, newest first, grouped by date
+    
+    Query parameters: days (window, default 7), limit (meals per page),
+    cursor (next_cursor from the previous page) and fields (comma-separated
+    subset of MEAL_HISTORY_FIELDS; id is always included).
+    """
     try:
         days = request.args.get('days', 7, type=int)
-        user_id = request.args.get('user_id', 1, type=int)
-        
-        conn = sqlite3.connect('foodvision.db')
-        cursor = conn.cursor()
-        
-        # Get meals from last N days
-        cursor.execute('''
-            SELECT m.*, GROUP_CONCAT(fi.food_name) as food_names
-            FROM meals m
-            LEFT JOIN food_items fi ON m.id = fi.meal_id
-            WHERE m.user_id = ? AND m.timestamp >= datetime('now', '-{} days')
-            GROUP BY m.id
-            ORDER BY m.timestamp DESC
-        '''.format(days), (user_id,))
-        
-        meals = cursor.fetchall()
+        try:
+            check_window_days(days)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        limit = min(max(request.args.get('limit', MEAL_HISTORY_PAGE_SIZE, type=int), 1), MEAL_HISTORY_MAX_PAGE_SIZE)
+        user_id = request.current_user['id']
+        
+        fields = MEAL_HISTORY_FIELDS
+        if request.args.get('fields'):
+            fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+            unknown = [field for field in fields if field not in MEAL_HISTORY_FIELDS]
+            if unknown:
+                return jsonify({
+                    'success': False,
+                    'error': f"Unknown fields: {', '.join(unknown)}"
+                }), 400
+        
+        after = None
+        if request.args.get('cursor'):
+            try:
+                after = decode_history_cursor(request.args['cursor'])
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+        
+        # One extra row tells whether another page follows
+        meals = user_data.meal_history_page(
+            user_id, days, limit + 1, after, food_items='food_items' in fields
+        )
+        has_more = len(meals) > limit
+        meals = meals[:limit]
         
         # Format response
         history = {}
         for meal in meals:
-            date = meal[3].split(' ')[0]  # Extract date from timestamp
-            if date not in history:
-                history[date] = []
-            
-            history[date].append({
-                'id': meal[0],
-                'meal_type': meal[2],
-                'time': meal[3].split(' ')[1][:5],  # Extract time
-                'total_calories': meal[5],
-                'total_protein': meal[6],
-                'total_carbs': meal[7],
-                'total_fat': meal[8],
-                'total_fiber': meal[9],
-                'food_items': meal[10].split(',') if meal[10] else [],
-                'image_path': meal[4]
-            })
-        
-        conn.close()
+            date = meal['timestamp'].split(' ')[0]  # Extract date from timestamp
+            history.setdefault(date, []).append(meal_history_entry(meal, fields))
         
         return jsonify({
             'success': True,
-            'history': history
+            'history': history,
+            'has_more': has_more,
+            'next_cursor': encode_history_cursor(meals[-1]) if has_more else None
         })
         
     except Exception as e:
@@ -794,47 +982,32 @@ def get_meal_history():
         }), 500
 
 @app.route('/api/nutrition-goals', methods=['GET', 'POST'])
+@token_required
 def nutrition_goals():
     try:
-        user_id = request.args.get('user_id', 1, type=int)
+        user_id = request.current_user['id']
         
         if request.method == 'GET':
-            conn = sqlite3.connect('foodvision.db')
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-            user = cursor.fetchone()
-            conn.close()
-            
-            if user:
-                return jsonify({
-                    'success': True,
-                    'goals': {
-                        'daily_calories': user[4],
-                        'height': user[5],
-                        'weight': user[6],
-                        'age': user[7],
-                        'activity_level': user[8]
-                    }
-                })
-            else:
-                return jsonify({'success': False, 'error': 'User not found'}), 404
+            # token_required has already loaded the user row
+            user = request.current_user
+            return jsonify({
+                'success': True,
+                'goals': {
+                    'daily_calories': user['daily_calorie_goal'],
+                    'height': user['height'],
+                    'weight': user['weight'],
+                    'age': user['age'],
+                    'activity_level': user['activity_level']
+                }
+            })
                 
         elif request.method == 'POST':
             data = request.json
-            conn = sqlite3.connect('foodvision.db')
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE users SET daily_calorie_goal = ?, height = ?, weight = ?, 
-                               age = ?, activity_level = ?
-                WHERE id = ?
-            ''', (data.get('daily_calories'), data.get('height'), 
-                  data.get('weight'), data.get('age'), 
-                  data.get('activity_level'), user_id))
-            
-            conn.commit()
-            conn.close()
+            user_data.update_goals(
+                user_id, data.get('daily_calories'), data.get('height'),
+                data.get('weight'), data.get('age'), data.get('activity_level')
+            )
+            invalidate_user(user_id)
             
             return jsonify({
                 'success': True,
@@ -848,49 +1021,20 @@ def nutrition_goals():
         }), 500
 
 @app.route('/api/analytics', methods=['GET'])
+@token_required
 def get_analytics():
     try:
-        user_id = request.args.get('user_id', 1, type=int)
+        user_id = request.current_user['id']
         days = request.args.get('days', 30, type=int)
+        try:
+            check_window_days(days)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        conn = sqlite3.connect('foodvision.db')
-        cursor = conn.cursor()
-        
-        # Daily calorie trends
-        cursor.execute('''
-            SELECT DATE(timestamp) as date, SUM(total_calories) as daily_calories
-            FROM meals 
-            WHERE user_id = ? AND timestamp >= datetime('now', '-{} days')
-            GROUP BY DATE(timestamp)
-            ORDER BY date
-        '''.format(days), (user_id,))
-        
-        daily_calories = [{'date': row[0], 'calories': row[1]} for row in cursor.fetchall()]
-        
-        # Macro breakdown
-        cursor.execute('''
-            SELECT SUM(total_protein) as protein, SUM(total_carbs) as carbs, 
-                   SUM(total_fat) as fat, SUM(total_fiber) as fiber
-            FROM meals 
-            WHERE user_id = ? AND timestamp >= datetime('now', '-{} days')
-        '''.format(days), (user_id,))
-        
-        macros = cursor.fetchone()
+        daily_rows, macros, food_rows = user_data.analytics(user_id, days)
         
-        # Most frequent foods
-        cursor.execute('''
-            SELECT fi.food_name, COUNT(*) as frequency
-            FROM food_items fi
-            JOIN meals m ON fi.meal_id = m.id
-            WHERE m.user_id = ? AND m.timestamp >= datetime('now', '-{} days')
-            GROUP BY fi.food_name
-            ORDER BY frequency DESC
-            LIMIT 10
-        '''.format(days), (user_id,))
-        
-        frequent_foods = [{'food': row[0], 'count': row[1]} for row in cursor.fetchall()]
-        
-        conn.close()
+        daily_calories = [{'date': row[0], 'calories': row[1]} for row in daily_rows]
+        frequent_foods = [{'food': row[0], 'count': row[1]} for row in food_rows]
         
         return jsonify({
             'success': True,
@@ -915,20 +1059,20 @@ def get_analytics():
 @app.route('/api/search-food', methods=['GET'])
 def search_food():
     try:
-        query = request.args.get('q', '').lower()
+        query = request.args.get('q', '')
+        limit = max(1, min(request.args.get('limit', 10, type=int), 50))
         
-        # Search in nutrition database
+        # Ranked, typo-tolerant lookup in the nutrition database index
         results = []
-        for food_name, nutrition in nutrition_db.items():
-            if query in food_name.lower():
-                results.append({
-                    'food_name': food_name,
-                    'nutrition': nutrition
-                })
+        for food_name in food_search_index.search(query, limit=limit):
+            results.append({
+                'food_name': food_name,
+                'nutrition': nutrition_db[food_name]
+            })
         
         return jsonify({
             'success': True,
-            'results': results[:10]  # Limit to 10 results
+            'results': results
         })
         
     except Exception as e:
@@ -952,7 +1096,51 @@ def get_enhanced_nutrition_info(food_name, image_context):
         return get_nutrition_info(food_name)
 
 def predict_nutrition_with_ai(food_name, image_context):
-    """Use multiple AI APIs to predict nutrition information"""
+    """Use multiple AI APIs to predict nutrition information
+    
+    Lookups are single-flight per food name and failed lookups are remembered
+    for NUTRITION_NEGATIVE_CACHE_TTL seconds, so a burst of requests for an
+    unknown label costs at most one trip through the provider chain.
+    """
+    food_key = food_name.lower()
+    
+    with nutrition_lookup_lock:
+        if food_key in nutrition_db:
+            return nutrition_db[food_key]
+        
+        estimated = get_negative_cached_nutrition(food_key)
+        if estimated:
+            return estimated
+        
+        lookup_done = nutrition_lookups_in_flight.get(food_key)
+        is_leader = lookup_done is None
+        if is_leader:
+            lookup_done = threading.Event()
+            nutrition_lookups_in_flight[food_key] = lookup_done
+    
+    if not is_leader:
+        # Another request is already asking the providers about this food
+        lookup_done.wait(NUTRITION_LOOKUP_WAIT_SECONDS)
+        if food_key in nutrition_db:
+            return nutrition_db[food_key]
+        return get_negative_cached_nutrition(food_key) or get_estimated_nutrition(food_name)
+    
+    try:
+        nutrition = query_nutrition_providers(food_name, image_context)
+        if nutrition:
+            return nutrition
+        
+        # Remember the failure so the next request skips the provider chain
+        estimated = get_estimated_nutrition(food_name)
+        store_negative_cached_nutrition(food_key, estimated)
+        return estimated
+    finally:
+        with nutrition_lookup_lock:
+            nutrition_lookups_in_flight.pop(food_key, None)
+        lookup_done.set()
+
+def query_nutrition_providers(food_name, image_context):
+    """Ask each configured AI provider in turn, returning None if all fail"""
     try:
         # Try OpenAI GPT-4 first
         if OPENAI_API_KEY and OPENAI_API_KEY != "your-openai-api-key":
@@ -972,12 +1160,42 @@ def predict_nutrition_with_ai(food_name, image_context):
             if nutrition:
                 return nutrition
         
-        # Final fallback to default values
-        return get_nutrition_info(food_name)
+        return None
         
     except Exception as e:
         logging.error(f"AI nutrition prediction failed: {e}")
-        return get_nutrition_info(food_name)
+        return None
+
+def get_estimated_nutrition(food_name):
+    """Default nutrition values, flagged so clients know they are a guess"""
+    estimated = dict(get_nutrition_info(food_name))
+    estimated['estimated'] = True
+    return estimated
+
+def get_negative_cached_nutrition(food_key):
+    """Return cached defaults for a food whose AI lookup recently failed"""
+    entry = nutrition_negative_cache.get(food_key)
+    if entry is None:
+        return None
+    
+    expires_at, estimated = entry
+    if expires_at < time.time():
+        nutrition_negative_cache.pop(food_key, None)
+        return None
+    return estimated
+
+def store_negative_cached_nutrition(food_key, estimated):
+    """Remember a failed AI lookup, pruning expired entries when full"""
+    with nutrition_lookup_lock:
+        if len(nutrition_negative_cache) >= NUTRITION_NEGATIVE_CACHE_MAX:
+            now = time.time()
+            for key in [k for k, (expires_at, _) in nutrition_negative_cache.items() if expires_at < now]:
+                del nutrition_negative_cache[key]
+            if len(nutrition_negative_cache) >= NUTRITION_NEGATIVE_CACHE_MAX:
+                # Still full of live entries: drop the oldest insertion
+                nutrition_negative_cache.pop(next(iter(nutrition_negative_cache)))
+        
+        nutrition_negative_cache[food_key] = (time.time() + NUTRITION_NEGATIVE_CACHE_TTL, estimated)
 
 def predict_with_openai(food_name, image_context):
     """Predict nutrition using OpenAI GPT-4"""
@@ -1021,8 +1239,7 @@ def predict_with_openai(food_name, image_context):
             result = json.loads(result_text)
             
             # Cache the result
-            nutrition_db[food_name.lower()] = result
-            save_nutrition_cache()
+            store_ai_nutrition(food_name, result)
             
             return result
         
@@ -1072,8 +1289,7 @@ def predict_with_anthropic(food_name, image_context):
             result = json.loads(result_text)
             
             # Cache the result
-            nutrition_db[food_name.lower()] = result
-            save_nutrition_cache()
+            store_ai_nutrition(food_name, result)
             
             return result
         
@@ -1121,8 +1337,7 @@ def predict_with_gemini(food_name, image_context):
             result = json.loads(result_text)
             
             # Cache the result
-            nutrition_db[food_name.lower()] = result
-            save_nutrition_cache()
+            store_ai_nutrition(food_name, result)
             
             return result
         
@@ -1130,6 +1345,12 @@ def predict_with_gemini(food_name, image_context):
         logging.warning(f"Gemini nutrition prediction failed: {e}")
         return None
 
+def store_ai_nutrition(food_name, nutrition):
+    """Add AI-predicted nutrition to the database, search index and disk cache"""
+    nutrition_db[food_name.lower()] = nutrition
+    food_search_index.add(food_name.lower())
+    save_nutrition_cache()
+
 def save_nutrition_cache():
     """Save enhanced nutrition database to cache"""
     try:
@@ -1140,41 +1361,40 @@ def save_nutrition_cache():
         logging.warning(f"Failed to save nutrition cache: {e}")
 
 # Advanced AI-powered endpoints
+
+# Meal suggestion cache: entries are served for SUGGESTION_CACHE_TTL seconds and
+# refreshed in the background once they are older than SUGGESTION_REFRESH_AFTER
+SUGGESTION_CACHE_TTL = 30 * 60
+SUGGESTION_REFRESH_AFTER = 10 * 60
+SUGGESTION_CACHE_MAX = 1000
+FAVORITE_FOODS_TTL = 60 * 60
+meal_suggestion_cache = {}
+meal_suggestions_refreshing = set()
+meal_suggestion_lock = threading.Lock()
+
 @app.route('/api/ai-meal-suggestions', methods=['POST'])
+@token_required
 def ai_meal_suggestions():
     """Get AI-powered meal suggestions based on user preferences and history"""
     try:
         data = request.json
-        user_id = data.get('user_id', 1)
+        user_id = request.current_user['id']
         dietary_preferences = data.get('dietary_preferences', [])
         calorie_target = data.get('calorie_target', 2000)
         meal_type = data.get('meal_type', 'lunch')
         
-        # Get user's meal history for personalization
-        conn = sqlite3.connect('foodvision.db')
-        cursor = conn.cursor()
+        # Get user's favorite foods for personalization
+        favorite_foods = get_favorite_foods(user_id)
         
-        cursor.execute('''
-            SELECT fi.food_name, COUNT(*) as frequency
-            FROM food_items fi
-            JOIN meals m ON fi.meal_id = m.id
-            WHERE m.user_id = ? AND m.timestamp >= datetime('now', '-30 days')
-            GROUP BY fi.food_name
-            ORDER BY frequency DESC
-            LIMIT 10
-        ''', (user_id,))
-        
-        favorite_foods = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        
-        # Generate AI suggestions
-        suggestions = generate_meal_suggestions_with_ai(
+        # Generate AI suggestions, reusing a recent answer for the same request
+        suggestions, cached = get_meal_suggestions(
             dietary_preferences, calorie_target, meal_type, favorite_foods
         )
         
         return jsonify({
             'success': True,
-            'suggestions': suggestions
+            'suggestions': suggestions,
+            'cached': cached
         })
         
     except Exception as e:
@@ -1184,10 +1404,86 @@ def ai_meal_suggestions():
             'error': str(e)
         }), 500
 
-def generate_meal_suggestions_with_ai(dietary_preferences, calorie_target, meal_type, favorite_foods):
-    """Generate meal suggestions using AI"""
+def get_favorite_foods(user_id):
+    """Get a user's most frequent foods from the last 30 days
+    
+    Served from the user_favorite_foods table; the GROUP BY over the meal
+    history only runs when the stored row is missing or older than
+    FAVORITE_FOODS_TTL. save_meal drops the row so new meals show up.
+    """
+    return user_data.favorite_foods(user_id, FAVORITE_FOODS_TTL)
+
+def normalize_meal_suggestion_request(dietary_preferences, calorie_target, meal_type, favorite_foods):
+    """Normalize suggestion inputs into a hashable cache key
+    
+    Only the parts that reach the prompt are kept: the per-meal calorie
+    target, the sorted preferences and a digest of the top five favorites.
+    """
+    preferences = tuple(sorted({str(p).strip().lower() for p in dietary_preferences or []}))
+    
     try:
-        prompt = f"""
+        calorie_target = int(calorie_target)
+    except (TypeError, ValueError):
+        calorie_target = 2000
+    
+    favorites_digest = hashlib.sha1('\n'.join(favorite_foods[:5]).encode('utf-8')).hexdigest()
+    
+    return (str(meal_type).strip().lower(), calorie_target // 3 * 3, preferences, favorites_digest)
+
+def get_meal_suggestions(dietary_preferences, calorie_target, meal_type, favorite_foods):
+    """Return (suggestions, cached) for a request, generating on a cache miss"""
+    key = normalize_meal_suggestion_request(dietary_preferences, calorie_target, meal_type, favorite_foods)
+    meal_type, calorie_target, dietary_preferences, _ = key
+    
+    entry = meal_suggestion_cache.get(key)
+    if entry:
+        created_at, suggestions = entry
+        age = time.time() - created_at
+        if age < SUGGESTION_CACHE_TTL:
+            if age >= SUGGESTION_REFRESH_AFTER:
+                schedule_meal_suggestion_refresh(
+                    key, list(dietary_preferences), calorie_target, meal_type, favorite_foods
+                )
+            return suggestions, True
+    
+    suggestions = generate_meal_suggestions_with_ai(
+        list(dietary_preferences), calorie_target, meal_type, favorite_foods
+    )
+    store_meal_suggestions(key, suggestions)
+    return suggestions, False
+
+def store_meal_suggestions(key, suggestions):
+    """Cache suggestions, evicting the oldest entry when full"""
+    with meal_suggestion_lock:
+        meal_suggestion_cache.pop(key, None)
+        if len(meal_suggestion_cache) >= SUGGESTION_CACHE_MAX:
+            meal_suggestion_cache.pop(next(iter(meal_suggestion_cache)))
+        meal_suggestion_cache[key] = (time.time(), suggestions)
+
+def schedule_meal_suggestion_refresh(key, dietary_preferences, calorie_target, meal_type, favorite_foods):
+    """Regenerate an ageing cache entry on a background thread"""
+    with meal_suggestion_lock:
+        if key in meal_suggestions_refreshing:
+            return
+        meal_suggestions_refreshing.add(key)
+    
+    def refresh():
+        try:
+            suggestions = generate_meal_suggestions_with_ai(
+                dietary_preferences, calorie_target, meal_type, favorite_foods
+            )
+            store_meal_suggestions(key, suggestions)
+        except Exception as e:
+            logging.warning(f"Background meal suggestion refresh failed: {e}")
+        finally:
+            with meal_suggestion_lock:
+                meal_suggestions_refreshing.discard(key)
+    
+    threading.Thread(target=refresh, daemon=True).start()
+
+def build_meal_suggestions_prompt(dietary_preferences, calorie_target, meal_type, favorite_foods):
+    """Build the LLM prompt for meal suggestions"""
+    return f"""
         Generate 5 healthy {meal_type} meal suggestions with the following criteria:
         - Target calories: {calorie_target // 3} calories (for {meal_type})
         - Dietary preferences: {', '.join(dietary_preferences) if dietary_preferences else 'None'}
@@ -1211,6 +1507,13 @@ def generate_meal_suggestions_with_ai(dietary_preferences, calorie_target, meal_
             "tags": ["healthy", "quick", "vegetarian"]
         }}]
         """
+
+def generate_meal_suggestions_with_ai(dietary_preferences, calorie_target, meal_type, favorite_foods):
+    """Generate meal suggestions using AI"""
+    try:
+        prompt = build_meal_suggestions_prompt(
+            dietary_preferences, calorie_target, meal_type, favorite_foods
+        )
         
         # Try different AI services
         if OPENAI_API_KEY and OPENAI_API_KEY != "your-openai-api-key":
@@ -1251,6 +1554,101 @@ def get_ai_suggestions_openai(prompt):
         logging.warning(f"OpenAI meal suggestions failed: {e}")
         return None
 
+@app.route('/api/ai-meal-suggestions/stream', methods=['POST'])
+@token_required
+def ai_meal_suggestions_stream():
+    """Stream meal suggestions as JSON lines while the model is still generating
+    
+    Each line is one JSON object: {"type": "suggestion", "suggestion": {...}}
+    for every suggestion as soon as it is complete, then a final
+    {"type": "done", "cached": <bool>, "count": <int>}.
+    """
+    data = request.json or {}
+    user_id = request.current_user['id']
+    
+    try:
+        favorite_foods = get_favorite_foods(user_id)
+    except Exception as e:
+        logging.warning(f"Favorite foods lookup failed: {e}")
+        favorite_foods = []
+    
+    key = normalize_meal_suggestion_request(
+        data.get('dietary_preferences', []), data.get('calorie_target', 2000),
+        data.get('meal_type', 'lunch'), favorite_foods
+    )
+    meal_type, calorie_target, dietary_preferences, _ = key
+    
+    def generate():
+        entry = meal_suggestion_cache.get(key)
+        if entry and time.time() - entry[0] < SUGGESTION_CACHE_TTL:
+            for suggestion in entry[1]:
+                yield json.dumps({'type': 'suggestion', 'suggestion': suggestion}) + '\n'
+            yield json.dumps({'type': 'done', 'cached': True, 'count': len(entry[1])}) + '\n'
+            return
+        
+        suggestions = []
+        completed = False
+        if OPENAI_API_KEY and OPENAI_API_KEY != "your-openai-api-key":
+            prompt = build_meal_suggestions_prompt(
+                list(dietary_preferences), calorie_target, meal_type, favorite_foods
+            )
+            try:
+                for suggestion in iter_json_objects(stream_ai_suggestions_openai(prompt)):
+                    suggestions.append(suggestion)
+                    yield json.dumps({'type': 'suggestion', 'suggestion': suggestion}) + '\n'
+                completed = True
+            except Exception as e:
+                logging.warning(f"OpenAI meal suggestion stream failed: {e}")
+        
+        if suggestions:
+            # A stream cut off midway is sent as far as it got but not cached
+            if completed:
+                store_meal_suggestions(key, suggestions)
+        else:
+            # Nothing came through the stream; send the fallback set instead
+            suggestions = get_fallback_meal_suggestions(meal_type, calorie_target)
+            for suggestion in suggestions:
+                yield json.dumps({'type': 'suggestion', 'suggestion': suggestion}) + '\n'
+        
+        yield json.dumps({'type': 'done', 'cached': False, 'count': len(suggestions)}) + '\n'
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Keep nginx from buffering the stream
+    return response
+
+def stream_ai_suggestions_openai(prompt):
+    """Yield completion text deltas from OpenAI's streaming chat API"""
+    headers = {
+        'Authorization': f'Bearer {OPENAI_API_KEY}',
+        'Content-Type': 'application/json'
+    }
+    
+    data = {
+        "model": "gpt-4",
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": 1000,
+        "temperature": 0.7,
+        "stream": True
+    }
+    
+    with requests.post('https://api.openai.com/v1/chat/completions',
+                       headers=headers, json=data, timeout=15, stream=True) as response:
+        response.raise_for_status()
+        
+        # Server-Sent Events: one "data: {...}" line per chunk, "[DONE]" at the end
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data: '):
+                continue
+            
+            payload = line[len('data: '):]
+            if payload == '[DONE]':
+                break
+            
+            delta = json.loads(payload)['choices'][0].get('delta', {}).get('content')
+            if delta:
+                yield delta
+
 def get_fallback_meal_suggestions(meal_type, calorie_target):
     """Fallback meal suggestions when AI is unavailable"""
     suggestions = {
@@ -1319,37 +1717,24 @@ def get_fallback_meal_suggestions(meal_type, calorie_target):
     return suggestions.get(meal_type, suggestions['lunch'])[:3]
 
 @app.route('/api/ai-nutrition-analysis', methods=['POST'])
+@token_required
 def ai_nutrition_analysis():
     """Advanced AI-powered nutrition analysis and recommendations"""
     try:
         data = request.json
-        user_id = data.get('user_id', 1)
-        days = data.get('days', 7)
-        
-        # Get user's nutrition data
-        conn = sqlite3.connect('foodvision.db')
-        cursor = conn.cursor()
-        
-        # Get user profile
-        cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-        user = cursor.fetchone()
+        user_id = request.current_user['id']
+        try:
+            days = int(data.get('days', 7))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'days must be an integer'}), 400
+        try:
+            check_window_days(days)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        # Get recent meals
-        cursor.execute('''
-            SELECT DATE(timestamp) as date, 
-                   SUM(total_calories) as calories,
-                   SUM(total_protein) as protein,
-                   SUM(total_carbs) as carbs,
-                   SUM(total_fat) as fat,
-                   SUM(total_fiber) as fiber
-            FROM meals 
-            WHERE user_id = ? AND timestamp >= datetime('now', '-{} days')
-            GROUP BY DATE(timestamp)
-            ORDER BY date DESC
-        '''.format(days), (user_id,))
-        
-        daily_data = cursor.fetchall()
-        conn.close()
+        # Profile from the authenticated user, plus recent meals
+        user = request.current_user
+        daily_data = user_data.daily_nutrition(user_id, days)
         
         # Generate AI analysis
         analysis = generate_nutrition_analysis_with_ai(user, daily_data)
@@ -1379,7 +1764,7 @@ def generate_nutrition_analysis_with_ai(user, daily_data):
             avg_calories = avg_protein = avg_carbs = avg_fat = 0
         
         # User goals
-        calorie_goal = user[4] if user else 2000
+        calorie_goal = (user.get('daily_calorie_goal') if user else None) or 2000
         
         analysis = {
             'summary': {
@@ -1521,29 +1906,14 @@ if __name__ == '__main__':
 # Additional advanced endpoints for enhanced functionality
 
 @app.route('/api/daily-stats', methods=['GET'])
+@token_required
 def get_daily_stats():
     """Get daily nutrition statistics"""
     try:
         date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
-        user_id = request.args.get('user_id', 1, type=int)
+        user_id = request.current_user['id']
         
-        conn = sqlite3.connect('foodvision.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                COALESCE(SUM(total_calories), 0) as calories,
-                COALESCE(SUM(total_protein), 0) as protein,
-                COALESCE(SUM(total_carbs), 0) as carbs,
-                COALESCE(SUM(total_fat), 0) as fat,
-                COALESCE(SUM(total_fiber), 0) as fiber,
-                COUNT(*) as meals_count
-            FROM meals 
-            WHERE user_id = ? AND DATE(timestamp) = ?
-        ''', (user_id, date))
-        
-        result = cursor.fetchone()
-        conn.close()
+        result = user_data.daily_stats(user_id, date)
         
         stats = {
             'calories': result[0],
@@ -1570,12 +1940,13 @@ def get_daily_stats():
         }), 500
 
 @app.route('/api/meal-plan', methods=['GET', 'POST'])
+@token_required
 def meal_plan():
     """Handle meal planning operations"""
     try:
         if request.method == 'GET':
             date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
-            user_id = request.args.get('user_id', 1, type=int)
+            user_id = request.current_user['id']
             
             # For now, return empty plan - in real app, this would query a meal_plans table
             return jsonify({
@@ -1585,7 +1956,7 @@ def meal_plan():
             
         elif request.method == 'POST':
             data = request.json
-            user_id = data.get('user_id', 1)
+            user_id = request.current_user['id']
             date = data.get('date')
             meal_type = data.get('meal_type')
             meal = data.get('meal')
@@ -1692,11 +2063,12 @@ def generate_mock_recipes_based_on_ingredients(ingredients, dietary_restrictions
     return filtered_recipes
 
 @app.route('/api/save-recipe', methods=['POST'])
+@token_required
 def save_recipe():
     """Save a recipe to user's collection"""
     try:
         data = request.json
-        user_id = data.get('user_id', 1)
+        user_id = request.current_user['id']
         recipe = data.get('recipe')
         
         # In a real app, this would save to a user_recipes table
@@ -1715,10 +2087,11 @@ def save_recipe():
         }), 500
 
 @app.route('/api/water-intake', methods=['GET', 'POST'])
+@token_required
 def water_intake():
     """Track water intake"""
     try:
-        user_id = request.args.get('user_id', 1, type=int) if request.method == 'GET' else request.json.get('user_id', 1)
+        user_id = request.current_user['id']
         
         if request.method == 'GET':
             date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
@@ -1750,10 +2123,11 @@ def water_intake():
         }), 500
 
 @app.route('/api/achievements', methods=['GET'])
+@token_required
 def get_achievements():
     """Get user achievements"""
     try:
-        user_id = request.args.get('user_id', 1, type=int)
+        user_id = request.current_user['id']
         
         # Mock achievements - in real app, this would be calculated based on user data
         achievements = [
@@ -1837,27 +2211,15 @@ def social_posts():
         }), 500
 
 @app.route('/api/export-data', methods=['GET'])
+@token_required
 def export_data():
     """Export user data"""
     try:
-        user_id = request.args.get('user_id', 1, type=int)
+        user_id = request.current_user['id']
         format_type = request.args.get('format', 'json')
         
-        conn = sqlite3.connect('foodvision.db')
-        cursor = conn.cursor()
-        
         # Get all user data
-        cursor.execute('''
-            SELECT m.*, GROUP_CONCAT(fi.food_name || ':' || fi.calories) as food_items
-            FROM meals m
-            LEFT JOIN food_items fi ON m.id = fi.meal_id
-            WHERE m.user_id = ?
-            GROUP BY m.id
-            ORDER BY m.timestamp DESC
-        ''', (user_id,))
-        
-        meals = cursor.fetchall()
-        conn.close()
+        meals = user_data.export_meals(user_id)
         
         # Format data for export
         export_data = []
@@ -4,16 +4,42 @@ Handles user registration, login, and JWT token management
 """
 
 import sqlite3
-import hashlib
-import jwt
 import json
-from datetime import datetime, timedelta
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
 from functools import wraps
 from flask import Blueprint, request, jsonify, current_app
 import re
+from password_hashing import password_hasher, needs_rehash, PasswordHasherBusy
+from token_service import TokenService
+from rate_limit import RateLimiter, TokenBucket, MemoryBucketStore, SQLiteBucketStore
+from activity_buffer import ActivityBuffer
 
 auth_bp = Blueprint('auth', __name__)
 
+# Login attempt limits: bursts of 10 per IP and 5 per account from one IP,
+# refilling at 20 and 6 attempts per hour. Account buckets are per client IP
+# so that someone else's failed guesses cannot lock the owner out
+RATE_LIMITS = {
+    'login_ip': TokenBucket(rate=20 / 3600, capacity=10),
+    'login_account': TokenBucket(rate=6 / 3600, capacity=5),
+    'signup_ip': TokenBucket(rate=10 / 3600, capacity=5)
+}
+
+# Clients allowed to read operational endpoints such as token metrics,
+# unless the app sets INTERNAL_ADDRESSES
+DEFAULT_INTERNAL_ADDRESSES = ('127.0.0.1', '::1')
+
+# Authenticated user cache: user id -> (expires_at, user row dict).
+# Changes made through this process invalidate entries immediately; the TTL
+# bounds how long another worker process can serve a stale row.
+USER_CACHE_TTL = 60  # seconds
+USER_CACHE_MAX = 10000
+user_cache = OrderedDict()
+user_cache_lock = threading.Lock()
+
 # Database connection helper
 def get_db_connection():
     """Get database connection"""
@@ -21,35 +47,127 @@ def get_db_connection():
     conn.row_factory = sqlite3.Row
     return conn
 
-# Password hashing
+# Password hashing (salted scrypt on a bounded worker pool)
 def hash_password(password):
-    """Hash password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash password using scrypt"""
+    return password_hasher.hash(password)
 
 def verify_password(password, hashed_password):
-    """Verify password against hash"""
-    return hash_password(password) == hashed_password
+    """Verify password against a scrypt or legacy SHA-256 hash"""
+    return password_hasher.verify(password, hashed_password)
+
+def hasher_busy_response():
+    """503 for requests refused because the hashing queue is full"""
+    response = jsonify({'error': 'Server is busy, please try again shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
 
 # JWT token management
-def generate_token(user_id, username):
-    """Generate JWT token for user"""
-    payload = {
+def get_token_service():
+    """The app's TokenService, created once from its config"""
+    service = current_app.extensions.get('token_service')
+    if service is None:
+        service = current_app.extensions.setdefault('token_service', TokenService.from_config(current_app.config))
+    return service
+
+def generate_token(user_id, username, token_version=0):
+    """Generate JWT token for user (expires in 7 days)"""
+    return get_token_service().issue({
         'user_id': user_id,
         'username': username,
-        'exp': datetime.utcnow() + timedelta(days=7),  # Token expires in 7 days
-        'iat': datetime.utcnow()
-    }
-    return jwt.encode(payload, current_app.config.get('SECRET_KEY', 'your-secret-key'), algorithm='HS256')
+        'tv': token_version or 0  # Bumped on password change to revoke old tokens
+    })
 
 def verify_token(token):
     """Verify JWT token"""
+    return get_token_service().verify(token)
+
+# Rate limiting
+def get_rate_limiter():
+    """The app's RateLimiter; RATE_LIMIT_BACKEND 'sqlite' shares buckets across workers"""
+    limiter = current_app.extensions.get('rate_limiter')
+    if limiter is None:
+        if current_app.config.get('RATE_LIMIT_BACKEND') == 'sqlite':
+            store = SQLiteBucketStore(current_app.config.get('RATE_LIMIT_DATABASE', 'rate_limits.db'))
+        else:
+            store = MemoryBucketStore()
+        limiter = current_app.extensions.setdefault('rate_limiter', RateLimiter(store, RATE_LIMITS))
+    return limiter
+
+def rate_limited_response(retry_after):
+    """429 with the number of seconds until the next attempt is allowed"""
+    response = jsonify({'error': 'Too many attempts, please try again later'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+# User cache
+def get_cached_user(user_id):
+    """Cached user row, or None if missing or expired"""
+    with user_cache_lock:
+        entry = user_cache.get(user_id)
+        if not entry:
+            return None
+        expires_at, user = entry
+        if expires_at < time.time():
+            del user_cache[user_id]
+            return None
+        user_cache.move_to_end(user_id)
+        return dict(user)
+
+def cache_user(user):
+    """Store a user row, evicting the least recently used beyond USER_CACHE_MAX"""
+    with user_cache_lock:
+        user_cache[user['id']] = (time.time() + USER_CACHE_TTL, dict(user))
+        user_cache.move_to_end(user['id'])
+        while len(user_cache) > USER_CACHE_MAX:
+            user_cache.popitem(last=False)
+
+def invalidate_user(user_id):
+    """Drop a user from the cache after their row changes"""
+    with user_cache_lock:
+        user_cache.pop(user_id, None)
+
+# last_login writes are coalesced and flushed every few seconds; flushed
+# users are dropped from the cache so the next read sees the stored value
+activity_buffer = ActivityBuffer(get_db_connection, on_flush=invalidate_user)
+
+def load_active_user(user_id):
+    """Active user row as a dict, from the cache or the database"""
+    user = get_cached_user(user_id)
+    if user is not None:
+        return user
+    
+    conn = get_db_connection()
     try:
-        payload = jwt.decode(token, current_app.config.get('SECRET_KEY', 'your-secret-key'), algorithms=['HS256'])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
+        row = conn.execute(
+            'SELECT * FROM users WHERE id = ? AND is_active = 1',
+            (user_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    
+    if not row:
         return None
+    user = dict(row)
+    cache_user(user)
+    return user
+
+def token_matches_user(payload, user):
+    """Tokens issued before the user's last revocation are rejected"""
+    return payload.get('tv', 0) == (user.get('token_version') or 0)
+
+def deactivate_user(user_id):
+    """Deactivate an account and revoke all of its tokens"""
+    conn = get_db_connection()
+    try:
+        conn.execute(
+            'UPDATE users SET is_active = 0, token_version = COALESCE(token_version, 0) + 1, updated_at = ? WHERE id = ?',
+            (datetime.utcnow(), user_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    invalidate_user(user_id)
 
 # Authentication decorator
 def token_required(f):
@@ -70,19 +188,17 @@ def token_required(f):
             if not payload:
                 return jsonify({'error': 'Token is invalid or expired'}), 401
             
-            # Get user from database
-            conn = get_db_connection()
-            user = conn.execute(
-                'SELECT * FROM users WHERE id = ? AND is_active = 1',
-                (payload['user_id'],)
-            ).fetchone()
-            conn.close()
+            # Get user from the cache, falling back to the database
+            user = load_active_user(payload['user_id'])
             
             if not user:
                 return jsonify({'error': 'User not found'}), 401
             
+            if not token_matches_user(payload, user):
+                return jsonify({'error': 'Token has been revoked'}), 401
+            
             # Add user info to request context
-            request.current_user = dict(user)
+            request.current_user = user
             
         except Exception as e:
             return jsonify({'error': 'Token verification failed'}), 401
@@ -91,6 +207,17 @@ def token_required(f):
     
     return decorated
 
+def internal_only(f):
+    """Decorator limiting an endpoint to clients in INTERNAL_ADDRESSES"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        allowed = current_app.config.get('INTERNAL_ADDRESSES', DEFAULT_INTERNAL_ADDRESSES)
+        if request.remote_addr not in allowed:
+            return jsonify({'error': 'Endpoint not found'}), 404
+        return f(*args, **kwargs)
+    
+    return decorated
+
 # Validation helpers
 def validate_email(email):
     """Validate email format"""
@@ -127,6 +254,10 @@ def validate_username(username):
 def signup():
     """User registration endpoint"""
     try:
+        allowed, retry_after = get_rate_limiter().check(('signup_ip', request.remote_addr))
+        if not allowed:
+            return rate_limited_response(retry_after)
+        
         data = request.get_json()
         
         # Required fields
@@ -195,7 +326,10 @@ def signup():
             return jsonify({'error': 'Daily calorie goal must be a valid number'}), 400
         
         # Hash password
-        password_hash = hash_password(password)
+        try:
+            password_hash = hash_password(password)
+        except PasswordHasherBusy:
+            return hasher_busy_response()
         
         # Database operations
         conn = get_db_connection()
@@ -290,6 +424,15 @@ def login():
         if not validate_email(email):
             return jsonify({'error': 'Please enter a valid email address'}), 400
         
+        # Throttle before any database or hashing work. Both buckets are
+        # charged up front in one take each, so concurrent guesses cannot slip
+        # past; a successful login gives the account token back
+        limiter = get_rate_limiter()
+        account_key = ('login_account', f'{email}|{request.remote_addr}')
+        allowed, retry_after = limiter.check(('login_ip', request.remote_addr), account_key)
+        if not allowed:
+            return rate_limited_response(retry_after)
+        
         conn = get_db_connection()
         
         try:
@@ -305,16 +448,23 @@ def login():
             # Verify password
             if not verify_password(password, user['password_hash']):
                 return jsonify({'error': 'Invalid email or password'}), 401
+            limiter.refund(account_key)
             
-            # Update last login
-            conn.execute(
-                'UPDATE users SET last_login = ? WHERE id = ?',
-                (datetime.utcnow(), user['id'])
-            )
-            conn.commit()
+            # Upgrade legacy SHA-256 (or outdated scrypt) hashes now that we know the password
+            if needs_rehash(user['password_hash']):
+                conn.execute(
+                    'UPDATE users SET password_hash = ? WHERE id = ?',
+                    (hash_password(password), user['id'])
+                )
+                conn.commit()
+                invalidate_user(user['id'])
+            
+            # Last login is written in the next batched flush
+            logged_in_at = datetime.utcnow()
+            activity_buffer.record(user['id'], 'last_login', logged_in_at)
             
             # Generate token
-            token = generate_token(user['id'], user['username'])
+            token = generate_token(user['id'], user['username'], dict(user).get('token_version'))
             
             # Prepare user data for response (exclude sensitive info)
             user_data = {
@@ -328,7 +478,7 @@ def login():
                 'age': user['age'],
                 'gender': user['gender'],
                 'activity_level': user['activity_level'],
-                'last_login': datetime.utcnow().isoformat()
+                'last_login': logged_in_at.isoformat()
             }
             
             return jsonify({
@@ -337,6 +487,8 @@ def login():
                 'token': token
             }), 200
             
+        except PasswordHasherBusy:
+            return hasher_busy_response()
         except Exception as e:
             return jsonify({'error': 'Login failed'}), 500
         finally:
@@ -369,11 +521,34 @@ def get_profile():
             'last_login': user['last_login']
         }
         
+        # Show a login that is still waiting in the activity buffer
+        pending = activity_buffer.pending(user['id'])
+        if 'last_login' in pending:
+            profile_data['last_login'] = str(pending['last_login'])
+        
         return jsonify({'user': profile_data}), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to get profile'}), 500
 
+# UPDATE ... RETURNING needs SQLite 3.35
+UPDATE_RETURNING_SUPPORTED = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Profile UPDATE statements by updated field combination, so each distinct
+# statement text is built once and reused from SQLite's statement cache
+profile_update_statements = {}
+
+def profile_update_sql(fields):
+    """UPDATE statement for a tuple of updatable profile fields"""
+    sql = profile_update_statements.get(fields)
+    if sql is None:
+        set_clause = ', '.join([f'{field} = ?' for field in fields])
+        sql = f'UPDATE users SET {set_clause}, updated_at = ? WHERE id = ?'
+        if UPDATE_RETURNING_SUPPORTED:
+            sql += ' RETURNING *'
+        profile_update_statements[fields] = sql
+    return sql
+
 @auth_bp.route('/profile', methods=['PUT'])
 @token_required
 def update_profile():
@@ -431,24 +606,27 @@ def update_profile():
             if update_data['daily_calorie_goal'] < 1000 or update_data['daily_calorie_goal'] > 5000:
                 return jsonify({'error': 'Daily calorie goal must be between 1000 and 5000'}), 400
         
-        # Build update query
-        set_clause = ', '.join([f'{field} = ?' for field in update_data.keys()])
-        values = list(update_data.values()) + [datetime.utcnow(), user_id]
+        updated_at = datetime.utcnow()
+        values = list(update_data.values()) + [updated_at, user_id]
         
         conn = get_db_connection()
         
         try:
-            conn.execute(
-                f'UPDATE users SET {set_clause}, updated_at = ? WHERE id = ?',
-                values
-            )
+            row = conn.execute(profile_update_sql(tuple(update_data)), values).fetchone()
             conn.commit()
             
-            # Get updated user
-            user = conn.execute(
-                'SELECT * FROM users WHERE id = ?',
-                (user_id,)
-            ).fetchone()
+            if UPDATE_RETURNING_SUPPORTED:
+                if not row:
+                    invalidate_user(user_id)
+                    return jsonify({'error': 'User not found'}), 404
+                # The returned row replaces the cached one in a single step
+                user = dict(row)
+                cache_user(user)
+            else:
+                # Without RETURNING, apply the change to the row token_required loaded
+                user = dict(request.current_user, **update_data)
+                user['updated_at'] = str(updated_at)
+                invalidate_user(user_id)
             
             # Prepare response data
             profile_data = {
@@ -514,15 +692,22 @@ def change_password():
             # Hash new password
             new_password_hash = hash_password(new_password)
             
-            # Update password
+            # Update password and revoke tokens issued with the old one
             conn.execute(
-                'UPDATE users SET password_hash = ?, updated_at = ? WHERE id = ?',
+                'UPDATE users SET password_hash = ?, token_version = COALESCE(token_version, 0) + 1, updated_at = ? WHERE id = ?',
                 (new_password_hash, datetime.utcnow(), user_id)
             )
             conn.commit()
+            invalidate_user(user_id)
+            
+            # This session continues with a token for the new version
+            user = load_active_user(user_id)
+            token = generate_token(user_id, user['username'], user.get('token_version'))
             
-            return jsonify({'message': 'Password changed successfully'}), 200
+            return jsonify({'message': 'Password changed successfully', 'token': token}), 200
             
+        except PasswordHasherBusy:
+            return hasher_busy_response()
         except Exception as e:
             return jsonify({'error': 'Failed to change password'}), 500
         finally:
@@ -547,17 +732,15 @@ def verify_user_token():
             return jsonify({'valid': False, 'error': 'Token is invalid or expired'}), 401
         
         # Check if user still exists and is active
-        conn = get_db_connection()
-        
         try:
-            user = conn.execute(
-                'SELECT id, username, email FROM users WHERE id = ? AND is_active = 1',
-                (payload['user_id'],)
-            ).fetchone()
+            user = load_active_user(payload['user_id'])
             
             if not user:
                 return jsonify({'valid': False, 'error': 'User not found'}), 401
             
+            if not token_matches_user(payload, user):
+                return jsonify({'valid': False, 'error': 'Token has been revoked'}), 401
+            
             return jsonify({
                 'valid': True,
                 'user': {
@@ -569,12 +752,39 @@ def verify_user_token():
             
         except Exception as e:
             return jsonify({'valid': False, 'error': 'Token verification failed'}), 500
-        finally:
-            conn.close()
             
     except Exception as e:
         return jsonify({'valid': False, 'error': 'Invalid request data'}), 400
 
+@auth_bp.route('/deactivate', methods=['POST'])
+@token_required
+def deactivate_account():
+    """Deactivate the current account after confirming the password"""
+    try:
+        data = request.get_json()
+        password = data.get('password', '')
+        
+        if not password:
+            return jsonify({'error': 'Password is required'}), 400
+        
+        if not verify_password(password, request.current_user['password_hash']):
+            return jsonify({'error': 'Password is incorrect'}), 401
+        
+        deactivate_user(request.current_user['id'])
+        
+        return jsonify({'message': 'Account deactivated successfully'}), 200
+        
+    except PasswordHasherBusy:
+        return hasher_busy_response()
+    except Exception as e:
+        return jsonify({'error': 'Invalid request data'}), 400
+
+@auth_bp.route('/token-metrics', methods=['GET'])
+@internal_only
+def token_metrics():
+    """Token verification counters and latency percentiles, for internal monitoring only"""
+    return jsonify({'metrics': get_token_service().metrics()}), 200
+
 # Error handlers
 @auth_bp.errorhandler(404)
 def not_found(error):
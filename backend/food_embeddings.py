@@ -0,0 +1,296 @@
+"""
+Embedding-based food recognition for FoodVision AI
+Nearest-neighbour index over MobileNetV2 embeddings of labelled food reference images
+
+Build or extend the on-disk index offline, e.g. from the backend directory:
+    python food_embeddings.py build --images ../data/food_references --index models/food_index
+    python food_embeddings.py add --images ../data/new_foods --index models/food_index
+
+Reference images are laid out as <images>/<food_name>/<any>.jpg. Adding foods
+only embeds the new images; nothing is retrained.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+
+# Indexes with at least this many vectors get an IVF coarse quantizer
+IVF_MIN_VECTORS = 4096
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_SIZE = 50000
+DEFAULT_NPROBE = 8
+
+# Flat indexes up to this size keep a float32 copy in memory for fast BLAS search
+FLAT_FLOAT32_LIMIT = 50000
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+def normalize_rows(vectors):
+    """L2-normalize each row so dot products are cosine similarities"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def train_kmeans(vectors, nlist, seed=0):
+    """Spherical k-means centroids for the IVF coarse quantizer"""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > KMEANS_SAMPLE_SIZE:
+        vectors = vectors[rng.choice(len(vectors), KMEANS_SAMPLE_SIZE, replace=False)]
+    vectors = np.asarray(vectors, dtype=np.float32)
+
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for cluster in range(nlist):
+            members = vectors[assignments == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+        centroids = normalize_rows(centroids)
+    return centroids
+
+class FoodEmbeddingIndex:
+    """Flat or IVF nearest-neighbour index over float16 food embeddings
+
+    On disk an index is a directory with vectors.npy (float16, L2-normalized),
+    meta.json (food label per vector) and, for IVF, centroids.npy plus
+    assignments.npy. vectors.npy is memory-mapped on load.
+    """
+
+    def __init__(self, vectors, labels, centroids=None, assignments=None, path=None):
+        self.vectors = vectors
+        self.labels = list(labels)
+        self.centroids = centroids
+        self.assignments = assignments
+        self.path = path
+        self._prepare()
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def dimension(self):
+        return self.vectors.shape[1]
+
+    def _prepare(self):
+        """Build the in-memory search structures"""
+        self._dense = None
+        self._lists = None
+
+        if self.centroids is not None:
+            # Inverted lists: vector ids grouped by their centroid
+            order = np.argsort(self.assignments, kind='stable')
+            bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        elif len(self.labels) <= FLAT_FLOAT32_LIMIT:
+            self._dense = np.asarray(self.vectors, dtype=np.float32)
+
+    @classmethod
+    def build(cls, vectors, labels, nlist=None):
+        """Create an index, using IVF once there are enough vectors"""
+        vectors = normalize_rows(vectors)
+        if nlist is None:
+            nlist = int(np.sqrt(len(vectors))) if len(vectors) >= IVF_MIN_VECTORS else 0
+
+        centroids = assignments = None
+        if nlist:
+            centroids = train_kmeans(vectors, nlist)
+            assignments = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+        return cls(vectors.astype(np.float16), labels, centroids, assignments)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index directory written by save()"""
+        with open(os.path.join(path, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+
+        vectors = np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r')
+        centroids = assignments = None
+        if meta.get('nlist'):
+            centroids = np.load(os.path.join(path, 'centroids.npy'))
+            assignments = np.load(os.path.join(path, 'assignments.npy'))
+
+        return cls(vectors, meta['labels'], centroids, assignments, path=path)
+
+    def save(self, path=None):
+        """Write the index to a directory"""
+        path = path or self.path
+        os.makedirs(path, exist_ok=True)
+
+        np.save(os.path.join(path, 'vectors.npy'), np.asarray(self.vectors, dtype=np.float16))
+        if self.centroids is not None:
+            np.save(os.path.join(path, 'centroids.npy'), self.centroids)
+            np.save(os.path.join(path, 'assignments.npy'), self.assignments)
+
+        meta = {
+            'dimension': self.dimension,
+            'nlist': 0 if self.centroids is None else len(self.centroids),
+            'labels': self.labels,
+            'updated_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        self.path = path
+
+    def add(self, vectors, labels):
+        """Append new reference embeddings without retraining the quantizer"""
+        vectors = normalize_rows(vectors)
+        self.vectors = np.concatenate([np.asarray(self.vectors, dtype=np.float16), vectors.astype(np.float16)])
+        self.labels.extend(labels)
+        if self.centroids is not None:
+            new_assignments = np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+            self.assignments = np.concatenate([self.assignments, new_assignments])
+        self._prepare()
+
+    def search(self, query, k=10, nprobe=DEFAULT_NPROBE):
+        """Return (ids, similarities) of the k nearest reference vectors"""
+        query = normalize_rows(query.reshape(1, -1))[0]
+
+        if self._lists is not None:
+            nprobe = min(nprobe, len(self._lists))
+            probe = np.argpartition(self.centroids @ query, -nprobe)[-nprobe:]
+            candidates = np.sort(np.concatenate([self._lists[i] for i in probe]))
+            similarities = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+        elif self._dense is not None:
+            candidates = None
+            similarities = self._dense @ query
+        else:
+            candidates = None
+            similarities = np.asarray(self.vectors, dtype=np.float32) @ query
+
+        k = min(k, len(similarities))
+        if k == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+        top = np.argpartition(similarities, -k)[-k:]
+        top = top[np.argsort(similarities[top])[::-1]]
+        ids = top if candidates is None else candidates[top]
+        return ids, similarities[top]
+
+    def predict_foods(self, query, k=10, top=5):
+        """Similarity-weighted vote of the k nearest references, best food first"""
+        ids, similarities = self.search(query, k=k)
+        if len(ids) == 0:
+            return []
+
+        votes = defaultdict(float)
+        for vector_id, similarity in zip(ids, similarities):
+            votes[self.labels[vector_id]] += max(float(similarity), 0.0)
+
+        total = sum(votes.values()) or 1.0
+        ranked = sorted(votes.items(), key=lambda item: item[1], reverse=True)[:top]
+        return [(food, score / total, float(similarities.max())) for food, score in ranked]
+
+def load_food_embedding_index(path):
+    """Load the index if it has been built, otherwise return None"""
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    try:
+        index = FoodEmbeddingIndex.load(path)
+        logging.info(f"Loaded food embedding index with {len(index)} references from {path}")
+        return index
+    except Exception as e:
+        logging.error(f"Error loading food embedding index: {e}")
+        return None
+
+def create_embedding_model(classifier=None):
+    """MobileNetV2 up to its global average pooling layer (1280-d embeddings)
+
+    Reuses the weights of an already loaded MobileNetV2 classifier when given.
+    """
+    import tensorflow as tf
+    from tensorflow.keras.applications import MobileNetV2
+
+    if classifier is None:
+        return MobileNetV2(weights='imagenet', include_top=False, pooling='avg')
+    return tf.keras.Model(inputs=classifier.input, outputs=classifier.layers[-2].output)
+
+def embed_images(model, images, batch_size=32):
+    """Embed PIL images with a MobileNetV2 embedding model"""
+    from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
+
+    embeddings = []
+    for start in range(0, len(images), batch_size):
+        batch = np.stack([
+            np.array(image.convert('RGB').resize((224, 224)), dtype=np.float32)
+            for image in images[start:start + batch_size]
+        ])
+        embeddings.append(model.predict(preprocess_input(batch), verbose=0))
+    return np.concatenate(embeddings) if embeddings else np.zeros((0, 1280), dtype=np.float32)
+
+def load_reference_images(images_dir):
+    """Yield (food_name, PIL image) for <images_dir>/<food_name>/<file>"""
+    from PIL import Image
+
+    for food_name in sorted(os.listdir(images_dir)):
+        food_dir = os.path.join(images_dir, food_name)
+        if not os.path.isdir(food_dir):
+            continue
+        for filename in sorted(os.listdir(food_dir)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                with Image.open(os.path.join(food_dir, filename)) as image:
+                    image.draft('RGB', (448, 448))
+                    yield food_name.lower(), image.convert('RGB')
+
+def embed_reference_images(images_dir):
+    """Embed every reference image below images_dir"""
+    model = create_embedding_model()
+    labels, images = [], []
+    for food_name, image in load_reference_images(images_dir):
+        labels.append(food_name)
+        images.append(image)
+    print(f"Embedding {len(images)} reference images for {len(set(labels))} foods...")
+    return embed_images(model, images), labels
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or extend the food embedding index')
+    parser.add_argument('command', choices=['build', 'add', 'benchmark'])
+    parser.add_argument('--images', help='Directory of <food_name>/<image> reference files')
+    parser.add_argument('--index', default='models/food_index', help='Index directory')
+    parser.add_argument('--nlist', type=int, default=None, help='IVF lists (0 for a flat index)')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        vectors, labels = embed_reference_images(args.images)
+        index = FoodEmbeddingIndex.build(vectors, labels, nlist=args.nlist)
+        index.save(args.index)
+        print(f"Built index with {len(index)} vectors at {args.index}")
+
+    elif args.command == 'add':
+        index = FoodEmbeddingIndex.load(args.index)
+        vectors, labels = embed_reference_images(args.images)
+        index.add(vectors, labels)
+        index.save(args.index)
+        print(f"Index at {args.index} now holds {len(index)} vectors")
+
+    elif args.command == 'benchmark':
+        benchmark()
+
+def benchmark(size=50000, dimension=1280, queries=200):
+    """Time flat and IVF search over random float16 vectors"""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(size, dimension)).astype(np.float32)
+    labels = [f'food_{i % 1000}' for i in range(size)]
+
+    for name, nlist in [('flat', 0), ('ivf', None)]:
+        start = time.perf_counter()
+        index = FoodEmbeddingIndex.build(vectors, labels, nlist=nlist)
+        build_time = time.perf_counter() - start
+
+        latencies = []
+        for query in vectors[rng.choice(size, queries)]:
+            start = time.perf_counter()
+            index.predict_foods(query)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"{name}: {size} vectors built in {build_time:.1f}s, "
+              f"p50 {latencies[len(latencies) // 2] * 1000:.2f}ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+ImageNet label mapping for FoodVision AI
+Loads the precomputed class-index -> food name table from data/imagenet_food_map.json
+"""
+
+import json
+import os
+
+IMAGENET_FOOD_MAP_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'imagenet_food_map.json'
+)
+
+def display_name(label):
+    """Fallback name for classes without a food mapping"""
+    return label.lower().replace('_', ' ')
+
+class FoodLabelTable:
+    """Per-class lookup table built once from the mapping data file
+
+    foods[i] is the food name for ImageNet class i; classes that are not food
+    fall back to their readable label, exactly as the old substring mapping
+    did when nothing matched. is_food[i] says whether the class is food.
+    """
+
+    def __init__(self, classes):
+        self.wnids = [wnid for wnid, _, _ in classes]
+        self.labels = [label for _, label, _ in classes]
+        self.is_food = [bool(food) for _, _, food in classes]
+        self.foods = [food if food else display_name(label) for _, label, food in classes]
+        self.food_indices = [i for i, is_food in enumerate(self.is_food) if is_food]
+        self._food_by_label = dict(zip(self.labels, self.foods))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def label_for_class(self, class_index):
+        """ImageNet label of a class, or a placeholder when the table lacks it"""
+        if 0 <= class_index < len(self.labels):
+            return self.labels[class_index]
+        return f'class_{class_index}'
+
+    def food_for_class(self, class_index):
+        """O(1) food name for an ImageNet class index"""
+        if 0 <= class_index < len(self.foods):
+            return self.foods[class_index]
+        return display_name(self.label_for_class(class_index))
+
+    def food_for_label(self, label):
+        """O(1) food name for a decoded ImageNet label"""
+        food = self._food_by_label.get(label)
+        return food if food is not None else display_name(label)
+
+def group_classes_by_food(table, class_indices):
+    """(group names, group index per class) for classes that share a food name"""
+    group_names = []
+    group_of_class = []
+    for class_index in class_indices:
+        food_name = table.food_for_class(int(class_index))
+        if food_name not in group_names:
+            group_names.append(food_name)
+        group_of_class.append(group_names.index(food_name))
+    return group_names, group_of_class
+
+def load_food_label_table(path=IMAGENET_FOOD_MAP_FILE):
+    """Load the mapping data file into a FoodLabelTable"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return FoodLabelTable(data['classes'])
@@ -0,0 +1,226 @@
+"""
+Food search index for FoodVision AI
+In-memory prefix and trigram index over the nutrition database with
+typo-tolerant, ranked lookups for /api/search-food
+"""
+
+import bisect
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+# Per-word match weights: exact word > word prefix > substring > fuzzy
+EXACT_WORD_WEIGHT = 1.0
+PREFIX_WORD_WEIGHT = 0.8
+SUBSTRING_WORD_WEIGHT = 0.6
+FUZZY_WORD_WEIGHT = 0.5
+
+# Whole-name bonuses on top of the averaged word weights
+EXACT_NAME_BONUS = 1.0
+NAME_PREFIX_BONUS = 0.5
+
+# Minimum trigram similarity (Jaccard) for a typo-tolerant word match
+MIN_SIMILARITY = 0.3
+
+# Upper bound on vocabulary words expanded from one prefix (e.g. a single letter)
+MAX_PREFIX_WORDS = 200
+
+def normalize_food_name(name):
+    """Lowercase and turn separators into single spaces"""
+    return re.sub(r'[\s_\-]+', ' ', str(name).lower()).strip()
+
+def trigrams(word):
+    """Padded character trigrams of a single word"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class FoodSearchIndex:
+    """Word-level prefix + trigram inverted index over food names
+
+    Food names are split into words. Each distinct word maps to the names
+    containing it, the sorted vocabulary answers prefix queries by bisection
+    and a trigram posting map over the vocabulary finds misspelt words. The
+    vocabulary is far smaller than the set of names, so lookups stay cheap as
+    AI-discovered foods accumulate. add() updates everything in place.
+    """
+
+    def __init__(self, names=()):
+        self._lock = threading.Lock()
+        self._names = {}                    # normalized name -> original key
+        self._word_names = defaultdict(set) # word -> normalized names
+        self._vocabulary = []               # sorted distinct words
+        self._word_trigrams = {}            # word -> trigram count
+        self._postings = defaultdict(set)   # trigram -> words
+
+        for name in names:
+            self._add(name, keep_sorted=False)
+        self._vocabulary.sort()
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, name):
+        """Index a single food name; a no-op if it is already indexed"""
+        with self._lock:
+            self._add(name)
+
+    def rebuild(self, names):
+        """Replace the index contents with names"""
+        fresh = FoodSearchIndex(names)
+        with self._lock:
+            self._names = fresh._names
+            self._word_names = fresh._word_names
+            self._vocabulary = fresh._vocabulary
+            self._word_trigrams = fresh._word_trigrams
+            self._postings = fresh._postings
+
+    def _add(self, name, keep_sorted=True):
+        normalized = normalize_food_name(name)
+        if not normalized or normalized in self._names:
+            return
+
+        self._names[normalized] = name
+
+        for word in set(normalized.split()):
+            if word not in self._word_names:
+                grams = trigrams(word)
+                self._word_trigrams[word] = len(grams)
+                for gram in grams:
+                    self._postings[gram].add(word)
+                if keep_sorted:
+                    bisect.insort(self._vocabulary, word)
+                else:
+                    self._vocabulary.append(word)
+            self._word_names[word].add(normalized)
+
+    def _match_words(self, query_word):
+        """Vocabulary words matching query_word, with their match weight"""
+        matches = {}
+
+        position = bisect.bisect_left(self._vocabulary, query_word)
+        end = min(len(self._vocabulary), position + MAX_PREFIX_WORDS)
+        for word in itertools.islice(self._vocabulary, position, end):
+            if not word.startswith(query_word):
+                break
+            matches[word] = EXACT_WORD_WEIGHT if word == query_word else PREFIX_WORD_WEIGHT
+
+        if len(query_word) >= 3:
+            query_grams = trigrams(query_word)
+            shared = defaultdict(int)
+            for gram in query_grams:
+                for word in self._postings.get(gram, ()):
+                    shared[word] += 1
+
+            for word, count in shared.items():
+                if word in matches:
+                    continue
+                if query_word in word:
+                    matches[word] = SUBSTRING_WORD_WEIGHT
+                    continue
+                similarity = count / (len(query_grams) + self._word_trigrams[word] - count)
+                if similarity >= MIN_SIMILARITY:
+                    matches[word] = FUZZY_WORD_WEIGHT * similarity
+
+        return matches
+
+    def search(self, query, limit=10):
+        """Return up to limit original food keys ranked by relevance
+
+        Every query word has to match some word of a result; the score is the
+        mean of the best per-word weights plus bonuses for an exact name or
+        name prefix. Ties go to shorter names, then alphabetical order.
+        """
+        normalized_query = normalize_food_name(query)
+
+        with self._lock:
+            if not normalized_query:
+                return [self._names[name] for name in sorted(self._names)[:limit]]
+
+            scores = None
+            for query_word in normalized_query.split():
+                word_scores = {}
+                for word, weight in self._match_words(query_word).items():
+                    for name in self._word_names[word]:
+                        if weight > word_scores.get(name, 0.0):
+                            word_scores[name] = weight
+
+                if scores is None:
+                    scores = word_scores
+                else:
+                    scores = {name: scores[name] + weight
+                              for name, weight in word_scores.items() if name in scores}
+                if not scores:
+                    return []
+
+            word_count = len(normalized_query.split())
+            ranked = []
+            for name, total in scores.items():
+                score = total / word_count
+                if name == normalized_query:
+                    score += EXACT_NAME_BONUS
+                elif name.startswith(normalized_query):
+                    score += NAME_PREFIX_BONUS
+                ranked.append((-score, len(name), name))
+
+            return [self._names[name] for _, _, name in heapq.nsmallest(limit, ranked)]
+
+def benchmark(size=100000, queries=1000, seed=42):
+    """Time index build, incremental adds and searches over synthetic foods"""
+    rng = random.Random(seed)
+    words = [
+        'apple', 'banana', 'chicken', 'beef', 'pork', 'salmon', 'tuna', 'rice',
+        'noodle', 'pasta', 'bread', 'cheese', 'tomato', 'potato', 'spinach',
+        'broccoli', 'curry', 'soup', 'salad', 'pizza', 'burger', 'taco', 'sushi',
+        'grilled', 'fried', 'roasted', 'spicy', 'sweet', 'sour', 'creamy',
+        'mango', 'coconut', 'garlic', 'ginger', 'lemon', 'honey', 'yogurt', 'egg'
+    ]
+
+    def random_name():
+        length = rng.randint(1, 4)
+        return '_'.join(rng.choice(words) for _ in range(length)) + f'_{rng.randint(0, 99999)}'
+
+    names = [random_name() for _ in range(size)]
+
+    start = time.perf_counter()
+    index = FoodSearchIndex(names)
+    build_time = time.perf_counter() - start
+
+    extra = [random_name() for _ in range(1000)]
+    start = time.perf_counter()
+    for name in extra:
+        index.add(name)
+    add_time = (time.perf_counter() - start) / len(extra)
+
+    # Mix of prefixes, whole words and one-letter typos
+    query_set = []
+    for _ in range(queries):
+        word = rng.choice(words)
+        kind = rng.random()
+        if kind < 0.4:
+            query_set.append(word[:rng.randint(1, len(word))])
+        elif kind < 0.7:
+            query_set.append(f'{word} {rng.choice(words)}')
+        else:
+            position = rng.randrange(len(word))
+            query_set.append(word[:position] + rng.choice('aeiou') + word[position + 1:])
+
+    latencies = []
+    for query in query_set:
+        start = time.perf_counter()
+        index.search(query)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    print(f"Indexed {len(index)} foods in {build_time:.2f}s")
+    print(f"Incremental add: {add_time * 1e6:.1f}us per food")
+    print(f"Search over {queries} queries: "
+          f"p50 {latencies[len(latencies) // 2] * 1000:.2f}ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.2f}ms, "
+          f"max {latencies[-1] * 1000:.2f}ms")
+
+if __name__ == '__main__':
+    benchmark()
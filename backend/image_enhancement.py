@@ -0,0 +1,108 @@
+"""
+Image enhancement for FoodVision AI
+Fused NumPy/OpenCV version of the PIL ImageEnhance chain used on uploads:
+contrast 1.2, sharpness 1.1, colour 1.1 and a 3x3 median filter
+"""
+
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter
+
+CONTRAST_FACTOR = 1.2
+SHARPNESS_FACTOR = 1.1
+COLOR_FACTOR = 1.1
+
+# ITU-R 601-2 luma weights, as used by PIL's convert('L')
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+# Image.blend truncates instead of rounding; each emulated blend is biased by
+# this much so the fused output stays centred on the PIL chain's
+BLEND_TRUNCATION_BIAS = -0.5
+
+# PIL's ImageFilter.SMOOTH kernel, which ImageEnhance.Sharpness blends against
+SMOOTH_KERNEL = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=np.float32) / 13
+
+def color_matrix(mean, contrast=CONTRAST_FACTOR, color=COLOR_FACTOR):
+    """3x4 affine RGB transform equal to Contrast followed by Color
+
+    Contrast blends each pixel towards the mean grey level, Color blends it
+    away from its own luma. Both are linear, so they fold into one matrix
+    plus an offset that cv2.transform applies in a single pass.
+    """
+    saturation = color * np.eye(3, dtype=np.float32) + (1 - color) * np.outer(np.ones(3), LUMA_WEIGHTS)
+    matrix = np.empty((3, 4), dtype=np.float32)
+    matrix[:, :3] = contrast * saturation
+    # Rows of the saturation matrix sum to 1, so the grey offset is unchanged
+    matrix[:, 3] = (1 - contrast) * mean + 2 * BLEND_TRUNCATION_BIAS
+    return matrix
+
+def sharpen_kernel(sharpness=SHARPNESS_FACTOR):
+    """3x3 kernel equal to ImageEnhance.Sharpness: f * image + (1 - f) * SMOOTH"""
+    kernel = (1 - sharpness) * SMOOTH_KERNEL
+    kernel[1, 1] += sharpness
+    return kernel
+
+def enhance_array(rgb, contrast=CONTRAST_FACTOR, sharpness=SHARPNESS_FACTOR, color=COLOR_FACTOR):
+    """Enhance a uint8 RGB array: colour matrix, sharpen kernel, median filter
+
+    Besides the luma mean, that is three OpenCV passes sharing two buffers.
+
+    The colour matrix commutes with the per-channel sharpening kernel, so
+    the order differs from the PIL chain only in intermediate rounding.
+    """
+    rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+    mean = int(cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY).mean() + 0.5)
+
+    buffer = cv2.transform(rgb, color_matrix(mean, contrast, color))
+    sharpened = cv2.filter2D(
+        buffer, -1, sharpen_kernel(sharpness), delta=BLEND_TRUNCATION_BIAS, borderType=cv2.BORDER_REPLICATE
+    )
+    return cv2.medianBlur(sharpened, 3, dst=buffer)
+
+def enhance_image(image, contrast=CONTRAST_FACTOR, sharpness=SHARPNESS_FACTOR, color=COLOR_FACTOR):
+    """Enhance a PIL image, returning a new RGB PIL image"""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return Image.fromarray(enhance_array(np.asarray(image), contrast, sharpness, color))
+
+def enhance_image_pil(image, contrast=CONTRAST_FACTOR, sharpness=SHARPNESS_FACTOR, color=COLOR_FACTOR):
+    """Reference PIL ImageEnhance chain the fused version replaces"""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image = ImageEnhance.Contrast(image).enhance(contrast)
+    image = ImageEnhance.Sharpness(image).enhance(sharpness)
+    image = ImageEnhance.Color(image).enhance(color)
+    return image.filter(ImageFilter.MedianFilter(size=3))
+
+def benchmark(sizes=((224, 224), (640, 480), (1024, 768), (2016, 1512), (4000, 3000)), runs=5):
+    """Compare the PIL chain and the fused version on a photo-like image"""
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 256, size=(96, 128, 3), dtype=np.uint8)
+
+    for width, height in sizes:
+        image = Image.fromarray(base).resize((width, height), Image.BICUBIC)
+        image = Image.fromarray(np.clip(
+            np.asarray(image, dtype=np.int16) + rng.integers(-6, 7, size=(height, width, 3)), 0, 255
+        ).astype(np.uint8))
+
+        timings = {}
+        for name, enhance in [('pil', enhance_image_pil), ('fused', enhance_image)]:
+            latencies = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                enhance(image)
+                latencies.append(time.perf_counter() - start)
+            timings[name] = min(latencies)
+
+        difference = np.abs(
+            np.asarray(enhance_image_pil(image), dtype=np.int16) - np.asarray(enhance_image(image), dtype=np.int16)
+        )
+        print(f"{width}x{height}: pil {timings['pil'] * 1000:.1f}ms, "
+              f"fused {timings['fused'] * 1000:.1f}ms "
+              f"({timings['pil'] / timings['fused']:.1f}x), "
+              f"mean abs diff {difference.mean():.2f}, max {difference.max()}")
+
+if __name__ == '__main__':
+    benchmark()
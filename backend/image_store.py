@@ -0,0 +1,240 @@
+"""
+Content-addressed image store for FoodVision AI
+Uploads live under their SHA-256 hash in two-level sharded directories,
+uploads/originals/ab/cd/<hash>.<ext>, with thumbnails under
+uploads/thumbnails/ab/cd/<hash>.jpg and other sizes, made on demand, under
+uploads/variants/ab/cd/<hash>_<size>.jpg. Meals reference images by hash.
+
+Maintenance, from the backend directory:
+    python image_store.py gc [--dry-run] [--grace-hours 24] [--shards N]
+    python image_store.py migrate      # move legacy flat uploads into the store
+    python image_store.py thumbnails   # backfill missing thumbnails
+"""
+
+import argparse
+import hashlib
+import io
+import logging
+import os
+import re
+import sqlite3
+import time
+from collections import Counter
+
+from PIL import Image
+
+from user_data import create_router
+
+THUMBNAIL_SIZE = 256
+THUMBNAIL_QUALITY = 80
+
+# Longest-side sizes that may be requested as variants; keeps the number of
+# cached files per image bounded
+VARIANT_SIZES = (128, 256, 512, 1024)
+
+# Unreferenced images younger than this are kept; they may belong to an
+# analysis whose meal has not been saved yet
+GC_GRACE_HOURS = 24
+
+CONTENT_HASH = re.compile(r'^[0-9a-f]{64}$')
+CONTENT_NAME = re.compile(r'^([0-9a-f]{64})\.([a-z0-9]+)$')
+
+def is_content_hash(value):
+    """True for a lowercase hex SHA-256 digest"""
+    return bool(CONTENT_HASH.match(value or ''))
+
+def content_hash_of(name):
+    """SHA-256 hash from a stored '<hash>.<ext>' name, or None for other names"""
+    match = CONTENT_NAME.match(os.path.basename(name or ''))
+    return match.group(1) if match else None
+
+class ImageStore:
+    """Sharded content-addressed storage for uploaded images"""
+
+    def __init__(self, root):
+        self.root = root
+        self.originals = os.path.join(root, 'originals')
+        self.thumbnails = os.path.join(root, 'thumbnails')
+        self.variants = os.path.join(root, 'variants')
+
+    @staticmethod
+    def shard(content_hash):
+        """Two-level shard directory, e.g. 'ab/cd' for 'abcd...'"""
+        return os.path.join(content_hash[:2], content_hash[2:4])
+
+    def original_path(self, name):
+        """Path of a stored '<hash>.<ext>' image"""
+        return os.path.join(self.originals, self.shard(content_hash_of(name)), name)
+
+    def thumbnail_path(self, content_hash):
+        return os.path.join(self.thumbnails, self.shard(content_hash), f"{content_hash}.jpg")
+
+    def variant_path(self, content_hash, size):
+        """Path of a resized copy; the thumbnail size is the thumbnail"""
+        if size == THUMBNAIL_SIZE:
+            return self.thumbnail_path(content_hash)
+        return os.path.join(self.variants, self.shard(content_hash), f"{content_hash}_{size}.jpg")
+
+    def find(self, content_hash):
+        """Stored '<hash>.<ext>' name for a hash, or None"""
+        directory = os.path.join(self.originals, self.shard(content_hash))
+        try:
+            for filename in os.listdir(directory):
+                if filename.startswith(content_hash + '.') and content_hash_of(filename):
+                    return filename
+        except FileNotFoundError:
+            pass
+        return None
+
+    def exists(self, name):
+        return os.path.exists(self.original_path(name))
+
+    def touch(self, name):
+        """Mark a stored image as recently used"""
+        os.utime(self.original_path(name))
+
+    def write(self, name, data):
+        """Atomically write image bytes under their content name"""
+        path = self.original_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        return path
+
+    def make_thumbnail(self, name, image_bytes=None):
+        """Write the meal-history thumbnail for a stored image"""
+        return self.make_variant(name, THUMBNAIL_SIZE, image_bytes)
+
+    def make_variant(self, name, size, image_bytes=None):
+        """Write (once) a JPEG copy whose longest side is at most size"""
+        path = self.variant_path(content_hash_of(name), size)
+        if os.path.exists(path):
+            return path
+
+        source = io.BytesIO(image_bytes) if image_bytes is not None else self.original_path(name)
+        with Image.open(source) as image:
+            image.draft('RGB', (size, size))
+            resized = image.convert('RGB')
+            resized.thumbnail((size, size), Image.BICUBIC)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+        resized.save(temp_path, format='JPEG', quality=THUMBNAIL_QUALITY)
+        os.replace(temp_path, path)
+        return path
+
+    def delete(self, name):
+        """Remove a stored image with its thumbnail and variants"""
+        content_hash = content_hash_of(name)
+        paths = [self.original_path(name)]
+        paths += [self.variant_path(content_hash, size) for size in VARIANT_SIZES]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def iter_stored(self):
+        """Yield (name, path) for every stored original"""
+        for directory, _, files in os.walk(self.originals):
+            for filename in files:
+                if content_hash_of(filename):
+                    yield filename, os.path.join(directory, filename)
+
+def image_reference_counts(conn):
+    """Reference count per image hash, from meals.image_hash"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT image_hash, COUNT(*) FROM meals
+        WHERE image_hash IS NOT NULL
+        GROUP BY image_hash
+    ''')
+    return Counter(dict(cursor.fetchall()))
+
+def collect_garbage(store, connections, grace_hours=GC_GRACE_HOURS, dry_run=False):
+    """Delete stored images no meal in any of the databases references, past the grace period"""
+    references = Counter()
+    for conn in connections:
+        references.update(image_reference_counts(conn))
+    cutoff = time.time() - grace_hours * 3600
+    removed = 0
+
+    for name, path in store.iter_stored():
+        if references[content_hash_of(name)] or os.path.getmtime(path) > cutoff:
+            continue
+        if not dry_run:
+            store.delete(name)
+        removed += 1
+    return removed
+
+def migrate_flat_uploads(store, connections):
+    """Move legacy uploads/<uuid>.jpg files into the store and repoint meals"""
+    moved = 0
+
+    for filename in sorted(os.listdir(store.root)):
+        path = os.path.join(store.root, filename)
+        if not os.path.isfile(path):
+            continue
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        extension = os.path.splitext(filename)[1].lstrip('.').lower() or 'jpg'
+        content_hash = hashlib.sha256(data).hexdigest()
+        name = f"{content_hash}.{extension}"
+
+        if not store.exists(name):
+            store.write(name, data)
+        try:
+            store.make_thumbnail(name, data)
+        except Exception as e:
+            logging.warning(f"Thumbnail failed for {filename}: {e}")
+
+        for conn in connections:
+            conn.execute('''
+                UPDATE meals SET image_path = ?, image_hash = ?
+                WHERE image_path = ?
+            ''', (name, content_hash, filename))
+            conn.commit()
+        os.remove(path)
+        moved += 1
+    return moved
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the content-addressed image store')
+    parser.add_argument('command', choices=['gc', 'migrate', 'thumbnails'])
+    parser.add_argument('--root', default='uploads', help='Image store root')
+    parser.add_argument('--database', default='foodvision.db', help='SQLite database')
+    parser.add_argument('--shards', type=int, default=int(os.getenv('USER_DATA_SHARDS', '0')),
+                        help='Meals are sharded over this many databases')
+    parser.add_argument('--shard-folder', default='shards')
+    parser.add_argument('--grace-hours', type=float, default=GC_GRACE_HOURS)
+    parser.add_argument('--dry-run', action='store_true', help='Report orphans without deleting')
+    args = parser.parse_args()
+
+    store = ImageStore(args.root)
+    router = create_router(args.shards, args.shard_folder, args.database)
+    connections = [sqlite3.connect(path) for path in router.user_databases()]
+
+    if args.command == 'gc':
+        removed = collect_garbage(store, connections, args.grace_hours, args.dry_run)
+        print(f"{'Would remove' if args.dry_run else 'Removed'} {removed} unreferenced images")
+
+    elif args.command == 'migrate':
+        print(f"Moved {migrate_flat_uploads(store, connections)} flat uploads into {store.originals}")
+
+    elif args.command == 'thumbnails':
+        created = 0
+        for name, _ in store.iter_stored():
+            if not os.path.exists(store.thumbnail_path(content_hash_of(name))):
+                try:
+                    store.make_thumbnail(name)
+                    created += 1
+                except Exception as e:
+                    logging.warning(f"Thumbnail failed for {name}: {e}")
+        print(f"Created {created} thumbnails")
+
+    for conn in connections:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
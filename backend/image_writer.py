@@ -0,0 +1,107 @@
+"""
+Background upload persistence for FoodVision AI
+A small pool of writer threads behind a bounded queue, storing each distinct
+image once in the content-addressed ImageStore, with its thumbnail
+"""
+
+import hashlib
+import io
+import logging
+import queue
+import threading
+
+from PIL import Image
+
+# File extension per PIL format name
+IMAGE_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif', 'BMP': 'bmp'}
+
+# 'original' keeps the uploaded bytes untouched; any other value is a PIL
+# format the upload is re-encoded to
+ORIGINAL_FORMAT = 'original'
+
+class ImageWriterPool:
+    """Writer threads that persist uploads off the request path
+
+    submit() hashes the bytes, returns the final filename immediately and
+    queues the write. Content that is already stored or queued is not
+    written again. When the queue is full the caller writes synchronously,
+    so a burst of uploads slows requests down instead of losing images.
+    """
+
+    def __init__(self, store, storage_format=ORIGINAL_FORMAT, quality=90, workers=2, max_queue=64):
+        self.store = store
+        self.storage_format = storage_format
+        self.quality = quality
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = set()
+        self._lock = threading.Lock()
+
+        for _ in range(workers):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def filename_for(self, content_hash, image_format=None):
+        """Stored filename for content with this hash and upload format"""
+        if self.storage_format == ORIGINAL_FORMAT:
+            extension = IMAGE_EXTENSIONS.get(image_format, 'jpg')
+        else:
+            extension = IMAGE_EXTENSIONS.get(self.storage_format, self.storage_format.lower())
+        return f"{content_hash}.{extension}"
+
+    def submit(self, image_bytes, image_format=None):
+        """Queue an upload for storage and return its filename"""
+        content_hash = hashlib.sha256(image_bytes).hexdigest()
+        filename = self.filename_for(content_hash, image_format)
+
+        with self._lock:
+            if content_hash in self._pending:
+                return filename
+            if self.store.exists(filename):
+                # Restart the garbage collector's grace period for re-uploads
+                try:
+                    self.store.touch(filename)
+                    return filename
+                except FileNotFoundError:
+                    # Collected between the two calls; write it again
+                    pass
+            self._pending.add(content_hash)
+
+        try:
+            self._queue.put_nowait((content_hash, image_bytes, filename))
+        except queue.Full:
+            logging.warning("Image writer queue full, storing upload synchronously")
+            self._store(content_hash, image_bytes, filename)
+        return filename
+
+    def flush(self):
+        """Block until every queued write has finished"""
+        self._queue.join()
+
+    def _work(self):
+        while True:
+            content_hash, image_bytes, filename = self._queue.get()
+            try:
+                self._store(content_hash, image_bytes, filename)
+            finally:
+                self._queue.task_done()
+
+    def _store(self, content_hash, image_bytes, filename):
+        try:
+            self.store.write(filename, self.encode(image_bytes))
+            self.store.make_thumbnail(filename, image_bytes)
+        except Exception as e:
+            logging.error(f"Error storing upload {filename}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(content_hash)
+
+    def encode(self, image_bytes):
+        """Upload bytes in the configured storage format"""
+        if self.storage_format == ORIGINAL_FORMAT:
+            return image_bytes
+
+        image = Image.open(io.BytesIO(image_bytes))
+        if self.storage_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, format=self.storage_format, quality=self.quality)
+        return output.getvalue()
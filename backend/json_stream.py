@@ -0,0 +1,46 @@
+"""
+Streamed JSON parsing for FoodVision AI
+Pulls complete objects out of model output as it arrives, so streamed
+suggestions can be forwarded before the whole response is in
+"""
+
+import json
+import logging
+
+def iter_json_objects(chunks):
+    """Yield each top-level JSON object from a stream of text chunks as it closes
+
+    Tracks brace depth outside of string literals, so a JSON array of objects
+    (optionally wrapped in prose or a markdown fence) is parsed one element at
+    a time without waiting for the closing bracket.
+    """
+    buffer = []
+    depth = 0
+    in_string = False
+    escaped = False
+
+    for chunk in chunks:
+        for char in chunk:
+            if depth:
+                buffer.append(char)
+
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = depth > 0
+            elif char == '{':
+                if depth == 0:
+                    buffer = [char]
+                depth += 1
+            elif char == '}' and depth:
+                depth -= 1
+                if depth == 0:
+                    try:
+                        yield json.loads(''.join(buffer))
+                    except ValueError as e:
+                        logging.warning(f"Skipping malformed streamed object: {e}")
@@ -0,0 +1,128 @@
+"""
+Password hashing for FoodVision AI
+Salted scrypt hashes computed on a bounded worker pool, with verification
+of legacy unsalted SHA-256 hashes so they can be upgraded on login
+
+Stored format: scrypt$<n>$<r>$<p>$<salt base64>$<hash base64>
+
+Benchmark login throughput from the backend directory:
+    python password_hashing.py
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# scrypt cost: 2**14 * 8 * 128 bytes = 16 MB of memory per hash
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_KEY_LENGTH = 32
+SALT_LENGTH = 16
+
+# hashlib.scrypt releases the GIL, so threads run hashes in parallel; one
+# per core keeps request threads free without oversubscribing the CPU
+HASH_WORKERS = os.cpu_count() or 2
+
+# Hashes waiting or running beyond this are refused instead of queued
+MAX_PENDING_HASHES = HASH_WORKERS * 8
+HASH_TIMEOUT_SECONDS = 10
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full; callers should answer 503"""
+
+def scrypt_hash(password, salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r + 1024 * 1024, dklen=SCRYPT_KEY_LENGTH
+    )
+
+def encode_hash(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    """New salted scrypt hash string for a password"""
+    salt = os.urandom(SALT_LENGTH)
+    digest = scrypt_hash(password, salt, n, r, p)
+    return 'scrypt${}${}${}${}${}'.format(
+        n, r, p,
+        base64.b64encode(salt).decode(),
+        base64.b64encode(digest).decode()
+    )
+
+def check_hash(password, stored_hash):
+    """Constant-time check of a password against a scrypt or legacy SHA-256 hash"""
+    if not stored_hash:
+        return False
+
+    if stored_hash.startswith('scrypt$'):
+        _, n, r, p, salt, digest = stored_hash.split('$')
+        candidate = scrypt_hash(password, base64.b64decode(salt), int(n), int(r), int(p))
+        return hmac.compare_digest(candidate, base64.b64decode(digest))
+
+    legacy = hashlib.sha256(password.encode()).hexdigest()
+    return hmac.compare_digest(legacy, stored_hash)
+
+def needs_rehash(stored_hash):
+    """True for legacy SHA-256 hashes and scrypt hashes with outdated cost"""
+    if not stored_hash or not stored_hash.startswith('scrypt$'):
+        return True
+    _, n, r, p, _, _ = stored_hash.split('$')
+    return (int(n), int(r), int(p)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+class PasswordHasher:
+    """Runs hashes on a dedicated thread pool with a bounded queue"""
+
+    def __init__(self, workers=HASH_WORKERS, max_pending=MAX_PENDING_HASHES):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy('Too many password operations in progress')
+        try:
+            future = self._executor.submit(function, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout=HASH_TIMEOUT_SECONDS)
+
+    def hash(self, password):
+        return self._run(encode_hash, password)
+
+    def verify(self, password, stored_hash):
+        return self._run(check_hash, password, stored_hash)
+
+password_hasher = PasswordHasher()
+
+def benchmark(seconds=3.0):
+    """Logins per second on one core and on the full pool, per scrypt cost"""
+    for n in (2 ** 13, 2 ** 14, 2 ** 15):
+        stored = encode_hash('benchmark-password', n=n)
+
+        start = time.perf_counter()
+        single = 0
+        while time.perf_counter() - start < seconds:
+            check_hash('benchmark-password', stored)
+            single += 1
+        single_rate = single / (time.perf_counter() - start)
+
+        hasher = PasswordHasher()
+        start = time.perf_counter()
+        pooled = 0
+        with ThreadPoolExecutor(max_workers=HASH_WORKERS * 2) as clients:
+            while time.perf_counter() - start < seconds:
+                futures = [clients.submit(hasher.verify, 'benchmark-password', stored)
+                           for _ in range(HASH_WORKERS)]
+                pooled += sum(1 for future in futures if future.result())
+        pooled_rate = pooled / (time.perf_counter() - start)
+
+        print(f"scrypt n=2^{n.bit_length() - 1}: {1000 / single_rate:.1f}ms per login, "
+              f"{single_rate:.1f} logins/s on one core, "
+              f"{pooled_rate:.1f} logins/s on {HASH_WORKERS} workers "
+              f"({pooled_rate / HASH_WORKERS:.1f} per core)")
+
+if __name__ == '__main__':
+    benchmark()
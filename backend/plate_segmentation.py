@@ -0,0 +1,149 @@
+"""
+Plate segmentation for FoodVision AI
+Splits a meal photo into food regions by colour clustering a downscaled copy,
+so each item on a plate can be classified and portioned separately
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+# Longest side of the working image; segmentation never touches full resolution
+SEGMENTATION_WORKING_SIZE = 256
+
+# Colour clusters in Lab space (background, plate and a few food colours)
+COLOR_CLUSTERS = 5
+KMEANS_ITERATIONS = 8
+
+# Clusters covering at least this share of the image border are background
+BACKGROUND_BORDER_SHARE = 0.2
+
+# Components whose holes cover at least this share of their outline, mostly
+# filled with other foreground colours, are plates or bowls holding food
+CONTAINER_HOLE_SHARE = 0.1
+CONTAINER_FOOD_SHARE = 0.5
+
+# Regions smaller than this fraction of the image are dropped as noise
+MIN_REGION_FRACTION = 0.02
+MAX_REGIONS = 6
+
+# Padding around each region's bounding box, relative to its size
+REGION_PADDING = 0.1
+
+def downscale(image, working_size=SEGMENTATION_WORKING_SIZE):
+    """RGB array of a PIL image with its longest side at most working_size"""
+    width, height = image.size
+    scale = min(1.0, working_size / max(width, height))
+    if scale < 1.0:
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        image = image.resize(size, reducing_gap=2.0)
+    return np.asarray(image.convert('RGB')), scale
+
+def cluster_colors(rgb, clusters=COLOR_CLUSTERS):
+    """Per-pixel k-means cluster labels over smoothed Lab colours"""
+    lab = cv2.GaussianBlur(cv2.cvtColor(rgb, cv2.COLOR_RGB2LAB), (5, 5), 0)
+    pixels = lab.reshape(-1, 3).astype(np.float32)
+    clusters = min(clusters, len(pixels))
+
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, KMEANS_ITERATIONS, 1.0)
+    cv2.setRNGSeed(0)
+    _, labels, _ = cv2.kmeans(pixels, clusters, None, criteria, 1, cv2.KMEANS_PP_CENTERS)
+    return labels.reshape(rgb.shape[:2]), clusters
+
+def is_container(component, foreground):
+    """True if a component mask surrounds other food, like a plate or bowl"""
+    contours, _ = cv2.findContours(component, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    filled = np.zeros_like(component)
+    cv2.drawContours(filled, contours, -1, 1, thickness=cv2.FILLED)
+
+    holes = (filled > 0) & (component == 0)
+    hole_area = np.count_nonzero(holes)
+    if hole_area < CONTAINER_HOLE_SHARE * np.count_nonzero(filled):
+        return False
+    return np.count_nonzero(holes & foreground) >= CONTAINER_FOOD_SHARE * hole_area
+
+def background_clusters(labels, clusters):
+    """Clusters that dominate the image border (table, tray, plate rim)"""
+    border = np.concatenate([labels[0], labels[-1], labels[1:-1, 0], labels[1:-1, -1]])
+    border_share = np.bincount(border, minlength=clusters) / len(border)
+    return border_share >= BACKGROUND_BORDER_SHARE
+
+def segment_plate(image, working_size=SEGMENTATION_WORKING_SIZE, max_regions=MAX_REGIONS):
+    """Split a PIL image into food regions
+
+    Returns (regions, food_fraction). Each region is a dict with 'box'
+    (left, upper, right, lower in the original image's pixels, ready for
+    Image.crop) and 'area_fraction' (share of the whole image), largest
+    first. food_fraction is the share of the image covered by food, i.e.
+    neither border-dominant background nor plate-like rings.
+    """
+    original_width, original_height = image.size
+    small, scale = downscale(image, working_size)
+
+    labels, clusters = cluster_colors(small)
+    background = background_clusters(labels, clusters)
+
+    foreground = ~background[labels]
+    total = labels.size
+    food_area = 0
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+    regions = []
+    for cluster in np.flatnonzero(~background):
+        mask = (labels == cluster).astype(np.uint8)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+
+        count, components, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        for component, (left, top, width, height, area) in enumerate(stats[1:count], start=1):
+            if area / total < MIN_REGION_FRACTION:
+                food_area += area
+                continue
+
+            window = (slice(top, top + height), slice(left, left + width))
+            if is_container((components[window] == component).astype(np.uint8), foreground[window]):
+                continue
+            food_area += area
+
+            pad_x, pad_y = width * REGION_PADDING, height * REGION_PADDING
+            box = (
+                max(0, int((left - pad_x) / scale)),
+                max(0, int((top - pad_y) / scale)),
+                min(original_width, int(np.ceil((left + width + pad_x) / scale))),
+                min(original_height, int(np.ceil((top + height + pad_y) / scale)))
+            )
+            regions.append({'box': box, 'area_fraction': float(area) / total})
+
+    regions.sort(key=lambda region: region['area_fraction'], reverse=True)
+    return regions[:max_regions], float(food_area) / total
+
+def benchmark(runs=50):
+    """Time segmentation of a synthetic 12 MP plate photo"""
+    rng = np.random.default_rng(0)
+    photo = np.full((3000, 4000, 3), (120, 90, 60), dtype=np.uint8)
+    cv2.circle(photo, (2000, 1500), 1300, (245, 245, 240), -1)
+    cv2.circle(photo, (1600, 1200), 450, (200, 60, 40), -1)
+    cv2.ellipse(photo, (2500, 1800), (500, 300), 30, 0, 360, (230, 200, 90), -1)
+    cv2.circle(photo, (1700, 2100), 300, (60, 150, 50), -1)
+    photo = np.clip(photo + rng.normal(0, 8, photo.shape), 0, 255).astype(np.uint8)
+
+    from PIL import Image
+    image = Image.fromarray(photo)
+
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        regions, food_fraction = segment_plate(image)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    print(f"{len(regions)} regions, food fraction {food_fraction:.2f}")
+    for region in regions:
+        print(f"  box {region['box']} area {region['area_fraction']:.3f}")
+    print(f"Segmentation of a 4000x3000 image: "
+          f"p50 {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms")
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,179 @@
+"""
+Shared SQL for FoodVision AI
+Per-user queries as constant, parameterised statements, and a pool of
+long-lived connections to run them on. sqlite3 keeps prepared statements
+per connection keyed by SQL text, so constant texts on reused connections
+are prepared once instead of on every request. Time windows are bound as
+timestamps computed in Python rather than formatted into the SQL.
+"""
+
+import sqlite3
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# Prepared statements kept per connection (sqlite3's default is 128)
+STATEMENT_CACHE_SIZE = 256
+
+# Idle connections kept per database file
+POOL_MAX_IDLE = 8
+
+def window_start(days=0, seconds=0, now=None):
+    """UTC timestamp days/seconds ago, in the format CURRENT_TIMESTAMP stores"""
+    now = now or datetime.utcnow()
+    return (now - timedelta(days=days, seconds=seconds)).strftime('%Y-%m-%d %H:%M:%S')
+
+class ConnectionPool:
+    """Long-lived connections per database file, lent to one caller at a time"""
+
+    def __init__(self, max_idle=POOL_MAX_IDLE):
+        self.max_idle = max_idle
+        self._idle = defaultdict(list)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self, path):
+        with self._lock:
+            conn = self._idle[path].pop() if self._idle[path] else None
+        if conn is None:
+            conn = sqlite3.connect(path, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
+
+        try:
+            yield conn
+        finally:
+            # Never hand out a connection with someone else's open transaction
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                if len(self._idle[path]) < self.max_idle:
+                    self._idle[path].append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, defaultdict(list)
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+# Users (directory database)
+
+UPDATE_GOALS = '''
+    UPDATE users SET daily_calorie_goal = ?, height = ?, weight = ?,
+                   age = ?, activity_level = ?
+    WHERE id = ?
+'''
+
+# Meals
+
+INSERT_MEAL = '''
+    INSERT INTO meals (user_id, meal_type, image_path, image_hash, total_calories,
+                     total_protein, total_carbs, total_fat, total_fiber)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+INSERT_FOOD_ITEM = '''
+    INSERT INTO food_items (meal_id, food_name, confidence, portion_size,
+                          calories, protein, carbs, fat, fiber)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+DELETE_FAVORITE_FOODS = 'DELETE FROM user_favorite_foods WHERE user_id = ?'
+
+def meal_history_sql(food_items, keyset):
+    """History page query; food_items adds the food names, keyset seeks past a (timestamp, id)"""
+    return '''
+        SELECT m.id, m.meal_type, m.timestamp, m.image_path, m.total_calories,
+               m.total_protein, m.total_carbs, m.total_fat, m.total_fiber,
+               {} as food_names
+        FROM meals m
+        WHERE m.user_id = ? AND m.timestamp >= ? {}
+        ORDER BY m.timestamp DESC, m.id DESC
+        LIMIT ?
+    '''.format(
+        '(SELECT GROUP_CONCAT(fi.food_name) FROM food_items fi WHERE fi.meal_id = m.id)'
+        if food_items else 'NULL',
+        'AND (m.timestamp, m.id) < (?, ?)' if keyset else ''
+    )
+
+# The four history variants, built once so each keeps a single SQL text
+MEAL_HISTORY = {
+    (food_items, keyset): meal_history_sql(food_items, keyset)
+    for food_items in (True, False) for keyset in (True, False)
+}
+
+EXPORT_MEALS = '''
+    SELECT m.*, GROUP_CONCAT(fi.food_name || ':' || fi.calories) as food_items
+    FROM meals m
+    LEFT JOIN food_items fi ON m.id = fi.meal_id
+    WHERE m.user_id = ?
+    GROUP BY m.id
+    ORDER BY m.timestamp DESC
+'''
+
+# Aggregates; every windowed query takes (user_id, window start)
+
+DAILY_CALORIES = '''
+    SELECT DATE(timestamp) as date, SUM(total_calories) as daily_calories
+    FROM meals
+    WHERE user_id = ? AND timestamp >= ?
+    GROUP BY DATE(timestamp)
+    ORDER BY date
+'''
+
+MACRO_TOTALS = '''
+    SELECT SUM(total_protein) as protein, SUM(total_carbs) as carbs,
+           SUM(total_fat) as fat, SUM(total_fiber) as fiber
+    FROM meals
+    WHERE user_id = ? AND timestamp >= ?
+'''
+
+FREQUENT_FOODS = '''
+    SELECT fi.food_name, COUNT(*) as frequency
+    FROM food_items fi
+    JOIN meals m ON fi.meal_id = m.id
+    WHERE m.user_id = ? AND m.timestamp >= ?
+    GROUP BY fi.food_name
+    ORDER BY frequency DESC
+    LIMIT 10
+'''
+
+DAILY_NUTRITION = '''
+    SELECT DATE(timestamp) as date,
+           SUM(total_calories) as calories,
+           SUM(total_protein) as protein,
+           SUM(total_carbs) as carbs,
+           SUM(total_fat) as fat,
+           SUM(total_fiber) as fiber
+    FROM meals
+    WHERE user_id = ? AND timestamp >= ?
+    GROUP BY DATE(timestamp)
+    ORDER BY date DESC
+'''
+
+DAILY_STATS = '''
+    SELECT
+        COALESCE(SUM(total_calories), 0) as calories,
+        COALESCE(SUM(total_protein), 0) as protein,
+        COALESCE(SUM(total_carbs), 0) as carbs,
+        COALESCE(SUM(total_fat), 0) as fat,
+        COALESCE(SUM(total_fiber), 0) as fiber,
+        COUNT(*) as meals_count
+    FROM meals
+    WHERE user_id = ? AND DATE(timestamp) = ?
+'''
+
+# Favorite foods
+
+STORED_FAVORITE_FOODS = '''
+    SELECT foods FROM user_favorite_foods
+    WHERE user_id = ? AND computed_at >= ?
+'''
+
+STORE_FAVORITE_FOODS = '''
+    INSERT OR REPLACE INTO user_favorite_foods (user_id, foods, computed_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+'''
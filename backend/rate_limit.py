@@ -0,0 +1,142 @@
+"""
+Rate limiting for FoodVision AI
+Token buckets for login attempts, per client IP and per account, kept in
+process memory or, to share limits across worker processes, in a small
+SQLite database separate from foodvision.db
+"""
+
+import math
+import sqlite3
+import threading
+import time
+
+# SQLite buckets idle this long have refilled and are deleted
+PURGE_AFTER_SECONDS = 24 * 3600
+
+# Purge once per this many takes, so the table cannot grow without bound
+PURGE_EVERY_TAKES = 1000
+
+class TokenBucket:
+    """Refill rate (tokens per second) and burst capacity of one kind of bucket"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+
+    def take(self, tokens, updated_at, now, cost=1):
+        """Refill then spend; returns (allowed, tokens left, retry_after seconds)
+
+        A negative cost gives tokens back, up to the capacity.
+        """
+        if tokens is None:
+            tokens = self.capacity
+        else:
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+
+        if tokens >= cost:
+            return True, min(self.capacity, tokens - cost), 0
+        return False, tokens, math.ceil((cost - tokens) / self.rate)
+
+class MemoryBucketStore:
+    """Buckets in a dict of key -> (tokens, updated_at), least recently used first"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, bucket, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (None, now))
+            allowed, tokens, retry_after = bucket.take(tokens, updated_at, now, cost)
+            self._buckets[key] = (tokens, now)
+
+            if len(self._buckets) > self.max_keys:
+                # Evict the least recently touched tenth in one go
+                for stale in list(self._buckets)[:self.max_keys // 10]:
+                    del self._buckets[stale]
+        return allowed, retry_after
+
+class SQLiteBucketStore:
+    """Buckets shared by every worker process through one SQLite table"""
+
+    def __init__(self, path='rate_limits.db', purge_every=PURGE_EVERY_TAKES):
+        self.path = path
+        self.purge_every = purge_every
+        self._takes = 0
+        self._takes_lock = threading.Lock()
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, bucket, cost=1):
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?', (key,)
+            ).fetchone()
+            tokens, updated_at = row if row else (None, now)
+            allowed, tokens, retry_after = bucket.take(tokens, updated_at, now, cost)
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                (key, tokens, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        with self._takes_lock:
+            self._takes += 1
+            due = self._takes % self.purge_every == 0
+        if due:
+            self.purge()
+        return allowed, retry_after
+
+    def purge(self, older_than=PURGE_AFTER_SECONDS):
+        """Delete buckets idle long enough to have refilled"""
+        conn = self._connection()
+        conn.execute('DELETE FROM rate_limit_buckets WHERE updated_at < ?', (time.time() - older_than,))
+
+class RateLimiter:
+    """Named limits checked against one bucket store"""
+
+    def __init__(self, store, limits):
+        self.store = store
+        self.limits = limits
+
+    def check(self, *scoped_keys):
+        """Spend one token from each (limit name, key) bucket in order
+
+        Returns (allowed, retry_after). Stops at the first refusal, so a
+        client blocked by its IP limit does not also drain the per-account
+        bucket of whoever it is attacking.
+        """
+        for name, key in scoped_keys:
+            allowed, retry_after = self.store.take(f'{name}:{key}', self.limits[name])
+            if not allowed:
+                return False, retry_after
+        return True, 0
+
+    def refund(self, *scoped_keys):
+        """Give back the token check() spent from each (limit name, key) bucket"""
+        for name, key in scoped_keys:
+            self.store.take(f'{name}:{key}', self.limits[name], cost=-1)
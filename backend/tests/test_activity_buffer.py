@@ -0,0 +1,85 @@
+"""
+Tests for batched last_login writes
+"""
+
+import sqlite3
+
+import pytest
+
+from activity_buffer import ActivityBuffer
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'foodvision.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, last_login TIMESTAMP)')
+    conn.executemany('INSERT INTO users (id) VALUES (?)', [(1,), (2,), (3,)])
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture
+def flushed():
+    return []
+
+@pytest.fixture
+def buffer(database, flushed):
+    # A long interval keeps the background thread out of the way
+    return ActivityBuffer(lambda: sqlite3.connect(database), flush_interval=3600, on_flush=flushed.append)
+
+def last_logins(database):
+    conn = sqlite3.connect(database)
+    try:
+        return dict(conn.execute('SELECT id, last_login FROM users'))
+    finally:
+        conn.close()
+
+def test_nothing_is_written_until_flush(buffer, database):
+    buffer.record(1, 'last_login', '2024-03-10 12:00:00')
+    assert last_logins(database)[1] is None
+    assert buffer.pending(1) == {'last_login': '2024-03-10 12:00:00'}
+
+def test_flush_writes_the_newest_value_per_user(buffer, database):
+    buffer.record(1, 'last_login', '2024-03-10 12:00:00')
+    buffer.record(1, 'last_login', '2024-03-10 12:05:00')
+    buffer.record(2, 'last_login', '2024-03-10 12:01:00')
+
+    assert buffer.flush() == 2
+    assert last_logins(database) == {1: '2024-03-10 12:05:00', 2: '2024-03-10 12:01:00', 3: None}
+    assert buffer.pending(1) == {}
+    assert buffer.flush() == 0
+
+def test_flushed_users_are_invalidated(buffer, flushed):
+    buffer.record(1, 'last_login', '2024-03-10 12:00:00')
+    buffer.record(3, 'last_login', '2024-03-10 12:00:00')
+    buffer.flush()
+    assert sorted(flushed) == [1, 3]
+
+def test_failed_flush_keeps_values_for_the_next_one(database, flushed):
+    locked = True
+
+    def connect():
+        if locked:
+            raise sqlite3.OperationalError('database is locked')
+        return sqlite3.connect(database)
+
+    buffer = ActivityBuffer(connect, flush_interval=3600, on_flush=flushed.append)
+    buffer.record(1, 'last_login', '2024-03-10 12:00:00')
+
+    assert buffer.flush() == 0
+    assert flushed == []
+    assert buffer.pending(1) == {'last_login': '2024-03-10 12:00:00'}
+
+    locked = False
+    assert buffer.flush() == 1
+    assert last_logins(database)[1] == '2024-03-10 12:00:00'
+
+def test_restore_does_not_overwrite_newer_values(buffer):
+    buffer.record(1, 'last_login', '2024-03-10 12:05:00')
+    buffer._restore({'last_login': {1: '2024-03-10 12:00:00', 2: '2024-03-10 12:00:00'}})
+    assert buffer.pending(1) == {'last_login': '2024-03-10 12:05:00'}
+    assert buffer.pending(2) == {'last_login': '2024-03-10 12:00:00'}
+
+def test_unbuffered_columns_are_rejected(buffer):
+    with pytest.raises(ValueError):
+        buffer.record(1, 'password_hash', 'x')
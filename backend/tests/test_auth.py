@@ -0,0 +1,163 @@
+"""
+Tests for the auth blueprint's login, password rehashing, rate limits and
+token revocation
+"""
+
+import hashlib
+import sqlite3
+
+import pytest
+from flask import Flask
+
+import auth
+from password_hashing import encode_hash, needs_rehash
+
+EMAIL = 'owner@example.com'
+PASSWORD = 'correct horse battery'
+
+# The users table as create_database.py creates it
+USERS_TABLE = '''
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        daily_calorie_goal INTEGER DEFAULT 2000,
+        height REAL,
+        weight REAL,
+        age INTEGER,
+        gender TEXT DEFAULT 'other',
+        activity_level TEXT DEFAULT 'moderate',
+        dietary_restrictions TEXT DEFAULT '[]',
+        health_conditions TEXT DEFAULT '[]',
+        fitness_goals TEXT DEFAULT '[]',
+        timezone TEXT DEFAULT 'UTC',
+        preferred_units TEXT DEFAULT 'metric',
+        privacy_settings TEXT DEFAULT '{}',
+        notification_settings TEXT DEFAULT '{}',
+        subscription_tier TEXT DEFAULT 'free',
+        last_login TIMESTAMP,
+        is_active BOOLEAN DEFAULT 1,
+        token_version INTEGER DEFAULT 0
+    )
+'''
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # auth opens foodvision.db relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    conn = sqlite3.connect('foodvision.db')
+    conn.execute(USERS_TABLE)
+    conn.commit()
+    conn.close()
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test-secret-key-of-reasonable-length'
+    app.register_blueprint(auth.auth_bp, url_prefix='/api/auth')
+    auth.user_cache.clear()
+
+    yield app.test_client()
+
+    # Write buffered last_login values while foodvision.db is still here
+    auth.activity_buffer.flush()
+    auth.user_cache.clear()
+
+def add_user(password_hash, email=EMAIL):
+    conn = sqlite3.connect('foodvision.db')
+    conn.execute(
+        'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+        (email.split('@')[0], email, password_hash)
+    )
+    conn.commit()
+    conn.close()
+
+def stored_hash(email=EMAIL):
+    conn = sqlite3.connect('foodvision.db')
+    try:
+        return conn.execute('SELECT password_hash FROM users WHERE email = ?', (email,)).fetchone()[0]
+    finally:
+        conn.close()
+
+def login(client, password=PASSWORD, ip='192.0.2.1'):
+    return client.post(
+        '/api/auth/login', json={'email': EMAIL, 'password': password}, environ_base={'REMOTE_ADDR': ip}
+    )
+
+def test_login_upgrades_legacy_sha256_hash(client):
+    add_user(hashlib.sha256(PASSWORD.encode()).hexdigest())
+
+    assert login(client).status_code == 200
+    upgraded = stored_hash()
+    assert upgraded.startswith('scrypt$')
+    assert not needs_rehash(upgraded)
+
+    # The upgraded hash keeps working and is not rewritten again
+    assert login(client).status_code == 200
+    assert stored_hash() == upgraded
+
+def test_login_upgrades_outdated_scrypt_cost(client):
+    add_user(encode_hash(PASSWORD, n=2 ** 10))
+
+    assert login(client).status_code == 200
+    assert not needs_rehash(stored_hash())
+
+def test_failed_login_leaves_legacy_hash_alone(client):
+    legacy = hashlib.sha256(PASSWORD.encode()).hexdigest()
+    add_user(legacy)
+
+    assert login(client, password='wrong password').status_code == 401
+    assert stored_hash() == legacy
+
+def bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+def test_password_change_revokes_earlier_tokens(client):
+    add_user(encode_hash(PASSWORD))
+    old_token = login(client).get_json()['token']
+    assert client.get('/api/auth/profile', headers=bearer(old_token)).status_code == 200
+
+    response = client.post(
+        '/api/auth/change-password', headers=bearer(old_token),
+        json={'current_password': PASSWORD, 'new_password': 'a new password'}
+    )
+    assert response.status_code == 200
+    new_token = response.get_json()['token']
+
+    response = client.get('/api/auth/profile', headers=bearer(old_token))
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Token has been revoked'
+    assert client.get('/api/auth/profile', headers=bearer(new_token)).status_code == 200
+
+def test_deactivation_revokes_tokens(client):
+    add_user(encode_hash(PASSWORD))
+    token = login(client).get_json()['token']
+
+    response = client.post('/api/auth/deactivate', headers=bearer(token), json={'password': PASSWORD})
+    assert response.status_code == 200
+    assert client.get('/api/auth/profile', headers=bearer(token)).status_code == 401
+
+def test_failed_logins_from_one_ip_do_not_lock_out_the_owner(client):
+    add_user(encode_hash(PASSWORD))
+    attacker, owner = '203.0.113.9', '198.51.100.7'
+
+    codes = [login(client, 'wrong password', ip=attacker).status_code for _ in range(6)]
+    assert codes == [401] * 5 + [429]
+    assert login(client, ip=attacker).status_code == 429
+
+    assert login(client, ip=owner).status_code == 200
+
+def test_successful_logins_do_not_drain_the_account_bucket(client):
+    add_user(encode_hash(PASSWORD))
+    codes = [login(client).status_code for _ in range(8)]
+    assert codes == [200] * 8
+
+def test_rate_limited_login_reports_retry_after(client):
+    add_user(encode_hash(PASSWORD))
+    for _ in range(5):
+        login(client, 'wrong password')
+
+    response = login(client)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
@@ -0,0 +1,74 @@
+"""
+Tests for the flat and IVF food embedding indexes
+"""
+
+import numpy as np
+import pytest
+
+from food_embeddings import FoodEmbeddingIndex, IVF_MIN_VECTORS, normalize_rows
+
+DIMENSION = 32
+FOODS = 64
+
+def clustered_vectors(count, seed):
+    """Vectors scattered around one random direction per food, with their labels"""
+    rng = np.random.default_rng(seed)
+    centers = normalize_rows(np.random.default_rng(0).normal(size=(FOODS, DIMENSION)))
+    foods = rng.integers(0, FOODS, size=count)
+    vectors = centers[foods] + 0.15 * rng.normal(size=(count, DIMENSION))
+    return vectors.astype(np.float32), [f'food_{food}' for food in foods]
+
+def brute_force(index, query, k):
+    vectors = np.asarray(index.vectors, dtype=np.float32)
+    similarities = vectors @ normalize_rows(query.reshape(1, -1))[0]
+    return np.argsort(similarities)[::-1][:k]
+
+@pytest.fixture(scope='module')
+def ivf_index():
+    vectors, labels = clustered_vectors(IVF_MIN_VECTORS + 1000, seed=1)
+    return FoodEmbeddingIndex.build(vectors, labels)
+
+@pytest.fixture(scope='module')
+def queries():
+    vectors, labels = clustered_vectors(100, seed=2)
+    return vectors, labels
+
+def test_large_indexes_use_ivf(ivf_index):
+    assert ivf_index.centroids is not None
+    assert len(ivf_index.centroids) == int(np.sqrt(len(ivf_index)))
+    assert ivf_index.vectors.dtype == np.float16
+
+def test_ivf_nearest_neighbour_matches_brute_force(ivf_index, queries):
+    vectors, _ = queries
+    hits = sum(ivf_index.search(query, k=1)[0][0] == brute_force(ivf_index, query, 1)[0] for query in vectors)
+    assert hits / len(vectors) >= 0.95
+
+def test_probing_every_list_is_exact(ivf_index, queries):
+    vectors, _ = queries
+    for query in vectors[:20]:
+        ids, similarities = ivf_index.search(query, k=5, nprobe=len(ivf_index.centroids))
+        assert list(ids) == list(brute_force(ivf_index, query, 5))
+        assert list(similarities) == sorted(similarities, reverse=True)
+
+def test_flat_index_is_exact():
+    vectors, labels = clustered_vectors(500, seed=3)
+    index = FoodEmbeddingIndex.build(vectors, labels)
+    assert index.centroids is None
+
+    query = clustered_vectors(1, seed=4)[0][0]
+    assert list(index.search(query, k=5)[0]) == list(brute_force(index, query, 5))
+
+def test_predicted_food_matches_query_food(ivf_index, queries):
+    vectors, labels = queries
+    correct = sum(ivf_index.predict_foods(query)[0][0] == label for query, label in zip(vectors, labels))
+    assert correct / len(vectors) >= 0.95
+
+def test_added_references_are_found(tmp_path, ivf_index, queries):
+    ivf_index.save(str(tmp_path / 'index'))
+    index = FoodEmbeddingIndex.load(str(tmp_path / 'index'))
+    assert len(index) == len(ivf_index)
+
+    new_food = normalize_rows(np.ones((1, DIMENSION)))
+    index.add(new_food, ['new_food'])
+    assert len(index) == len(ivf_index) + 1
+    assert index.predict_foods(new_food[0], k=1)[0][0] == 'new_food'
@@ -0,0 +1,86 @@
+"""
+Tests for the precomputed ImageNet class -> food name table
+"""
+
+import json
+import os
+import re
+
+import pytest
+
+from food_labels import FoodLabelTable, load_food_label_table, display_name, group_classes_by_food
+
+NUTRITION_DATA_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'nutrition_data.json'
+)
+
+table = load_food_label_table()
+
+with open(NUTRITION_DATA_FILE, 'r') as f:
+    nutrition_keys = set(json.load(f))
+
+def test_table_covers_all_imagenet_classes():
+    assert len(table) == 1000
+    assert len(table.foods) == len(table.is_food) == len(table.wnids) == 1000
+
+def test_classes_are_in_wordnet_id_order():
+    # Keras orders ImageNet outputs by sorted WordNet id
+    assert table.wnids == sorted(table.wnids)
+    assert len(set(table.wnids)) == 1000
+
+@pytest.mark.parametrize('class_index', range(1000))
+def test_every_class_maps_to_a_usable_name(class_index):
+    label = table.labels[class_index]
+    food = table.food_for_class(class_index)
+
+    assert re.match(r'^n\d{8}$', table.wnids[class_index])
+    assert food
+    if table.is_food[class_index]:
+        assert re.match(r'^[a-z_]+$', food)
+    else:
+        assert food == display_name(label)
+    assert table.food_for_label(label) == food
+
+@pytest.mark.parametrize('label, food', [
+    ('pineapple', 'pineapple'),
+    ('custard_apple', 'custard_apple'),
+    ('Granny_Smith', 'apple'),
+    ('cheeseburger', 'hamburger'),
+    ('hotdog', 'hot_dog'),
+    ('strawberry', 'strawberries'),
+    ('mushroom', 'mushrooms'),
+    ('acorn_squash', 'squash'),
+])
+def test_food_classes_avoid_substring_mismatches(label, food):
+    assert table.food_for_label(label) == food
+
+@pytest.mark.parametrize('label', ['plate', 'dining_table', 'tray', 'restaurant', 'acorn', 'goldfish', 'soup_bowl'])
+def test_non_food_classes_are_not_food(label):
+    class_index = table.labels.index(label)
+    assert not table.is_food[class_index]
+    assert table.food_for_label(label) == display_name(label)
+
+def test_unknown_label_falls_back_to_readable_name():
+    assert table.food_for_label('Some_New_Label') == 'some new label'
+
+def test_food_indices_match_flags():
+    assert table.food_indices == [i for i in range(1000) if table.is_food[i]]
+    assert any(table.foods[i] in nutrition_keys for i in table.food_indices)
+
+def test_classes_sharing_a_food_are_grouped():
+    names, group_of_class = group_classes_by_food(table, table.food_indices)
+    assert len(group_of_class) == len(table.food_indices)
+    assert len(names) == len(set(names)) < len(table.food_indices)
+    for class_index, group in zip(table.food_indices, group_of_class):
+        assert names[group] == table.food_for_class(class_index)
+
+def test_empty_table_degrades_to_readable_class_names():
+    # What app.py falls back to when imagenet_food_map.json is missing or corrupt
+    empty = FoodLabelTable([])
+    assert empty.food_indices == []
+    assert empty.label_for_class(5) == 'class_5'
+    assert empty.food_for_class(5) == 'class 5'
+
+    names, group_of_class = group_classes_by_food(empty, range(1000))
+    assert len(names) == 1000
+    assert group_of_class == list(range(1000))
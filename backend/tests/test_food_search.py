@@ -0,0 +1,60 @@
+"""
+Tests for the prefix and trigram food search index
+"""
+
+import pytest
+
+from food_search import FoodSearchIndex, normalize_food_name
+
+FOODS = ['chicken_breast', 'chicken_curry', 'fried_rice', 'rice', 'apple', 'apple_pie', 'chocolate_cake', 'pizza']
+
+@pytest.fixture
+def index():
+    return FoodSearchIndex(FOODS)
+
+def test_names_are_normalized():
+    assert normalize_food_name('Apple_Pie') == 'apple pie'
+    assert normalize_food_name('  hot-dog  ') == 'hot dog'
+
+def test_exact_name_ranks_first(index):
+    assert index.search('rice') == ['rice', 'fried_rice']
+    assert index.search('apple') == ['apple', 'apple_pie']
+
+def test_word_prefix_matches(index):
+    assert set(index.search('chick')) == {'chicken_breast', 'chicken_curry'}
+    assert index.search('ric')[0] == 'rice'
+    assert index.search('choc') == ['chocolate_cake']
+
+@pytest.mark.parametrize('query, food', [
+    ('chiken', 'chicken_curry'),
+    ('aple', 'apple'),
+    ('piza', 'pizza'),
+    ('choclate', 'chocolate_cake'),
+])
+def test_misspelt_words_match_by_trigrams(index, query, food):
+    assert food in index.search(query)
+
+def test_every_query_word_must_match(index):
+    assert index.search('apple pie') == ['apple_pie']
+    assert index.search('curry chicken') == ['chicken_curry']
+    assert index.search('apple curry') == []
+
+@pytest.mark.parametrize('query', ['xyz', 'zzzz', 'q'])
+def test_unrelated_queries_miss(index, query):
+    assert index.search(query) == []
+
+def test_empty_query_lists_names_alphabetically(index):
+    assert index.search('', limit=3) == ['apple', 'apple_pie', 'chicken_breast']
+
+def test_added_names_are_searchable(index):
+    index.add('pad_thai')
+    index.add('pad_thai')
+    assert len(index) == len(FOODS) + 1
+    assert index.search('thai') == ['pad_thai']
+    assert index.search('pad') == ['pad_thai']
+
+def test_rebuild_replaces_contents(index):
+    index.rebuild(['sushi'])
+    assert len(index) == 1
+    assert index.search('rice') == []
+    assert index.search('sush') == ['sushi']
@@ -0,0 +1,50 @@
+"""
+Tests for the fused image enhancement against the PIL ImageEnhance chain
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_enhancement import enhance_image, enhance_image_pil
+
+# Intermediate rounding and edge handling differ between the two pipelines;
+# the fused version only mirrors the PIL chain at the upload factors, since
+# PIL clips between its passes
+MAX_PIXEL_DIFFERENCE = 6
+MAX_MEAN_DIFFERENCE = 0.6
+
+def photo(width=320, height=240, seed=0):
+    """Smooth random colours with sensor-like noise"""
+    rng = np.random.default_rng(seed)
+    base = Image.fromarray(rng.integers(0, 256, size=(24, 32, 3), dtype=np.uint8))
+    smooth = np.asarray(base.resize((width, height), Image.BICUBIC), dtype=np.int16)
+    return Image.fromarray(np.clip(smooth + rng.integers(-6, 7, size=smooth.shape), 0, 255).astype(np.uint8))
+
+def difference(image):
+    fused = np.asarray(enhance_image(image), dtype=np.int16)
+    reference = np.asarray(enhance_image_pil(image), dtype=np.int16)
+    assert fused.shape == reference.shape
+    return np.abs(fused - reference)
+
+@pytest.mark.parametrize('size, seed', [((224, 224), 0), ((320, 240), 1), ((97, 61), 2), ((1024, 768), 3)])
+def test_matches_pil_chain(size, seed):
+    diff = difference(photo(*size, seed=seed))
+    assert diff.max() <= MAX_PIXEL_DIFFERENCE
+    assert diff.mean() <= MAX_MEAN_DIFFERENCE
+    # Off by more than a level or two only in rare pixels
+    assert (diff > 2).mean() < 0.01
+
+@pytest.mark.parametrize('mode', ['L', 'RGBA', 'P'])
+def test_other_modes_are_converted_to_rgb(mode):
+    image = photo().convert(mode)
+    enhanced = enhance_image(image)
+    assert enhanced.mode == 'RGB'
+    assert enhanced.size == image.size
+    assert difference(image).max() <= MAX_PIXEL_DIFFERENCE
+
+def test_flat_image_stays_flat():
+    image = Image.new('RGB', (64, 48), (200, 100, 50))
+    enhanced = np.asarray(enhance_image(image))
+    assert (enhanced == enhanced[0, 0]).all()
+    assert difference(image).max() <= 2
@@ -0,0 +1,49 @@
+"""
+Tests for pulling JSON objects out of streamed model output
+"""
+
+import json
+
+import pytest
+
+from json_stream import iter_json_objects
+
+SUGGESTIONS = [
+    {'name': 'Oatmeal {with} berries', 'calories': 320, 'macros': {'protein': 10, 'carbs': 54}},
+    {'name': 'Say "cheese" omelette', 'calories': 410, 'tags': ['high-protein', '}{'], 'notes': 'back\\slash'},
+    {'name': 'Salad', 'calories': 180, 'ingredients': [{'item': 'lettuce'}, {'item': 'tomato'}]},
+]
+
+TEXT = 'Here are some ideas:\n```json\n' + json.dumps(SUGGESTIONS, indent=2) + '\n```\nEnjoy!'
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, len(TEXT)])
+def test_objects_survive_any_chunking(size):
+    assert list(iter_json_objects(chunked(TEXT, size))) == SUGGESTIONS
+
+def test_objects_are_yielded_as_soon_as_they_close():
+    stream = iter(['[{"name": "a"', '}, {"name":', ' "b"}', ', {"name": "c"'])
+    objects = iter_json_objects(stream)
+
+    assert next(objects) == {'name': 'a'}
+    assert next(objects) == {'name': 'b'}
+    # The third object never closes
+    assert list(objects) == []
+
+def test_nested_objects_are_yielded_once_with_their_parent():
+    assert list(iter_json_objects(['{"a": {"b": {"c": 1}}, "d": 2}'])) == [{'a': {'b': {'c': 1}}, 'd': 2}]
+
+def test_braces_and_escaped_quotes_inside_strings_are_ignored():
+    text = '{"text": "a } b { c \\" } d", "n": 1}'
+    assert list(iter_json_objects(chunked(text, 1))) == [{'text': 'a } b { c " } d', 'n': 1}]
+
+def test_escaped_backslash_before_a_closing_quote():
+    assert list(iter_json_objects(['{"path": "C:\\\\"}', '{"n": 2}'])) == [{'path': 'C:\\'}, {'n': 2}]
+
+def test_malformed_objects_are_skipped():
+    assert list(iter_json_objects(['{"a": 1,}', ' {"b": 2}'])) == [{'b': 2}]
+
+def test_text_without_objects_yields_nothing():
+    assert list(iter_json_objects(['Sorry, ', 'no suggestions } today.'])) == []
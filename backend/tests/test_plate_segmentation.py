@@ -0,0 +1,61 @@
+"""
+Tests for colour-clustering plate segmentation
+"""
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from plate_segmentation import segment_plate
+
+WIDTH, HEIGHT = 800, 600
+TABLE, PLATE = (120, 90, 60), (245, 245, 240)
+
+# (centre, radius, colour) of each food on the plate
+BLOBS = [((320, 240), 90, (200, 60, 40)), ((490, 370), 80, (60, 150, 50))]
+
+def photo(blobs=BLOBS):
+    """Noisy synthetic photo of a white plate on a brown table"""
+    pixels = np.full((HEIGHT, WIDTH, 3), TABLE, dtype=np.uint8)
+    cv2.circle(pixels, (WIDTH // 2, HEIGHT // 2), 260, PLATE, -1)
+    for centre, radius, colour in blobs:
+        cv2.circle(pixels, centre, radius, colour, -1)
+    noise = np.random.default_rng(0).normal(0, 8, pixels.shape)
+    return Image.fromarray(np.clip(pixels + noise, 0, 255).astype(np.uint8))
+
+def contains(box, point):
+    left, upper, right, lower = box
+    return left <= point[0] < right and upper <= point[1] < lower
+
+def test_two_foods_on_a_plate_give_two_regions():
+    regions, food_fraction = segment_plate(photo())
+
+    assert len(regions) == 2
+    for region, (centre, radius, _) in zip(regions, BLOBS):
+        # Largest first, boxes in original-image pixels around each food
+        assert contains(region['box'], centre)
+        assert region['area_fraction'] == pytest.approx(np.pi * radius ** 2 / (WIDTH * HEIGHT), rel=0.25)
+    assert food_fraction == pytest.approx(sum(region['area_fraction'] for region in regions), rel=0.25)
+
+def test_one_food_gives_one_region():
+    regions, _ = segment_plate(photo(BLOBS[:1]))
+    assert len(regions) == 1
+    assert contains(regions[0]['box'], BLOBS[0][0])
+
+def test_boxes_stay_inside_the_image():
+    image = photo()
+    for region in segment_plate(image)[0]:
+        left, upper, right, lower = region['box']
+        assert 0 <= left < right <= image.width
+        assert 0 <= upper < lower <= image.height
+
+def test_bare_table_has_no_regions():
+    regions, food_fraction = segment_plate(Image.new('RGB', (300, 200), TABLE))
+    assert regions == []
+    assert food_fraction == 0.0
+
+def test_max_regions_caps_the_result():
+    regions, _ = segment_plate(photo(), max_regions=1)
+    assert len(regions) == 1
+    assert contains(regions[0]['box'], BLOBS[0][0])
@@ -0,0 +1,86 @@
+"""
+Tests for the shared parameterised queries and the connection pool
+"""
+
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import queries
+from user_data import USER_DATA_SCHEMA, SingleDatabaseRouter, UserDataRepository
+
+ITEMS = [{'food_name': 'pizza', 'calories': 285, 'protein': 12}, {'food_name': 'salad', 'calories': 90}]
+
+@pytest.fixture
+def repository(tmp_path):
+    path = str(tmp_path / 'foodvision.db')
+    conn = sqlite3.connect(path)
+    for statement in USER_DATA_SCHEMA:
+        conn.execute(statement)
+    conn.commit()
+    conn.close()
+
+    repository = UserDataRepository(SingleDatabaseRouter(path))
+    for _ in range(3):
+        repository.save_meal(1, 'lunch', '', None, ITEMS)
+    yield repository
+    repository.pool.close()
+
+def prepared_statements(repository):
+    """{sql: times run} for the statements prepared on the pooled connection"""
+    with repository.connection(1) as conn:
+        try:
+            rows = conn.execute('SELECT sql, run FROM sqlite_stmt').fetchall()
+        except sqlite3.OperationalError:
+            pytest.skip('SQLite built without the sqlite_stmt virtual table')
+    return dict(rows)
+
+def test_window_start_matches_sqlite_datetime():
+    now = datetime(2024, 3, 10, 12, 30, 5)
+    assert queries.window_start(7, now=now) == '2024-03-03 12:30:05'
+    assert queries.window_start(seconds=3600, now=now) == '2024-03-10 11:30:05'
+
+    conn = sqlite3.connect(':memory:')
+    expected = conn.execute("SELECT datetime('now', '-30 days')").fetchone()[0]
+    assert abs(
+        datetime.fromisoformat(queries.window_start(30)) - datetime.fromisoformat(expected)
+    ).total_seconds() <= 1
+
+def test_windowed_queries_use_one_statement_for_every_day_count(repository):
+    for days in (7, 30, 365, 7):
+        repository.analytics(1, days)
+        repository.daily_nutrition(1, days)
+        repository.meal_history_page(1, days, 10)
+
+    statements = prepared_statements(repository)
+    for sql in (queries.DAILY_CALORIES, queries.MACRO_TOTALS, queries.DAILY_NUTRITION,
+                queries.MEAL_HISTORY[(True, False)]):
+        # Prepared once and reused: four runs of the same statement
+        assert statements[sql] == 4
+    assert not any('365' in sql for sql in statements)
+
+def test_statements_are_reused_across_requests(repository):
+    repository.analytics(1, 7)
+    runs = prepared_statements(repository)[queries.FREQUENT_FOODS]
+    repository.analytics(1, 14)
+    assert prepared_statements(repository)[queries.FREQUENT_FOODS] == runs + 1
+    assert len(repository.pool._idle[repository.router.database_for(1)]) == 1
+
+def test_window_excludes_older_meals(repository):
+    with repository.connection(1) as conn:
+        conn.execute('UPDATE meals SET timestamp = ? WHERE id = 1', (queries.window_start(40),))
+        conn.commit()
+
+    daily, macros, foods = repository.analytics(1, 30)
+    assert sum(row[1] for row in daily) == 2 * 375
+    assert dict(foods) == {'pizza': 2, 'salad': 2}
+
+    daily, macros, foods = repository.analytics(1, 60)
+    assert sum(row[1] for row in daily) == 3 * 375
+    assert len(repository.meal_history_page(1, 30, 10)) == 2
+
+def test_pool_rolls_back_unfinished_transactions(repository):
+    with repository.connection(1) as conn:
+        conn.execute('DELETE FROM meals')
+    assert len(repository.meal_history_page(1, 7, 10)) == 3
@@ -0,0 +1,115 @@
+"""
+Tests for the token-bucket rate limiter and its bucket stores
+"""
+
+import pytest
+
+import rate_limit
+from rate_limit import MemoryBucketStore, RateLimiter, SQLiteBucketStore, TokenBucket
+
+# One token every 10 seconds, bursts of 3
+BUCKET = TokenBucket(rate=0.1, capacity=3)
+
+class Clock:
+    """Stands in for the time module inside rate_limit"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    return clock
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path, clock):
+    if request.param == 'memory':
+        return MemoryBucketStore()
+    return SQLiteBucketStore(str(tmp_path / 'rate_limits.db'))
+
+def test_new_bucket_starts_full():
+    assert BUCKET.take(None, 0, 0) == (True, 2, 0)
+
+def test_refill_is_capped_at_capacity():
+    allowed, tokens, _ = BUCKET.take(0, updated_at=0, now=1000)
+    assert allowed
+    assert tokens == BUCKET.capacity - 1
+
+def test_retry_after_is_time_to_the_next_token():
+    assert BUCKET.take(0.25, updated_at=0, now=0) == (False, 0.25, 8)
+    assert BUCKET.take(0.25, updated_at=0, now=5) == (False, 0.75, 3)
+
+def test_negative_cost_refunds_up_to_capacity():
+    assert BUCKET.take(1, 0, 0, cost=-1) == (True, 2, 0)
+    assert BUCKET.take(3, 0, 0, cost=-1) == (True, 3, 0)
+
+def test_store_allows_a_burst_then_refuses(store, clock):
+    assert [store.take('ip', BUCKET)[0] for _ in range(4)] == [True, True, True, False]
+    assert store.take('ip', BUCKET) == (False, 10)
+
+    clock.now += 10
+    assert store.take('ip', BUCKET) == (True, 0)
+    assert store.take('ip', BUCKET)[0] is False
+
+def test_store_keys_are_independent(store):
+    for _ in range(3):
+        store.take('a', BUCKET)
+    assert store.take('a', BUCKET)[0] is False
+    assert store.take('b', BUCKET)[0] is True
+
+def test_sqlite_buckets_are_shared_between_stores(tmp_path, clock):
+    path = str(tmp_path / 'rate_limits.db')
+    first, second = SQLiteBucketStore(path), SQLiteBucketStore(path)
+    for _ in range(3):
+        first.take('ip', BUCKET)
+    assert second.take('ip', BUCKET)[0] is False
+
+def test_purge_deletes_only_idle_buckets(tmp_path, clock):
+    store = SQLiteBucketStore(str(tmp_path / 'rate_limits.db'))
+    store.take('old', BUCKET)
+    clock.now += 2 * 24 * 3600
+    store.take('recent', BUCKET)
+
+    store.purge()
+    keys = [row[0] for row in store._connection().execute('SELECT key FROM rate_limit_buckets')]
+    assert keys == ['recent']
+
+def test_take_purges_every_nth_call(tmp_path, clock):
+    store = SQLiteBucketStore(str(tmp_path / 'rate_limits.db'), purge_every=3)
+    store.take('old', BUCKET)
+    clock.now += 2 * 24 * 3600
+
+    count = lambda: store._connection().execute('SELECT COUNT(*) FROM rate_limit_buckets').fetchone()[0]
+    store.take('a', BUCKET)
+    assert count() == 2
+    store.take('b', BUCKET)
+    assert count() == 2
+
+def test_memory_store_evicts_least_recently_used(clock):
+    store = MemoryBucketStore(max_keys=10)
+    for key in range(11):
+        store.take(key, BUCKET)
+    assert 0 not in store._buckets
+    assert len(store._buckets) == 10
+
+def test_limiter_stops_at_the_first_refusal(store):
+    limiter = RateLimiter(store, {'ip': TokenBucket(0.1, 1), 'account': BUCKET})
+    assert limiter.check(('ip', '1.2.3.4'), ('account', 'a@b.c')) == (True, 0)
+    assert limiter.check(('ip', '1.2.3.4'), ('account', 'a@b.c')) == (False, 10)
+
+    # The refused IP did not spend from the account bucket
+    assert [limiter.check(('account', 'a@b.c'))[0] for _ in range(3)] == [True, True, False]
+
+def test_refund_returns_the_spent_token(store):
+    limiter = RateLimiter(store, {'account': BUCKET})
+    for _ in range(3):
+        assert limiter.check(('account', 'a@b.c'))[0]
+        limiter.refund(('account', 'a@b.c'))
+    assert [limiter.check(('account', 'a@b.c'))[0] for _ in range(4)] == [True, True, True, False]
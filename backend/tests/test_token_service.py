@@ -0,0 +1,90 @@
+"""
+Tests for JWT issuing, kid rotation and the verified-token cache
+"""
+
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+
+import token_service
+from token_service import TokenService, derive_kid
+
+OLD_KEY = 'old-signing-key-0123456789abcdef'
+NEW_KEY = 'new-signing-key-0123456789abcdef'
+
+@pytest.fixture
+def service():
+    return TokenService({'old': OLD_KEY, 'new': NEW_KEY}, legacy_key=OLD_KEY)
+
+def test_tokens_are_signed_with_the_active_kid(service):
+    token = service.issue({'user_id': 1})
+    assert jwt.get_unverified_header(token)['kid'] == 'new'
+    assert service.verify(token)['user_id'] == 1
+
+def test_tokens_from_a_retired_kid_still_verify(service):
+    old_token = TokenService({'old': OLD_KEY}).issue({'user_id': 1})
+    assert service.verify(old_token)['user_id'] == 1
+
+def test_unknown_kid_is_rejected(service):
+    token = TokenService({'gone': 'gone-signing-key-0123456789abcdef'}).issue({'user_id': 1})
+    assert service.verify(token) is None
+
+def test_tokens_without_a_kid_use_the_legacy_key(service):
+    exp = datetime.utcnow() + timedelta(hours=1)
+    assert service.verify(jwt.encode({'user_id': 1, 'exp': exp}, OLD_KEY, algorithm='HS256'))['user_id'] == 1
+    assert service.verify(jwt.encode({'user_id': 1, 'exp': exp}, NEW_KEY, algorithm='HS256')) is None
+
+def test_tampered_and_expired_tokens_are_rejected(service):
+    token = service.issue({'user_id': 1})
+    assert service.verify(token[:-2] + ('AA' if token[-2:] != 'AA' else 'BB')) is None
+
+    expired = jwt.encode(
+        {'user_id': 1, 'exp': datetime.utcnow() - timedelta(seconds=1)}, NEW_KEY,
+        algorithm='HS256', headers={'kid': 'new'}
+    )
+    assert service.verify(expired) is None
+    assert service.metrics()['invalid'] == 2
+
+def test_verified_tokens_are_cached(service):
+    token = service.issue({'user_id': 1})
+    for _ in range(3):
+        assert service.verify(token)['user_id'] == 1
+
+    metrics = service.metrics()
+    assert (metrics['cache_misses'], metrics['cache_hits']) == (1, 2)
+    assert metrics['cached_tokens'] == 1
+    assert metrics['latency_ms']['samples'] == 3
+
+def test_cached_claims_are_copies(service):
+    token = service.issue({'user_id': 1})
+    service.verify(token)['user_id'] = 2
+    assert service.verify(token)['user_id'] == 1
+
+def test_cache_is_bounded(service, monkeypatch):
+    monkeypatch.setattr(token_service, 'VERIFIED_CACHE_MAX', 3)
+    tokens = [service.issue({'user_id': user_id}) for user_id in range(5)]
+    for token in tokens:
+        service.verify(token)
+    assert service.metrics()['cached_tokens'] == 3
+
+def test_config_defaults_to_secret_key():
+    service = TokenService.from_config({'SECRET_KEY': OLD_KEY})
+    assert service.active_kid == derive_kid(OLD_KEY)
+    assert service.verify(service.issue({'user_id': 1}))['user_id'] == 1
+
+def test_config_rotation_keeps_old_tokens_valid():
+    before = TokenService.from_config({'SECRET_KEY': OLD_KEY})
+    token = before.issue({'user_id': 1})
+
+    after = TokenService.from_config({
+        'SECRET_KEY': OLD_KEY,
+        'JWT_SIGNING_KEYS': {derive_kid(OLD_KEY): OLD_KEY, 'v2': NEW_KEY},
+        'JWT_ACTIVE_KID': 'v2'
+    })
+    assert after.verify(token)['user_id'] == 1
+    assert jwt.get_unverified_header(after.issue({'user_id': 1}))['kid'] == 'v2'
+
+def test_signing_keys_are_required():
+    with pytest.raises(ValueError):
+        TokenService({})
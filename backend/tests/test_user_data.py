@@ -0,0 +1,124 @@
+"""
+Tests for sharding per-user tables and splitting a database into shards
+"""
+
+import sqlite3
+
+import pytest
+
+from user_data import (
+    ConsistentHashRouter, SingleDatabaseRouter, UserDataRepository, create_router, split_database
+)
+
+USERS = range(1, 21)
+ITEMS = [{'food_name': 'pizza', 'calories': 285, 'protein': 12}, {'food_name': 'salad', 'calories': 90}]
+
+@pytest.fixture
+def source(tmp_path):
+    """foodvision.db with two meals, a preference, an insight and favorites per user"""
+    path = str(tmp_path / 'foodvision.db')
+    repository = UserDataRepository(SingleDatabaseRouter(path))
+    repository.create_schema()
+    for user_id in USERS:
+        for meal_type in ('lunch', 'dinner'):
+            repository.save_meal(user_id, meal_type, '', None, ITEMS)
+    repository.pool.close()
+
+    conn = sqlite3.connect(path)
+    for user_id in USERS:
+        conn.execute(
+            "INSERT INTO user_preferences (user_id, preference_key, preference_value) VALUES (?, 'units', 'metric')",
+            (user_id,)
+        )
+        conn.execute(
+            "INSERT INTO nutrition_insights (user_id, insight_type, insight_data) VALUES (?, 'weekly', '{}')",
+            (user_id,)
+        )
+        conn.execute("INSERT INTO user_favorite_foods (user_id, foods) VALUES (?, '[\"pizza\"]')", (user_id,))
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture
+def router(tmp_path, source):
+    return create_router(3, str(tmp_path / 'shards'), source)
+
+def count(path, sql, *params):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql, params).fetchone()[0]
+    finally:
+        conn.close()
+
+def user_rows(router, user_id):
+    """(meals, food items, preferences, insights, favorites) for a user in their shard"""
+    path = router.database_for(user_id)
+    return (
+        count(path, 'SELECT COUNT(*) FROM meals WHERE user_id = ?', user_id),
+        count(path, 'SELECT COUNT(*) FROM food_items fi JOIN meals m ON fi.meal_id = m.id WHERE m.user_id = ?',
+              user_id),
+        count(path, 'SELECT COUNT(*) FROM user_preferences WHERE user_id = ?', user_id),
+        count(path, 'SELECT COUNT(*) FROM nutrition_insights WHERE user_id = ?', user_id),
+        count(path, 'SELECT COUNT(*) FROM user_favorite_foods WHERE user_id = ?', user_id),
+    )
+
+def test_router_placement_is_stable_and_spread():
+    paths = [f'shards/shard-{index:02d}.db' for index in range(4)]
+    router = ConsistentHashRouter(paths)
+    placement = {user_id: router.database_for(user_id) for user_id in range(1000)}
+
+    assert placement == {user_id: ConsistentHashRouter(paths).database_for(user_id) for user_id in range(1000)}
+    assert all(100 < list(placement.values()).count(path) < 400 for path in paths)
+
+def test_adding_a_shard_moves_only_some_users():
+    before = ConsistentHashRouter([f'shard-{index:02d}.db' for index in range(4)])
+    after = ConsistentHashRouter([f'shard-{index:02d}.db' for index in range(5)])
+    moved = [user_id for user_id in range(1000) if before.database_for(user_id) != after.database_for(user_id)]
+
+    assert 100 < len(moved) < 350
+    assert all(after.database_for(user_id) == 'shard-04.db' for user_id in moved)
+
+def test_no_shards_keeps_one_database():
+    router = create_router(0, directory_path='foodvision.db')
+    assert router.database_for(7) == router.directory_database() == 'foodvision.db'
+
+def test_split_moves_every_users_rows(source, router):
+    moved = split_database(source, router)
+    assert sum(moved.values()) == len(USERS)
+
+    for user_id in USERS:
+        assert user_rows(router, user_id) == (2, 4, 1, 1, 1)
+    # Without purge the source keeps its rows
+    assert count(source, 'SELECT COUNT(*) FROM meals') == 2 * len(USERS)
+
+def test_split_again_copies_nothing_twice(source, router):
+    split_database(source, router)
+    split_database(source, router)
+
+    for user_id in USERS:
+        assert user_rows(router, user_id) == (2, 4, 1, 1, 1)
+
+def test_split_again_keeps_rows_written_to_the_shards(source, router):
+    split_database(source, router)
+
+    repository = UserDataRepository(router)
+    repository.save_meal(1, 'snack', '', None, ITEMS[:1])
+    repository.pool.close()
+
+    # A meal recorded in the source after the first split is copied over too
+    conn = sqlite3.connect(source)
+    conn.execute("INSERT INTO meals (user_id, meal_type, total_calories) VALUES (2, 'breakfast', 300)")
+    conn.commit()
+    conn.close()
+
+    split_database(source, router)
+    assert user_rows(router, 1)[:2] == (3, 5)
+    assert user_rows(router, 2)[0] == 3
+
+def test_split_with_purge_empties_the_source(source, router):
+    split_database(source, router, purge=True)
+
+    for table in ('meals', 'food_items', 'user_preferences', 'nutrition_insights', 'user_favorite_foods'):
+        assert count(source, f'SELECT COUNT(*) FROM {table}') == 0
+    for user_id in USERS:
+        assert user_rows(router, user_id) == (2, 4, 1, 1, 1)
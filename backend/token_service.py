@@ -0,0 +1,133 @@
+"""
+JWT token service for FoodVision AI
+Preloaded signing keys with kid-based rotation, a verified-token cache and
+verification latency metrics
+
+Keys come from the Flask config:
+    JWT_SIGNING_KEYS  {kid: secret}; defaults to {<derived kid>: SECRET_KEY}
+    JWT_ACTIVE_KID    kid used to sign new tokens; defaults to the last key
+Old kids stay in JWT_SIGNING_KEYS until the tokens they signed expire.
+Tokens without a kid header (issued before rotation support) are checked
+against SECRET_KEY.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+import jwt
+
+TOKEN_LIFETIME = timedelta(days=7)
+TOKEN_ALGORITHM = 'HS256'
+
+# Verified tokens remembered until they expire, keyed by SHA-256 of the token
+VERIFIED_CACHE_MAX = 4096
+
+# Latency samples kept for the metrics percentiles
+LATENCY_SAMPLES = 2048
+
+def derive_kid(secret):
+    """Stable key id for a secret that does not reveal it"""
+    return hashlib.sha256(secret.encode()).hexdigest()[:8]
+
+class TokenService:
+    """Issues and verifies HS256 tokens"""
+
+    def __init__(self, keys, active_kid=None, legacy_key=None):
+        if not keys:
+            raise ValueError('At least one signing key is required')
+        self.keys = dict(keys)
+        self.active_kid = active_kid or list(self.keys)[-1]
+        self.legacy_key = legacy_key
+        self._verified = OrderedDict()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._counts = {'cache_hits': 0, 'cache_misses': 0, 'invalid': 0, 'issued': 0}
+
+    @classmethod
+    def from_config(cls, config):
+        secret = config.get('SECRET_KEY', 'your-secret-key')
+        keys = config.get('JWT_SIGNING_KEYS') or {derive_kid(secret): secret}
+        return cls(keys, config.get('JWT_ACTIVE_KID'), legacy_key=secret)
+
+    def issue(self, claims):
+        """Sign a token with the active key"""
+        now = datetime.utcnow()
+        payload = dict(claims, exp=now + TOKEN_LIFETIME, iat=now)
+        token = jwt.encode(
+            payload, self.keys[self.active_kid], algorithm=TOKEN_ALGORITHM,
+            headers={'kid': self.active_kid}
+        )
+        with self._lock:
+            self._counts['issued'] += 1
+        return token
+
+    def verify(self, token):
+        """Claims of a valid token, or None"""
+        start = time.perf_counter()
+        digest = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+
+        with self._lock:
+            entry = self._verified.get(digest)
+            if entry and entry[0] > now:
+                self._verified.move_to_end(digest)
+                self._counts['cache_hits'] += 1
+                self._latencies.append(time.perf_counter() - start)
+                return dict(entry[1])
+            if entry:
+                del self._verified[digest]
+
+        payload = self._decode(token)
+
+        with self._lock:
+            if payload is None:
+                self._counts['invalid'] += 1
+            else:
+                self._counts['cache_misses'] += 1
+                self._verified[digest] = (payload['exp'], payload)
+                while len(self._verified) > VERIFIED_CACHE_MAX:
+                    self._verified.popitem(last=False)
+            self._latencies.append(time.perf_counter() - start)
+
+        return dict(payload) if payload is not None else None
+
+    def _decode(self, token):
+        try:
+            kid = jwt.get_unverified_header(token).get('kid')
+            key = self.keys.get(kid) if kid else self.legacy_key
+            if key is None:
+                return None
+            return jwt.decode(
+                token, key, algorithms=[TOKEN_ALGORITHM], options={'require': ['exp']}
+            )
+        except jwt.InvalidTokenError:
+            return None
+
+    def metrics(self):
+        """Verification counters and latency percentiles in milliseconds"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counts = dict(self._counts)
+            cached = len(self._verified)
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000, 4)
+
+        lookups = counts['cache_hits'] + counts['cache_misses']
+        return dict(
+            counts,
+            cached_tokens=cached,
+            cache_hit_rate=round(counts['cache_hits'] / lookups, 4) if lookups else None,
+            active_kid=self.active_kid,
+            latency_ms={
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'p99': percentile(0.99),
+                'samples': len(latencies)
+            }
+        )
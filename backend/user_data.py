@@ -0,0 +1,480 @@
+"""
+Per-user data access for FoodVision AI
+Every query scoped to one user goes through UserDataRepository, which asks
+its router which SQLite database holds that user's rows. The users table
+lives in the directory database; meals and the tables hanging off them live
+in the database returned by database_for(user_id). SingleDatabaseRouter
+keeps everything in foodvision.db; ConsistentHashRouter spreads users over
+N shard files so saves for different users do not wait on one write lock.
+
+Maintenance, from the backend directory:
+    python user_data.py split --shards 4 [--purge]   # move foodvision.db meals into shards
+    python user_data.py benchmark                     # concurrent save_meal throughput
+
+Changing the shard count moves about 1/N of the users; rebalance by running
+split with --source set to each old shard file and --purge.
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import queries
+
+# Virtual nodes per shard on the hash ring; more points, more even spread
+SHARD_RING_REPLICAS = 64
+
+# Tables holding per-user rows, created in every database that holds user data
+USER_DATA_SCHEMA = [
+    '''
+        CREATE TABLE IF NOT EXISTS meals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER DEFAULT 1,
+            meal_type TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            image_path TEXT,
+            image_hash TEXT,
+            total_calories REAL NOT NULL,
+            total_protein REAL DEFAULT 0,
+            total_carbs REAL DEFAULT 0,
+            total_fat REAL DEFAULT 0,
+            total_fiber REAL DEFAULT 0,
+            total_sugar REAL DEFAULT 0,
+            total_sodium REAL DEFAULT 0,
+            ai_confidence REAL DEFAULT 0,
+            processing_time REAL DEFAULT 0,
+            location TEXT,
+            mood_rating INTEGER DEFAULT 5,
+            notes TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    # Per-user history in time order, and image reference counts for the
+    # image store's garbage collection
+    'CREATE INDEX IF NOT EXISTS idx_meals_user_date ON meals(user_id, timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_meals_image_hash ON meals(image_hash)',
+    '''
+        CREATE TABLE IF NOT EXISTS food_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            meal_id INTEGER NOT NULL,
+            food_name TEXT NOT NULL,
+            original_prediction TEXT,
+            confidence REAL NOT NULL,
+            portion_size REAL NOT NULL,
+            calories REAL NOT NULL,
+            protein REAL DEFAULT 0,
+            carbs REAL DEFAULT 0,
+            fat REAL DEFAULT 0,
+            fiber REAL DEFAULT 0,
+            sugar REAL DEFAULT 0,
+            sodium REAL DEFAULT 0,
+            vitamins TEXT DEFAULT '{}',
+            minerals TEXT DEFAULT '{}',
+            ai_model_used TEXT DEFAULT 'mobilenet',
+            processing_method TEXT DEFAULT 'standard',
+            FOREIGN KEY (meal_id) REFERENCES meals (id)
+        )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_food_items_meal ON food_items(meal_id)',
+    '''
+        CREATE TABLE IF NOT EXISTS user_preferences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            preference_key TEXT NOT NULL,
+            preference_value TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS nutrition_insights (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            insight_type TEXT NOT NULL,
+            insight_data TEXT NOT NULL,
+            generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            relevance_score REAL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    # Precomputed favorite foods per user (rebuilt lazily after FAVORITE_FOODS_TTL)
+    '''
+        CREATE TABLE IF NOT EXISTS user_favorite_foods (
+            user_id INTEGER PRIMARY KEY,
+            foods TEXT NOT NULL,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    '''
+]
+
+# Tables copied by split, keyed by user_id (food_items follow their meals)
+USER_KEYED_TABLES = ['meals', 'user_preferences', 'nutrition_insights', 'user_favorite_foods']
+
+def ring_hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+class SingleDatabaseRouter:
+    """Every user's data in one database file"""
+
+    def __init__(self, path='foodvision.db'):
+        self.path = path
+
+    def directory_database(self):
+        """Database holding the users table"""
+        return self.path
+
+    def database_for(self, user_id):
+        """Database holding a user's meals, food items and derived tables"""
+        return self.path
+
+    def user_databases(self):
+        """Every database that holds user data"""
+        return [self.path]
+
+class ConsistentHashRouter:
+    """Users spread over shard databases by consistent hashing of the user id
+
+    Each shard owns SHARD_RING_REPLICAS points on a hash ring and a user
+    belongs to the first point at or after the hash of its id. Points are
+    derived from the shard file name, so moving the folder keeps placement.
+    """
+
+    def __init__(self, shard_paths, directory_path='foodvision.db', replicas=SHARD_RING_REPLICAS):
+        if not shard_paths:
+            raise ValueError('At least one shard is required')
+        self.shard_paths = list(shard_paths)
+        self.directory_path = directory_path
+        ring = sorted(
+            (ring_hash(f'{os.path.basename(path)}#{replica}'), path)
+            for path in self.shard_paths for replica in range(replicas)
+        )
+        self._points = [point for point, _ in ring]
+        self._paths = [path for _, path in ring]
+
+    def directory_database(self):
+        return self.directory_path
+
+    def database_for(self, user_id):
+        index = bisect.bisect_left(self._points, ring_hash(str(user_id))) % len(self._points)
+        return self._paths[index]
+
+    def user_databases(self):
+        return list(self.shard_paths)
+
+def create_router(shards=0, shard_folder='shards', directory_path='foodvision.db'):
+    """SingleDatabaseRouter for shards=0, otherwise a ring over shard_folder/shard-NN.db"""
+    if not shards:
+        return SingleDatabaseRouter(directory_path)
+    os.makedirs(shard_folder, exist_ok=True)
+    paths = [os.path.join(shard_folder, f'shard-{index:02d}.db') for index in range(shards)]
+    return ConsistentHashRouter(paths, directory_path)
+
+class UserDataRepository:
+    """Per-user queries, each run against the database the router picks
+
+    Connections come from a pool and stay open between requests, so the
+    constant statements in queries.py are prepared once per connection.
+    """
+
+    def __init__(self, router=None):
+        self.router = router or SingleDatabaseRouter()
+        self.pool = queries.ConnectionPool()
+
+    def connection(self, user_id):
+        return self.pool.connection(self.router.database_for(user_id))
+
+    def directory_connection(self):
+        return self.pool.connection(self.router.directory_database())
+
+    def create_schema(self):
+        """Create the per-user tables in every database that holds user data"""
+        for path in self.router.user_databases():
+            conn = sqlite3.connect(path)
+            try:
+                for statement in USER_DATA_SCHEMA:
+                    conn.execute(statement)
+                conn.commit()
+            finally:
+                conn.close()
+
+    # Users (directory database)
+
+    def update_goals(self, user_id, daily_calories, height, weight, age, activity_level):
+        with self.directory_connection() as conn:
+            conn.execute(queries.UPDATE_GOALS, (daily_calories, height, weight, age, activity_level, user_id))
+            conn.commit()
+
+    # Meals
+
+    def save_meal(self, user_id, meal_type, image_path, image_hash, food_items):
+        """Insert a meal and its food items in one transaction; returns the meal id"""
+        total_calories = sum(item.get('calories', 0) for item in food_items)
+        total_protein = sum(item.get('protein', 0) for item in food_items)
+        total_carbs = sum(item.get('carbs', 0) for item in food_items)
+        total_fat = sum(item.get('fat', 0) for item in food_items)
+        total_fiber = sum(item.get('fiber', 0) for item in food_items)
+
+        with self.connection(user_id) as conn:
+            # Insert meal; image_hash is the stored image's reference
+            meal_id = conn.execute(queries.INSERT_MEAL, (
+                user_id, meal_type, image_path, image_hash, total_calories,
+                total_protein, total_carbs, total_fat, total_fiber
+            )).lastrowid
+
+            # Insert food items
+            conn.executemany(queries.INSERT_FOOD_ITEM, [
+                (meal_id, item.get('food_name', ''), item.get('confidence', 0),
+                 item.get('portion', 1), item.get('calories', 0),
+                 item.get('protein', 0), item.get('carbs', 0),
+                 item.get('fat', 0), item.get('fiber', 0))
+                for item in food_items
+            ])
+
+            # Favorite foods are stale now; they are recomputed on next use
+            conn.execute(queries.DELETE_FAVORITE_FOODS, (user_id,))
+
+            conn.commit()
+            return meal_id
+
+    def meal_history_page(self, user_id, days, limit, after=None, food_items=True):
+        """Up to limit meals from the last N days, newest first
+
+        after is the (timestamp, id) of the last meal on the previous page;
+        the row-value comparison lets SQLite seek straight to it in
+        idx_meals_user_date instead of skipping earlier rows.
+        """
+        sql = queries.MEAL_HISTORY[(bool(food_items), after is not None)]
+        with self.connection(user_id) as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = sqlite3.Row
+            cursor.execute(sql, (user_id, queries.window_start(days), *(after or ()), limit))
+            return cursor.fetchall()
+
+    def export_meals(self, user_id):
+        with self.connection(user_id) as conn:
+            return conn.execute(queries.EXPORT_MEALS, (user_id,)).fetchall()
+
+    # Aggregates
+
+    def analytics(self, user_id, days):
+        """(daily calorie rows, macro totals row, most frequent food rows)"""
+        since = queries.window_start(days)
+        with self.connection(user_id) as conn:
+            daily_calories = conn.execute(queries.DAILY_CALORIES, (user_id, since)).fetchall()
+            macros = conn.execute(queries.MACRO_TOTALS, (user_id, since)).fetchone()
+            frequent_foods = conn.execute(queries.FREQUENT_FOODS, (user_id, since)).fetchall()
+            return daily_calories, macros, frequent_foods
+
+    def daily_nutrition(self, user_id, days):
+        """Per-day nutrient totals for the last N days, newest first"""
+        with self.connection(user_id) as conn:
+            return conn.execute(queries.DAILY_NUTRITION, (user_id, queries.window_start(days))).fetchall()
+
+    def daily_stats(self, user_id, date):
+        with self.connection(user_id) as conn:
+            return conn.execute(queries.DAILY_STATS, (user_id, date)).fetchone()
+
+    def favorite_foods(self, user_id, ttl):
+        """Most frequent foods of the last 30 days, recomputed when older than ttl seconds"""
+        with self.connection(user_id) as conn:
+            row = conn.execute(
+                queries.STORED_FAVORITE_FOODS, (user_id, queries.window_start(seconds=ttl))
+            ).fetchone()
+            if row:
+                return json.loads(row[0])
+
+            favorite_foods = [
+                row[0] for row in
+                conn.execute(queries.FREQUENT_FOODS, (user_id, queries.window_start(30))).fetchall()
+            ]
+
+            conn.execute(queries.STORE_FAVORITE_FOODS, (user_id, json.dumps(favorite_foods)))
+            conn.commit()
+
+            return favorite_foods
+
+def shared_columns(conn, table):
+    """Columns of a table present in both main and the attached source database"""
+    target = [row[1] for row in conn.execute(f'PRAGMA main.table_info({table})')]
+    source = {row[1] for row in conn.execute(f'PRAGMA source.table_info({table})')}
+    return [column for column in target if column in source]
+
+def clear_users(conn, schema, tables):
+    """Delete the source rows of the users in the moving_users temp table"""
+    moving = 'user_id IN (SELECT user_id FROM moving_users)'
+    if 'food_items' in tables:
+        conn.execute(f'''
+            DELETE FROM {schema}.food_items WHERE meal_id IN
+            (SELECT id FROM {schema}.meals WHERE {moving})
+        ''')
+    for table in USER_KEYED_TABLES:
+        if table in tables:
+            conn.execute(f'DELETE FROM {schema}.{table} WHERE {moving}')
+
+def split_database(source_path, router, purge=False):
+    """Copy each user's rows from source_path into the database the router picks
+
+    Each target records the source rows it has copied in split_copies, in
+    the same transaction as the copy, so running split again (after an
+    interruption, or once the shards are live) only copies rows not yet
+    copied and never touches rows written to the shard since. Shards number
+    their meals independently, so meals get new ids in the target and their
+    food_items follow. Users the router places in source_path itself are
+    left alone. With purge, copied rows are then deleted from the source.
+    Returns {database path: users moved}.
+    """
+    source_key = os.path.abspath(source_path)
+    source = sqlite3.connect(source_path)
+    tables = [row[0] for row in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    user_ids = set()
+    for table in USER_KEYED_TABLES:
+        if table in tables:
+            user_ids.update(row[0] for row in source.execute(f'SELECT DISTINCT user_id FROM {table}'))
+    source.close()
+
+    placement = defaultdict(list)
+    for user_id in user_ids:
+        path = router.database_for(user_id)
+        if os.path.abspath(path) != os.path.abspath(source_path):
+            placement[path].append(user_id)
+
+    UserDataRepository(router).create_schema()
+    moved = {}
+    for path, users in placement.items():
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute('ATTACH DATABASE ? AS source', (source_path,))
+            conn.execute('CREATE TEMP TABLE moving_users (user_id INTEGER PRIMARY KEY)')
+            conn.executemany('INSERT INTO moving_users VALUES (?)', [(user_id,) for user_id in users])
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS main.split_copies (
+                    source TEXT NOT NULL,
+                    source_table TEXT NOT NULL,
+                    source_id INTEGER NOT NULL,
+                    PRIMARY KEY (source, source_table, source_id)
+                )
+            ''')
+            not_copied = '''id NOT IN (
+                SELECT source_id FROM main.split_copies WHERE source = ? AND source_table = ?
+            )'''
+
+            if 'meals' in tables:
+                meal_columns = [column for column in shared_columns(conn, 'meals') if column != 'id']
+                item_columns = ', '.join(column for column in shared_columns(conn, 'food_items')
+                                         if column not in ('id', 'meal_id'))
+                insert_meal = 'INSERT INTO main.meals ({}) VALUES ({})'.format(
+                    ', '.join(meal_columns), ', '.join('?' * len(meal_columns))
+                )
+                meals = conn.execute('''
+                    SELECT id, {} FROM source.meals
+                    WHERE user_id IN (SELECT user_id FROM moving_users) AND {}
+                '''.format(', '.join(meal_columns), not_copied), (source_key, 'meals')).fetchall()
+
+                for meal in meals:
+                    meal_id = conn.execute(insert_meal, meal[1:]).lastrowid
+                    conn.execute(
+                        'INSERT INTO main.split_copies VALUES (?, ?, ?)', (source_key, 'meals', meal[0])
+                    )
+                    if 'food_items' in tables:
+                        conn.execute(f'''
+                            INSERT INTO main.food_items (meal_id, {item_columns})
+                            SELECT ?, {item_columns} FROM source.food_items WHERE meal_id = ?
+                        ''', (meal_id, meal[0]))
+
+            for table in ['user_preferences', 'nutrition_insights']:
+                if table not in tables:
+                    continue
+                columns = ', '.join(column for column in shared_columns(conn, table) if column != 'id')
+                conn.execute(f'''
+                    INSERT INTO main.{table} ({columns})
+                    SELECT {columns} FROM source.{table}
+                    WHERE user_id IN (SELECT user_id FROM moving_users) AND {not_copied}
+                ''', (source_key, table))
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO main.split_copies
+                    SELECT ?, ?, id FROM source.{table}
+                    WHERE user_id IN (SELECT user_id FROM moving_users)
+                ''', (source_key, table))
+
+            # Favorite foods are a cache; a row the shard already has is newer
+            if 'user_favorite_foods' in tables:
+                columns = ', '.join(shared_columns(conn, 'user_favorite_foods'))
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO main.user_favorite_foods ({columns})
+                    SELECT {columns} FROM source.user_favorite_foods
+                    WHERE user_id IN (SELECT user_id FROM moving_users)
+                ''')
+
+            conn.commit()
+
+            if purge:
+                clear_users(conn, 'source', tables)
+                conn.commit()
+            conn.execute('DETACH DATABASE source')
+        finally:
+            conn.close()
+        moved[path] = len(users)
+
+    return moved
+
+def benchmark(writers=8, meals_per_writer=100, shard_counts=(1, 2, 4, 8)):
+    """save_meal throughput with concurrent writers, one user per writer, per shard count"""
+    items = [{'food_name': 'pizza', 'confidence': 0.9, 'calories': 285, 'protein': 12}]
+    workdir = tempfile.mkdtemp(prefix='foodvision-shards-')
+    try:
+        for shards in shard_counts:
+            router = create_router(shards, os.path.join(workdir, f'{shards}-shards'),
+                                   os.path.join(workdir, 'directory.db'))
+            repository = UserDataRepository(router)
+            repository.create_schema()
+
+            def write(user_id):
+                for _ in range(meals_per_writer):
+                    repository.save_meal(user_id, 'lunch', '', None, items)
+
+            threads = [threading.Thread(target=write, args=(user_id,)) for user_id in range(1, writers + 1)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            used = len({router.database_for(user_id) for user_id in range(1, writers + 1)})
+            print(f"{shards} shard(s), {used} in use: {writers * meals_per_writer / elapsed:.0f} meals/s "
+                  f"with {writers} writers")
+    finally:
+        shutil.rmtree(workdir)
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage per-user database shards')
+    parser.add_argument('command', choices=['split', 'benchmark'])
+    parser.add_argument('--source', default='foodvision.db', help='Database to split')
+    parser.add_argument('--directory', default='foodvision.db', help='Database holding the users table')
+    parser.add_argument('--shards', type=int, default=int(os.getenv('USER_DATA_SHARDS', '4')))
+    parser.add_argument('--shard-folder', default='shards')
+    parser.add_argument('--purge', action='store_true', help='Delete moved rows from the source')
+    parser.add_argument('--writers', type=int, default=8)
+    args = parser.parse_args()
+
+    if args.command == 'split':
+        router = create_router(args.shards, args.shard_folder, args.directory)
+        moved = split_database(args.source, router, args.purge)
+        for path, users in sorted(moved.items()):
+            print(f"{path}: {users} users")
+        print(f"Moved {sum(moved.values())} users into {args.shards} shards")
+
+    elif args.command == 'benchmark':
+        benchmark(writers=args.writers)
+
+if __name__ == '__main__':
+    main()
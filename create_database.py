@@ -51,7 +51,8 @@ def create_database():
             notification_settings TEXT DEFAULT '{}',
             subscription_tier TEXT DEFAULT 'free',
             last_login TIMESTAMP,
-            is_active BOOLEAN DEFAULT 1
+            is_active BOOLEAN DEFAULT 1,
+            token_version INTEGER DEFAULT 0
         )
     ''')
     
@@ -275,11 +276,22 @@ def create_database():
         )
     ''')
     
+    # Precomputed favorite foods per user (filled lazily by the backend)
+    cursor.execute('''
+        CREATE TABLE user_favorite_foods (
+            user_id INTEGER PRIMARY KEY,
+            foods TEXT NOT NULL,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+    ''')
+    
     print("📊 Creating database indexes...")
     
     # Create indexes for better performance
     indexes = [
         'CREATE INDEX idx_meals_user_date ON meals(user_id, timestamp)',
+        'CREATE INDEX idx_meals_image_hash ON meals(image_hash)',
         'CREATE INDEX idx_food_items_meal ON food_items(meal_id)',
         'CREATE INDEX idx_ai_cache_hash ON ai_cache(image_hash)',
         'CREATE INDEX idx_user_preferences ON user_preferences(user_id, preference_key)',
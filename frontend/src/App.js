@@ -18,6 +18,7 @@ import RecipeGenerator from './components/RecipeGenerator';
 import LoadingSpinner from './components/LoadingSpinner';
 import Auth, { AuthProvider, useAuth } from './components/Auth';
 import './components/Auth.css';
+import { authHeaders } from './utils/api';
 
 // Create App Context for global state management
 const AppContext = createContext();
@@ -109,7 +110,7 @@ function App() {
   const loadDailyStats = async () => {
     try {
       const today = new Date().toISOString().split('T')[0];
-      const response = await fetch(`/api/daily-stats?date=${today}&user_id=${user.id}`);
+      const response = await fetch(`/api/daily-stats?date=${today}`, { headers: authHeaders() });
       if (response.ok) {
         const data = await response.json();
         setDailyStats(data.stats || dailyStats);
@@ -123,8 +124,8 @@ function App() {
     try {
       const response = await fetch(`/api/ai-nutrition-analysis`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ user_id: user.id, days: 7 })
+        headers: authHeaders({ 'Content-Type': 'application/json' }),
+        body: JSON.stringify({ days: 7 })
       });
       if (response.ok) {
         const data = await response.json();
@@ -145,9 +146,8 @@ function App() {
 
       const response = await fetch('/api/ai-meal-suggestions', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: authHeaders({ 'Content-Type': 'application/json' }),
         body: JSON.stringify({
-          user_id: user.id,
           meal_type: mealType,
           calorie_target: user.preferences?.dailyCalories || 2000,
           dietary_preferences: user.preferences?.dietary || []
@@ -167,17 +167,18 @@ function App() {
     const loadingToast = toast.loading('🔍 Analyzing your food with AI...');
     
     try {
+      // Send the image as a binary multipart part instead of base64 JSON
+      const formData = new FormData();
+      formData.append('image', await (await fetch(imageData)).blob(), 'upload');
+      Object.entries({
+        advanced_mode: user.preferences?.aiMode === 'advanced',
+        user_id: user.id,
+        ...options
+      }).forEach(([key, value]) => formData.append(key, String(value)));
+
       const response = await fetch('/api/analyze-food', {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ 
-          image: imageData,
-          advanced_mode: user.preferences?.aiMode === 'advanced',
-          user_id: user.id,
-          ...options
-        }),
+        body: formData,
       });
 
       const result = await response.json();
@@ -222,12 +223,11 @@ function App() {
 
       const response = await fetch('/api/save-meal', {
         method: 'POST',
-        headers: {
+        headers: authHeaders({
           'Content-Type': 'application/json',
-        },
+        }),
         body: JSON.stringify({
           ...mealData,
-          user_id: user.id,
           meal_type: mealType,
           image_path: analysisResults?.imagePath || '',
           ai_confidence: analysisResults?.aiConfidence || 0,
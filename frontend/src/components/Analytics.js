@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import { authHeaders } from '../utils/api';
 
 const Analytics = () => {
   const [analytics, setAnalytics] = useState(null);
@@ -12,7 +13,7 @@ const Analytics = () => {
   const fetchAnalytics = async () => {
     setLoading(true);
     try {
-      const response = await fetch(`http://localhost:5000/api/analytics?days=${timeRange}`);
+      const response = await fetch(`http://localhost:5000/api/analytics?days=${timeRange}`, { headers: authHeaders() });
       const result = await response.json();
       if (result.success) {
         setAnalytics(result.analytics);
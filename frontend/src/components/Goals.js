@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import { authHeaders } from '../utils/api';
 
 const Goals = () => {
   const [goals, setGoals] = useState({
@@ -17,7 +18,7 @@ const Goals = () => {
 
   const fetchGoals = async () => {
     try {
-      const response = await fetch('http://localhost:5000/api/nutrition-goals');
+      const response = await fetch('http://localhost:5000/api/nutrition-goals', { headers: authHeaders() });
       const result = await response.json();
       if (result.success) {
         setGoals(result.goals);
@@ -34,9 +35,9 @@ const Goals = () => {
     try {
       const response = await fetch('http://localhost:5000/api/nutrition-goals', {
         method: 'POST',
-        headers: {
+        headers: authHeaders({
           'Content-Type': 'application/json',
-        },
+        }),
         body: JSON.stringify(goals),
       });
 
@@ -1,20 +1,38 @@
 import React, { useState, useEffect } from 'react';
+import { authHeaders } from '../utils/api';
+
+// Pages come back as { date: [meals] }; a day split across two pages is
+// merged, and days are kept oldest first
+const mergeHistoryPage = (history, page) => {
+  const days = new Map(history.map(day => [day.date, day]));
+  Object.entries(page).forEach(([date, meals]) => {
+    const day = days.get(date);
+    days.set(date, { date, meals: day ? [...day.meals, ...meals] : meals });
+  });
+  return [...days.values()].sort((a, b) => a.date.localeCompare(b.date));
+};
 
 const MealHistory = () => {
   const [history, setHistory] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedDate, setSelectedDate] = useState(new Date().toISOString().split('T')[0]);
 
   useEffect(() => {
     fetchMealHistory();
   }, []);
 
-  const fetchMealHistory = async () => {
+  const fetchMealHistory = async (cursor = null) => {
+    const url = cursor
+      ? `http://localhost:5000/api/meal-history?cursor=${encodeURIComponent(cursor)}`
+      : 'http://localhost:5000/api/meal-history';
     try {
-      const response = await fetch('http://localhost:5000/api/meal-history');
+      const response = await fetch(url, { headers: authHeaders() });
       const result = await response.json();
       if (result.success) {
-        setHistory(result.history);
+        setHistory(previous => mergeHistoryPage(cursor ? previous : [], result.history));
+        setNextCursor(result.next_cursor);
       }
     } catch (error) {
       console.error('Error fetching meal history:', error);
@@ -23,6 +41,12 @@ const MealHistory = () => {
     }
   };
 
+  const loadMoreMeals = async () => {
+    setLoadingMore(true);
+    await fetchMealHistory(nextCursor);
+    setLoadingMore(false);
+  };
+
   const getTotalCaloriesForDate = (date) => {
     const dayData = history.find(day => day.date === date);
     if (!dayData) return 0;
@@ -111,6 +135,14 @@ const MealHistory = () => {
         )}
       </div>
 
+      {nextCursor && (
+        <div className="load-more">
+          <button className="load-more-btn" onClick={loadMoreMeals} disabled={loadingMore}>
+            {loadingMore ? 'Loading...' : 'Load older meals'}
+          </button>
+        </div>
+      )}
+
       <div className="weekly-chart">
         <h3>Weekly Calorie Trend</h3>
         <div className="chart-placeholder">
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
-import { useAppContext } from '../App';
+import { authHeaders } from '../utils/api';
 
 const MealPlanner = ({ suggestions, onPlanMeal }) => {
   const [selectedDate, setSelectedDate] = useState(new Date().toISOString().split('T')[0]);
@@ -9,7 +9,6 @@ const MealPlanner = ({ suggestions, onPlanMeal }) => {
   const [selectedMealType, setSelectedMealType] = useState('breakfast');
   const [customMeal, setCustomMeal] = useState({ name: '', ingredients: '', calories: '' });
   const [shoppingList, setShoppingList] = useState([]);
-  const { user } = useAppContext();
 
   useEffect(() => {
     loadMealPlan();
@@ -18,7 +17,7 @@ const MealPlanner = ({ suggestions, onPlanMeal }) => {
 
   const loadMealPlan = async () => {
     try {
-      const response = await fetch(`/api/meal-plan?date=${selectedDate}&user_id=${user.id}`);
+      const response = await fetch(`/api/meal-plan?date=${selectedDate}`, { headers: authHeaders() });
       if (response.ok) {
         const data = await response.json();
         setMealPlan(data.plan || {});
@@ -32,9 +31,8 @@ const MealPlanner = ({ suggestions, onPlanMeal }) => {
     try {
       const response = await fetch('/api/meal-plan', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: authHeaders({ 'Content-Type': 'application/json' }),
         body: JSON.stringify({
-          user_id: user.id,
           date: date,
           meal_type: mealType,
           meal: meal
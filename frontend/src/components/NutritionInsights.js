@@ -1,13 +1,12 @@
 import React, { useState, useEffect } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
-import { useAppContext } from '../App';
+import { authHeaders } from '../utils/api';
 
 const NutritionInsights = ({ insights }) => {
   const [selectedInsight, setSelectedInsight] = useState(null);
   const [timeRange, setTimeRange] = useState('week');
   const [analysisData, setAnalysisData] = useState(null);
   const [loading, setLoading] = useState(true);
-  const { user } = useAppContext();
 
   useEffect(() => {
     loadAnalysisData();
@@ -19,8 +18,8 @@ const NutritionInsights = ({ insights }) => {
       const days = timeRange === 'week' ? 7 : timeRange === 'month' ? 30 : 90;
       const response = await fetch('/api/ai-nutrition-analysis', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ user_id: user.id, days })
+        headers: authHeaders({ 'Content-Type': 'application/json' }),
+        body: JSON.stringify({ days })
       });
 
       if (response.ok) {
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { useAppContext } from '../App';
+import { authHeaders } from '../utils/api';
 
 const RecipeGenerator = () => {
   const [ingredients, setIngredients] = useState([]);
@@ -150,9 +151,8 @@ const RecipeGenerator = () => {
     try {
       const response = await fetch('/api/save-recipe', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: authHeaders({ 'Content-Type': 'application/json' }),
         body: JSON.stringify({
-          user_id: user.id,
           recipe
         })
       });
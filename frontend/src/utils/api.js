@@ -51,6 +51,12 @@ export const apiRequest = async (endpoint, options = {}) => {
   }
 };
 
+// Authorization header for requests made with fetch directly
+export const authHeaders = (headers = {}) => {
+  const token = localStorage.getItem('token');
+  return token ? { ...headers, Authorization: `Bearer ${token}` } : headers;
+};
+
 // Authentication API functions
 export const authAPI = {
   login: async (credentials) => {
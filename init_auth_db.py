@@ -30,7 +30,7 @@ def init_auth_database():
         'daily_calorie_goal', 'height', 'weight', 'age', 'gender', 'activity_level',
         'dietary_restrictions', 'health_conditions', 'fitness_goals', 'timezone',
         'preferred_units', 'privacy_settings', 'notification_settings', 
-        'subscription_tier', 'last_login', 'is_active'
+        'subscription_tier', 'last_login', 'is_active', 'token_version'
     ]
     
     missing_columns = []
@@ -51,7 +51,8 @@ def init_auth_database():
             'notification_settings': 'TEXT DEFAULT "{}"',
             'subscription_tier': 'TEXT DEFAULT "free"',
             'last_login': 'TIMESTAMP',
-            'is_active': 'BOOLEAN DEFAULT 1'
+            'is_active': 'BOOLEAN DEFAULT 1',
+            'token_version': 'INTEGER DEFAULT 0'
         }
         
         for col in missing_columns:
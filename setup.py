@@ -112,7 +112,12 @@ def create_config_files():
         "confidence_threshold": 0.3,
         "max_predictions": 5,
         "cache_enabled": True,
-        "cache_duration_hours": 24
+        "cache_duration_hours": 24,
+        "ensemble_fusion": {
+            "method": "arithmetic",
+            "weights": {"mobilenet": 1.0, "resnet": 0.9, "inception": 0.85},
+            "temperatures": {"mobilenet": 1.0, "resnet": 1.0, "inception": 1.0}
+        }
     }
     
     with open(config_dir / 'ai_config.json', 'w') as f:
@@ -178,7 +183,8 @@ def setup_advanced_database():
             notification_settings TEXT DEFAULT '{}',
             subscription_tier TEXT DEFAULT 'free',
             last_login TIMESTAMP,
-            is_active BOOLEAN DEFAULT 1
+            is_active BOOLEAN DEFAULT 1,
+            token_version INTEGER DEFAULT 0
         )
     ''')
     